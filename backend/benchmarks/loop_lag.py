@@ -0,0 +1,146 @@
+"""Event-loop lag while async handlers write history rows.
+
+    cd backend && python benchmarks/loop_lag.py [--writers 32] [--writes 50]
+
+A ticker task sleeps 1 ms in a loop and records how late it wakes up; that
+overshoot is the time every other in-flight request on the worker was stalled.
+Meanwhile `--writers` tasks each insert `--writes` history-sized rows (a JSON
+blob plus an index), the way /api/research does after every answer:
+
+    before   sqlite3.connect per write, default journal, called on the event loop
+    inline   pooled WAL connection (storage.py), still called on the event loop
+    run_db   pooled WAL connection through storage.run_db (the DB executor)
+
+Each mode writes to its own scratch database in a temp directory. On fast
+local disks (or tmpfs) a commit takes microseconds; `--io-delay-ms` adds a
+blocking sleep to every write to stand in for a slow fsync.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duomind_app import storage  # noqa: E402
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+    "query TEXT, model_used TEXT, response BLOB, ip TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+)
+INDEX = "CREATE INDEX IF NOT EXISTS ix_history_ip ON history (ip, created_at)"
+RESPONSE = json.dumps({"model_a": {"content": "lorem ipsum " * 150}, "model_b": {"content": "dolor sit " * 150}})
+INSERT = "INSERT INTO history (user_id, query, model_used, response, ip) VALUES (?, ?, ?, ?, ?)"
+
+
+def _row(i: int) -> tuple:
+    return (None, f"query {i}", "openai:gpt-4o-mini|gemini:1.5-flash", RESPONSE.encode("utf-8"), f"10.0.0.{i % 50}")
+
+
+def _writer_per_connect(path: str, io_delay: float) -> Callable[[int], None]:
+    def write(i: int) -> None:
+        conn = sqlite3.connect(path)
+        conn.execute(INSERT, _row(i))
+        conn.commit()
+        time.sleep(io_delay)
+        conn.close()
+    return write
+
+
+def _writer_pooled(pool: storage.ConnectionPool, io_delay: float) -> Callable[[int], None]:
+    def write(i: int) -> None:
+        conn = pool.acquire()
+        conn.execute(INSERT, _row(i))
+        conn.commit()
+        time.sleep(io_delay)
+        conn.close()
+    return write
+
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+async def _measure(write: Callable[[int], None], *, offload: bool, writers: int, writes: int) -> Dict[str, float]:
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def writer(w: int) -> None:
+        for k in range(writes):
+            if offload:
+                await storage.run_db(write, w * writes + k)
+            else:
+                write(w * writes + k)
+                await asyncio.sleep(0)
+
+    # Warm up: open the connection (and the executor threads) before measuring.
+    if offload:
+        await storage.run_db(write, -1)
+    else:
+        write(-1)
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return {
+        "writes_per_s": writers * writes / elapsed,
+        "lag_p50_ms": _percentile(lags, 50) * 1000,
+        "lag_p99_ms": _percentile(lags, 99) * 1000,
+        "lag_max_ms": max(lags) * 1000,
+        "ticks": len(lags),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python benchmarks/loop_lag.py")
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--io-delay-ms", type=float, default=0.0, help="simulated fsync time per write")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = {}
+        path = os.path.join(tmp, "before.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute(SCHEMA)
+            conn.execute(INDEX)
+        io_delay = args.io_delay_ms / 1000
+        modes["before"] = (_writer_per_connect(path, io_delay), False)
+        for name, offload in (("inline", False), ("run_db", True)):
+            pool = storage.ConnectionPool(os.path.join(tmp, f"{name}.db"))
+            conn = pool.acquire()
+            conn.execute(SCHEMA)
+            conn.execute(INDEX)
+            conn.commit()
+            conn.close()
+            modes[name] = (_writer_pooled(pool, io_delay), offload)
+
+        print(f"{args.writers} writers x {args.writes} writes, {args.io_delay_ms:g} ms simulated I/O per write")
+        print(f"{'mode':<8} {'writes/s':>9} {'lag p50':>9} {'lag p99':>9} {'lag max':>9} {'ticks':>6}")
+        for name, (write, offload) in modes.items():
+            r = asyncio.run(_measure(write, offload=offload, writers=args.writers, writes=args.writes))
+            print(
+                f"{name:<8} {r['writes_per_s']:>9.0f} {r['lag_p50_ms']:>7.2f}ms "
+                f"{r['lag_p99_ms']:>7.2f}ms {r['lag_max_ms']:>7.2f}ms {r['ticks']:>6d}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
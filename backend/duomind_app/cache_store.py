@@ -0,0 +1,247 @@
+"""Two-level TTL cache: in-process LRU in front of a SQLite table.
+
+Used for LLM responses (llm_cache.py) and Wikipedia evidence (web_retriever.py). Entries are JSON values keyed by
+(namespace, key); each namespace has its own TTL and size limits. Expired
+entries can still be read with `allow_stale=True` (e.g. to revalidate them).
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from . import storage
+
+# Enforce disk limits every N writes instead of on every insert.
+_EVICT_EVERY = 50
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "etag")
+
+    def __init__(self, value: Any, expires_at: float, etag: Optional[str] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.etag = etag
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+_table_ready = False
+
+
+def _ensure_table() -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    conn = storage.connect()
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                etag TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cache_entries_lru ON cache_entries (namespace, last_access)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    _table_ready = True
+
+
+class TwoLevelCache:
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        ttl: float,
+        max_memory_items: int = 512,
+        max_disk_items: int = 10000,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+        persist: bool = True,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_memory_items = max(1, max_memory_items)
+        self.max_disk_items = max_disk_items
+        self.max_disk_bytes = max_disk_bytes
+        self.persist = persist
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0, "writes": 0}
+
+    # ---- memory tier ----
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        return entry
+
+    def _found(self, entry: Optional[CacheEntry], tier: str, allow_stale: bool) -> Optional[CacheEntry]:
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        if entry.expired:
+            self.counters["stale"] += 1
+            return entry if allow_stale else None
+        self.counters["hits"] += 1
+        self.counters[tier] += 1
+        return entry
+
+    def get(self, key: str, *, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """Return the entry for `key`, or None. Expired entries only with allow_stale."""
+        entry = self._recall(key)
+        tier = "memory_hits"
+        if entry is None and self.persist:
+            entry = self._load(key)
+            tier = "disk_hits"
+            if entry is not None:
+                self._remember(key, entry)
+        return self._found(entry, tier, allow_stale)
+
+    async def aget(self, key: str, *, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """get() for async callers: a memory hit is answered inline, the SQLite
+        tier is read on the DB executor."""
+        entry = self._recall(key)
+        tier = "memory_hits"
+        if entry is None and self.persist:
+            entry = await storage.run_db(self._load, key)
+            tier = "disk_hits"
+            if entry is not None:
+                self._remember(key, entry)
+        return self._found(entry, tier, allow_stale)
+
+    def _entry(self, value: Any, ttl: Optional[float], etag: Optional[str]) -> CacheEntry:
+        entry = CacheEntry(value, time.time() + (self.ttl if ttl is None else ttl), etag)
+        self.counters["writes"] += 1
+        return entry
+
+    def set(self, key: str, value: Any, *, ttl: Optional[float] = None, etag: Optional[str] = None) -> None:
+        entry = self._entry(value, ttl, etag)
+        self._remember(key, entry)
+        if self.persist:
+            self._store(key, entry)
+
+    async def aset(self, key: str, value: Any, *, ttl: Optional[float] = None, etag: Optional[str] = None) -> None:
+        """set() for async callers; the SQLite write runs on the DB executor."""
+        entry = self._entry(value, ttl, etag)
+        self._remember(key, entry)
+        if self.persist:
+            await storage.run_db(self._store, key, entry)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.persist:
+            _ensure_table()
+            conn = storage.connect()
+            try:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                conn.commit()
+            finally:
+                conn.close()
+
+    # ---- disk tier ----
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        _ensure_table()
+        conn = storage.connect()
+        try:
+            row = conn.execute(
+                "SELECT value, etag, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                    (time.time(), self.namespace, key),
+                )
+                conn.commit()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        try:
+            value = json.loads(row["value"]) if row["value"] is not None else None
+        except ValueError:
+            return None
+        return CacheEntry(value, float(row["expires_at"]), row["etag"])
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        _ensure_table()
+        payload = json.dumps(entry.value, ensure_ascii=False)
+        conn = storage.connect()
+        try:
+            conn.execute(
+                """
+                INSERT INTO cache_entries (namespace, key, value, etag, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET
+                    value = excluded.value,
+                    etag = excluded.etag,
+                    expires_at = excluded.expires_at,
+                    last_access = excluded.last_access,
+                    size = excluded.size
+                """,
+                (self.namespace, key, payload, entry.etag, entry.expires_at, time.time(), len(payload)),
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: storage.PooledConnection) -> None:
+        """Drop expired rows, then least-recently-used rows over the item/byte limits."""
+        now = time.time()
+        ns = self.namespace
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?", (ns, now - self.ttl))
+        row = conn.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes FROM cache_entries WHERE namespace = ?",
+            (ns,),
+        ).fetchone()
+        n, total = int(row["n"]), int(row["bytes"])
+        if n > self.max_disk_items or total > self.max_disk_bytes:
+            # Keep ~90% of the limit so we don't evict again on the next write.
+            keep = int(min(self.max_disk_items, n * self.max_disk_bytes / max(total, 1)) * 0.9)
+            conn.execute(
+                """
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ?
+                    ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (ns, ns, max(0, n - keep)),
+            )
+        conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        looked_up = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / looked_up, 3) if looked_up else 0.0,
+            "memory_items": len(self._memory),
+        }
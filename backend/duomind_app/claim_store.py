@@ -0,0 +1,312 @@
+"""Claim-level storage of research and debate results (models.Session / Note / Report).
+
+Every result is split into single-sentence claims which are bulk-inserted as
+`Note` rows of one `Session`, keyed by a normalized form of the claim text
+(indexed), so claims can be queried without parsing the history JSON blobs.
+
+Debate claims carry the judge's verdict: the judge's supported facts and
+rejected claims are stored as such, and each sentence of both answers inherits
+the verdict of the judged statement it matches (TF-IDF cosine). A later debate
+of the same logged-in user, in the same language, whose answer sentences were
+all judged before can reuse those verdicts instead of asking the judge again
+(see llm_orchestrator._run_debate_and_converge). Guests never share verdicts.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import insert, literal
+
+from . import models, textsim
+from .db import SessionLocal
+
+CLAIM_STORE_ENABLED = os.getenv("CLAIM_STORE_ENABLED", "true").lower() in {"1", "true", "yes"}
+# Minimum TF-IDF cosine for an answer sentence to inherit a judged claim's verdict.
+CLAIM_MATCH_THRESHOLD = float(os.getenv("CLAIM_MATCH_THRESHOLD", "0.5"))
+CLAIM_MIN_TOKENS = 3
+
+JUDGED = ("supported", "rejected")
+_CONFIDENCE = {"low": 0.3, "medium": 0.6, "high": 0.9}
+# SQLite's default limit on bound parameters is 999.
+_IN_BATCH = 500
+
+
+def normalize_claim(text: str) -> str:
+    """Lower-cased content words, so wording differences in case, punctuation
+    and stopwords don't prevent a match."""
+    return " ".join(textsim.tokenize(text))
+
+
+def confidence_label(value: Optional[float]) -> str:
+    if value is None:
+        return "medium"
+    if value < 0.45:
+        return "low"
+    return "medium" if value < 0.75 else "high"
+
+
+def _row(claim: str, verdict: str, source: str, confidence: Optional[float], evidence: Any = None) -> Dict[str, Any]:
+    return {
+        "id": models.uuid4_str(),
+        "claim": claim,
+        "claim_norm": normalize_claim(claim),
+        "verdict": verdict,
+        "source": source,
+        "confidence": confidence,
+        "evidence_json": json.dumps(evidence, ensure_ascii=False) if evidence is not None else None,
+    }
+
+
+def _best_matches(claims: Sequence[str], targets: Sequence[str]) -> List[Optional[int]]:
+    """Index of the most similar target per claim, or None below CLAIM_MATCH_THRESHOLD."""
+    if not claims or not targets:
+        return [None] * len(claims)
+    sim = textsim.cosine_matrix([textsim.tokenize(c) for c in claims], [textsim.tokenize(t) for t in targets])
+    best = sim.argmax(axis=1)
+    return [int(j) if sim[i, j] >= CLAIM_MATCH_THRESHOLD else None for i, j in enumerate(best)]
+
+
+def research_claims(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Claims of a /research (or /research/multi) result; a sentence is "agreed"
+    when it and a sentence of another model are each other's closest match."""
+    if "models" in result:
+        answers = [(m.get("tag", ""), m.get("content", "")) for m in result["models"] if "error" not in m]
+    else:
+        answers = [("A", (result.get("model_a") or {}).get("content", "")),
+                   ("B", (result.get("model_b") or {}).get("content", ""))]
+    sides: List[str] = []
+    claims: List[str] = []
+    for tag, text in answers:
+        for c in textsim.split_claims(text, min_tokens=CLAIM_MIN_TOKENS):
+            sides.append(tag)
+            claims.append(c)
+    if not claims:
+        return []
+
+    sim = textsim.cosine_matrix([textsim.tokenize(c) for c in claims], [textsim.tokenize(c) for c in claims])
+    side_ids = np.array([sides.index(t) for t in sides])
+    best_score = np.zeros(len(claims))
+    for k in np.unique(side_ids):
+        cols = np.nonzero(side_ids == k)[0]
+        rows = np.nonzero(side_ids != k)[0]
+        if not len(rows):
+            continue
+        block = sim[np.ix_(rows, cols)]
+        best_col = cols[block.argmax(axis=1)]  # closest claim of answer k, per other claim
+        best_row = rows[block.argmax(axis=0)]  # closest other claim, per claim of answer k
+        mutual = best_row[np.searchsorted(cols, best_col)] == rows
+        score = block.max(axis=1)
+        agreed = rows[mutual & (score >= CLAIM_MATCH_THRESHOLD)]
+        best_score[agreed] = np.maximum(best_score[agreed], score[mutual & (score >= CLAIM_MATCH_THRESHOLD)])
+    return [
+        _row(c, "agreed", side, round(float(best_score[i]), 3)) if best_score[i] > 0 else _row(c, "unverified", side, None)
+        for i, (c, side) in enumerate(zip(claims, sides))
+    ]
+
+
+def debate_claims(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Claims of a /debate result with the judge's verdicts (see module docstring)."""
+    confidence = _CONFIDENCE.get(str(data.get("confidence", "")).lower())
+    sources = data.get("sources") or []
+    rows: List[Dict[str, Any]] = []
+    judged: List[Dict[str, Any]] = []
+
+    for fact in data.get("supported_facts") or []:
+        if isinstance(fact, str) and fact.strip():
+            judged.append(_row(fact.strip(), "supported", "judge", confidence, {"sources": sources}))
+    for item in data.get("rejected_claims") or []:
+        claim = str(item.get("claim", "")).strip() if isinstance(item, dict) else str(item).strip()
+        if claim:
+            reason = str(item.get("reason", "")).strip() if isinstance(item, dict) else ""
+            judged.append(_row(claim, "rejected", "judge", confidence, {"reason": reason}))
+    rows.extend(judged)
+
+    judged_texts = [r["claim"] for r in judged]
+    for side, key in (("A", "answer_a"), ("B", "answer_b")):
+        claims = textsim.split_claims(data.get(key) or "", min_tokens=CLAIM_MIN_TOKENS)
+        for claim, j in zip(claims, _best_matches(claims, judged_texts)):
+            if j is None:
+                rows.append(_row(claim, "unverified", side, None))
+            else:
+                match = judged[j]
+                evidence = {"matched": match["claim"], **json.loads(match["evidence_json"])}
+                rows.append(_row(claim, match["verdict"], side, confidence, evidence))
+    return rows
+
+
+def save_session(
+    user_id: Optional[int],
+    query: str,
+    kind: str,
+    rows: List[Dict[str, Any]],
+    *,
+    lang: Optional[str] = None,
+    report: Optional[str] = None,
+    verified: bool = False,
+) -> Optional[str]:
+    """Write one Session with its Note rows (single bulk INSERT) and optional Report."""
+    if not CLAIM_STORE_ENABLED or not rows:
+        return None
+    db = SessionLocal()
+    try:
+        session = models.Session(user_id=user_id, user_query=query, kind=kind, lang=lang, status="done")
+        db.add(session)
+        db.flush()
+        db.execute(insert(models.Note), [{**r, "session_id": session.id} for r in rows])
+        if report:
+            db.add(models.Report(session_id=session.id, markdown=report, verified=verified))
+        db.commit()
+        return session.id
+    finally:
+        db.close()
+
+
+def save_research(user_id: Optional[int], query: str, result: Dict[str, Any]) -> Optional[str]:
+    return save_session(user_id, query, "research", research_claims(result))
+
+
+def save_debate(user_id: Optional[int], query: str, result: Dict[str, Any]) -> Optional[str]:
+    if not result.get("ok"):
+        return None
+    data = result["data"]
+    return save_session(
+        user_id,
+        query,
+        "debate",
+        debate_claims(data),
+        lang=data.get("lang"),
+        report=data.get("final_answer") or None,
+        verified=bool(data.get("evidence")) and bool(data.get("supported_facts")),
+    )
+
+
+def _user_filter(user_id: Optional[int]):
+    col = models.Session.user_id
+    return col.is_(None) if user_id is None else col == user_id
+
+
+def lookup_verdicts(user_id: Optional[int], claims: Iterable[str], lang: str) -> Dict[str, Dict[str, Any]]:
+    """Most recent judged verdict per normalized claim, from this user's earlier debates
+    in `lang`. Guests (user_id None) get none: their sessions are not theirs alone."""
+    norms = sorted({n for n in (normalize_claim(c) for c in claims) if n})
+    if not CLAIM_STORE_ENABLED or not norms or user_id is None:
+        return {}
+    found: Dict[str, Dict[str, Any]] = {}
+    db = SessionLocal()
+    try:
+        for start in range(0, len(norms), _IN_BATCH):
+            notes = (
+                db.query(models.Note)
+                .join(models.Session)
+                .filter(
+                    models.Note.claim_norm.in_(norms[start:start + _IN_BATCH]),
+                    models.Note.verdict.in_(JUDGED),
+                    _user_filter(user_id),
+                    models.Session.lang == lang,
+                )
+                .order_by(models.Note.created_at.desc())
+                .all()
+            )
+            for n in notes:
+                found.setdefault(n.claim_norm, {
+                    "claim": n.claim,
+                    "verdict": n.verdict,
+                    "confidence": n.confidence,
+                    "evidence": json.loads(n.evidence_json) if n.evidence_json else {},
+                })
+    finally:
+        db.close()
+    return found
+
+
+def _cites(verdict: Dict[str, Any], urls: Set[str]) -> bool:
+    cited = {s.get("url") for s in verdict["evidence"].get("sources") or [] if isinstance(s, dict)}
+    return not cited or bool(cited & urls)
+
+
+def reuse_judgement(
+    claims: Sequence[str], prior: Dict[str, Dict[str, Any]], evidence_urls: Iterable[str] = ()
+) -> Optional[Dict[str, Any]]:
+    """A judge-shaped result built from earlier verdicts, or None (ask the judge).
+
+    None unless every claim has a verdict, every supported verdict that cites
+    sources cites one of the current `evidence_urls`, and at least one claim is
+    supported (an all-rejected reuse would leave no answer).
+    """
+    if not claims:
+        return None
+    verdicts = [prior.get(normalize_claim(c)) for c in claims]
+    if any(v is None for v in verdicts):
+        return None
+    urls = {u for u in evidence_urls if u}
+    if any(v["verdict"] == "supported" and not _cites(v, urls) for v in verdicts):
+        return None
+
+    supported: List[str] = []
+    rejected: List[Dict[str, str]] = []
+    sources: List[Dict[str, str]] = []
+    seen = set()
+    for claim, v in zip(claims, verdicts):
+        ev = v["evidence"]
+        if v["verdict"] == "supported":
+            fact = ev.get("matched") or claim
+            if fact not in seen:
+                seen.add(fact)
+                supported.append(fact)
+            for s in ev.get("sources") or []:
+                if isinstance(s, dict) and s not in sources:
+                    sources.append(s)
+        elif normalize_claim(claim) not in seen:
+            seen.add(normalize_claim(claim))
+            rejected.append({"claim": claim, "reason": ev.get("reason", "")})
+
+    if not supported:
+        return None
+    confidences = [v["confidence"] for v in verdicts if v["confidence"] is not None]
+    return {
+        "final_answer": " ".join(supported),
+        "supported_facts": supported,
+        "rejected_claims": rejected,
+        "sources": sources,
+        "confidence": confidence_label(float(np.mean(confidences)) if confidences else None),
+    }
+
+
+def search_claims(
+    user_id: Optional[int], q: str = "", *, verdict: Optional[str] = None, limit: int = 50
+) -> List[Dict[str, Any]]:
+    """This user's stored claims containing every content word of `q`, newest first."""
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(models.Note, models.Session)
+            .join(models.Session)
+            .filter(_user_filter(user_id), models.Note.claim_norm.isnot(None))
+        )
+        padded = literal(" ") + models.Note.claim_norm + literal(" ")
+        for token in normalize_claim(q).split():
+            token = token.replace("\\", "\\\\").replace("_", "\\_")
+            query = query.filter(padded.like(f"% {token} %", escape="\\"))
+        if verdict:
+            query = query.filter(models.Note.verdict == verdict)
+        rows = query.order_by(models.Note.created_at.desc()).limit(limit).all()
+        return [
+            {
+                "id": note.id,
+                "claim": note.claim,
+                "verdict": note.verdict,
+                "source": note.source,
+                "confidence": note.confidence,
+                "evidence": json.loads(note.evidence_json) if note.evidence_json else None,
+                "session_id": session.id,
+                "kind": session.kind,
+                "query": session.user_query,
+                "created_at": note.created_at.isoformat() if note.created_at else None,
+            }
+            for note, session in rows
+        ]
+    finally:
+        db.close()
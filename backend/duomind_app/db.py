@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 # Always resolve DB path relative to this package folder (NOT the current working directory).
@@ -16,6 +16,15 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     future=True,
 )
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    # Same WAL / cache / mmap settings as the raw-SQL pool (storage imports this module).
+    from .storage import apply_pragmas
+    apply_pragmas(dbapi_conn)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
 
@@ -25,3 +34,22 @@ def init_db() -> None:
     # Import models here to avoid circular imports.
     from . import models  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+# Columns added after the first release; create_all() does not alter existing tables.
+_ADDED_COLUMNS = {
+    "sessions": {"kind": "VARCHAR", "lang": "VARCHAR"},
+    "notes": {"claim_norm": "TEXT", "verdict": "VARCHAR", "source": "VARCHAR"},
+}
+
+
+def _add_missing_columns() -> None:
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {c["name"] for c in insp.get_columns(table)}
+            for name, sql_type in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notes_claim_norm ON notes (claim_norm)"))
@@ -0,0 +1,101 @@
+"""Local text embeddings (no network).
+
+If EMBEDDING_MODEL names a sentence-transformers model and the optional
+`sentence-transformers` package is installed, that model is used. Otherwise a
+hashing vectorizer (word unigrams + bigrams + character 4-grams, signed feature
+hashing, log tf, L2-normalized) gives deterministic EMBEDDING_DIM-dimensional vectors. Either way
+vectors are float32 and unit-length, so cosine similarity is a dot product.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .textsim import tokenize
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "").strip()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+# Character n-grams let "launch" match "launches"; weighted below whole words.
+CHAR_NGRAM = 4
+CHAR_NGRAM_WEIGHT = 0.5
+
+# Optional local model (pip install sentence-transformers).
+try:
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    _ST_AVAILABLE = True
+except Exception:
+    _ST_AVAILABLE = False
+
+_model: Optional[Any] = None
+
+
+def _load_model() -> Optional[Any]:
+    global _model
+    if _model is None and EMBEDDING_MODEL and _ST_AVAILABLE:
+        _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+
+def embedder_name() -> str:
+    """Identifies the vector space; indexes built with another embedder must be rebuilt."""
+    if EMBEDDING_MODEL and _ST_AVAILABLE:
+        return f"st:{EMBEDDING_MODEL}"
+    return f"hash:{EMBEDDING_DIM}"
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    # Low bits pick the column, the top bit the sign (reduces collision bias).
+    return h % dim, (1.0 if h >> 63 else -1.0)
+
+
+def _hash_embed(texts: Sequence[str], dim: int) -> np.ndarray:
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        feats = [(t, 1.0) for t in tokens]
+        feats += [(a + " " + b, 1.0) for a, b in zip(tokens, tokens[1:])]
+        for t in tokens:
+            padded = f"<{t}>"
+            feats += [
+                ("#" + padded[j:j + CHAR_NGRAM], CHAR_NGRAM_WEIGHT)
+                for j in range(max(1, len(padded) - CHAR_NGRAM + 1))
+            ]
+        if not feats:
+            continue
+        cols, signs = [], []
+        for f, weight in feats:
+            col, sign = _bucket(f, dim)
+            cols.append(col)
+            signs.append(sign * weight)
+        np.add.at(out[i], cols, signs)
+    # Sublinear tf keeps long chunks from being dominated by repeated words.
+    out = np.sign(out) * np.log1p(np.abs(out))
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.where(norms > 0, norms, 1.0)
+
+
+def embed(texts: Sequence[str]) -> np.ndarray:
+    """Embed `texts` -> float32 array of shape (len(texts), dim), rows unit-length."""
+    texts = [t or "" for t in texts]
+    model = _load_model()
+    if model is not None:
+        vecs = model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vecs, dtype=np.float32)
+    return _hash_embed(texts, EMBEDDING_DIM)
+
+
+def dimension() -> int:
+    model = _load_model()
+    if model is not None:
+        return int(model.get_sentence_embedding_dimension())
+    return EMBEDDING_DIM
+
+
+def embed_one(text: str) -> np.ndarray:
+    return embed([text])[0]
+
@@ -0,0 +1,341 @@
+"""Streaming, incremental ingestion of a local corpus into a vector store.
+
+    python -m duomind_app.ingest SOURCE_DIR [--store DIR] [--watch SECONDS]
+
+Files are read line by line (PDFs page by page) and chunked, de-duplicated by
+content hash, embedded in batches and appended to the store (vector_store.py),
+so memory stays bounded regardless of file size. A manifest next to the store
+records (mtime, size, sha256, doc id) per file: unchanged files are skipped
+without being read, changed files are replaced, and deleted files are removed.
+When enough rows belong to removed documents the store is compacted.
+
+With INGEST_SOURCE_DIR set, main.py runs the same job in a background thread at
+startup (and every INGEST_INTERVAL_SECONDS if > 0); its progress is reported by
+/api/providers/health.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .textsim import split_passages
+from .vector_store import CHUNK_WORDS, DOC_STORE_DIR, iter_pdf_pages, open_store
+
+INGEST_SOURCE_DIR = os.getenv("INGEST_SOURCE_DIR", "").strip()
+CORPUS_STORE_DIR = os.getenv("CORPUS_STORE_DIR", os.path.join(DOC_STORE_DIR, "corpus"))
+INGEST_INTERVAL_SECONDS = float(os.getenv("INGEST_INTERVAL_SECONDS", "0"))
+# Compact the store once this fraction of its rows belongs to removed/replaced files.
+INGEST_COMPACT_RATIO = float(os.getenv("INGEST_COMPACT_RATIO", "0.3"))
+
+SUFFIXES = {".txt", ".md", ".markdown", ".jsonl", ".pdf"}
+MANIFEST = "ingest_manifest.json"
+# Flush a paragraph buffer once it holds this many words, even without a blank line.
+_MAX_BUFFER_WORDS = CHUNK_WORDS * 8
+
+
+def new_progress() -> Dict[str, Any]:
+    return {
+        "status": "idle",
+        "source": None,
+        "started_at": None,
+        "finished_at": None,
+        "files_total": 0,
+        "files_done": 0,
+        "files_added": 0,
+        "files_updated": 0,
+        "files_unchanged": 0,
+        "files_removed": 0,
+        "files_failed": 0,
+        "files_reindexed": 0,
+        "chunks_added": 0,
+        "chunks_deduped": 0,
+        "bytes_read": 0,
+        "rows_compacted": 0,
+        "current_file": None,
+        "error": None,
+    }
+
+
+def throughput(progress: Dict[str, Any]) -> Dict[str, float]:
+    started = progress.get("started_at")
+    if not started:
+        return {"elapsed_s": 0.0, "files_per_s": 0.0, "chunks_per_s": 0.0, "mb_per_s": 0.0}
+    elapsed = max(1e-6, (progress.get("finished_at") or time.time()) - started)
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "files_per_s": round(progress["files_done"] / elapsed, 2),
+        "chunks_per_s": round(progress["chunks_added"] / elapsed, 1),
+        "mb_per_s": round(progress["bytes_read"] / elapsed / 1e6, 2),
+    }
+
+
+# ---- reading ----
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _iter_paragraphs(path: Path, progress: Dict[str, Any]) -> Iterator[str]:
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        with open(path, "rb") as fh:
+            yield from iter_pdf_pages(fh)
+        progress["bytes_read"] += path.stat().st_size
+        return
+
+    buffer: List[str] = []
+    words = 0
+    with open(path, "rb") as fh:
+        for raw in fh:
+            progress["bytes_read"] += len(raw)
+            line = raw.decode("utf-8", errors="replace")
+            if suffix == ".jsonl":
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                text = str(obj.get("text") or "") if isinstance(obj, dict) else ""
+                if text.strip():
+                    yield text
+                continue
+            if not line.strip():
+                if buffer:
+                    yield " ".join(buffer)
+                    buffer, words = [], 0
+                continue
+            buffer.append(line.strip())
+            words += len(line.split())
+            if words >= _MAX_BUFFER_WORDS:
+                yield " ".join(buffer)
+                buffer, words = [], 0
+    if buffer:
+        yield " ".join(buffer)
+
+
+def iter_file_chunks(path: Path, progress: Dict[str, Any]) -> Iterator[str]:
+    for paragraph in _iter_paragraphs(path, progress):
+        yield from split_passages(paragraph, max_words=CHUNK_WORDS)
+
+
+def _iter_files(source: Path) -> Iterator[Path]:
+    for f in sorted(source.rglob("*")):
+        if f.suffix.lower() in SUFFIXES and f.is_file():
+            yield f
+
+
+# ---- job ----
+def _load_manifest(store_dir: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(os.path.join(store_dir, MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(store_dir: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    tmp = os.path.join(store_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, os.path.join(store_dir, MANIFEST))
+
+
+def ingest(
+    source: str,
+    store_dir: str = CORPUS_STORE_DIR,
+    *,
+    progress: Optional[Dict[str, Any]] = None,
+    on_file: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Bring the store in line with `source`; returns the (final) progress dict."""
+    progress = progress if progress is not None else new_progress()
+    root = Path(source).resolve()
+    store = open_store(store_dir)
+    manifest = _load_manifest(store.path)
+    files = list(_iter_files(root))
+    progress.update({
+        "status": "running",
+        "source": str(root),
+        "started_at": time.time(),
+        "finished_at": None,
+        "files_total": len(files),
+        "error": None,
+    })
+    seen = set()
+    dropped = set()  # doc ids deleted during this run
+    last_save = time.monotonic()
+
+    def add(f: Path, key: str, sha: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = store.add_document(str(f.relative_to(root)), iter_file_chunks(f, progress), sha256=sha, dedupe=True)
+        except Exception as e:
+            progress["files_failed"] += 1
+            progress["error"] = f"{f.name}: {e}"
+            manifest.pop(key, None)
+            return None
+        st = f.stat()
+        manifest[key] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": sha,
+            "doc_id": doc["id"],
+            "dup_of": doc["dup_of"],
+        }
+        progress["chunks_added"] += doc["end"] - doc["start"]
+        progress["chunks_deduped"] += doc["skipped"]
+        return doc
+
+    def drop(key: str) -> None:
+        entry = manifest[key]
+        store.delete_document(entry["doc_id"])
+        dropped.add(entry["doc_id"])
+
+    try:
+        for f in files:
+            key = str(f)
+            seen.add(key)
+            progress["current_file"] = f.name
+            st = f.stat()
+            entry = manifest.get(key)
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                progress["files_unchanged"] += 1
+            else:
+                sha = file_sha256(f)
+                if entry and entry["sha256"] == sha:
+                    entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+                    progress["files_unchanged"] += 1
+                else:
+                    # Drop the old version first so its chunks don't count as duplicates.
+                    if entry:
+                        drop(key)
+                    if add(f, key, sha):
+                        progress["files_updated" if entry else "files_added"] += 1
+            progress["files_done"] += 1
+            if on_file:
+                on_file(progress)
+            if time.monotonic() - last_save > 10:
+                _save_manifest(store.path, manifest)
+                last_save = time.monotonic()
+
+        prefix = str(root) + os.sep
+        for key in [k for k in manifest if k.startswith(prefix) and k not in seen]:
+            drop(key)
+            manifest.pop(key)
+            progress["files_removed"] += 1
+
+        # Files whose duplicate chunks were served by a dropped document lost those
+        # chunks with it; re-add them (a few rounds in case re-adds chain).
+        for _ in range(10):
+            stale = [
+                k for k, e in manifest.items()
+                if k.startswith(prefix) and dropped.intersection(e.get("dup_of") or ())
+            ]
+            if not stale:
+                break
+            dropped = set()
+            for key in stale:
+                drop(key)
+            for key in stale:
+                progress["current_file"] = Path(key).name
+                if add(Path(key), key, manifest[key]["sha256"]):
+                    progress["files_reindexed"] += 1
+
+        if store.deleted_fraction() > INGEST_COMPACT_RATIO:
+            progress["current_file"] = None
+            progress["status"] = "compacting"
+            progress["rows_compacted"] += store.compact()
+        progress["status"] = "done"
+    except Exception as e:
+        progress["status"] = "failed"
+        progress["error"] = str(e)
+        raise
+    finally:
+        _save_manifest(store.path, manifest)
+        progress["current_file"] = None
+        progress["finished_at"] = time.time()
+    return progress
+
+
+# ---- background job (started from main.py) ----
+_job_progress = new_progress()
+_job_thread: Optional[threading.Thread] = None
+_job_stop = threading.Event()
+
+
+def status() -> Dict[str, Any]:
+    return {**_job_progress, **throughput(_job_progress), "enabled": bool(INGEST_SOURCE_DIR)}
+
+
+def _job_loop(source: str, store_dir: str, interval: float) -> None:
+    while not _job_stop.is_set():
+        _job_progress.clear()
+        _job_progress.update(new_progress())
+        try:
+            ingest(source, store_dir, progress=_job_progress)
+        except Exception:
+            pass  # recorded in _job_progress
+        if interval <= 0 or _job_stop.wait(interval):
+            return
+
+
+def start_background(
+    source: str = INGEST_SOURCE_DIR, store_dir: str = CORPUS_STORE_DIR, interval: float = INGEST_INTERVAL_SECONDS
+) -> bool:
+    """Start the ingestion thread if a source is configured and it is not already running."""
+    global _job_thread
+    if not source or (_job_thread is not None and _job_thread.is_alive()):
+        return False
+    _job_stop.clear()
+    _job_thread = threading.Thread(
+        target=_job_loop, args=(source, store_dir, interval), name="duomind-ingest", daemon=True
+    )
+    _job_thread.start()
+    return True
+
+
+def stop_background() -> None:
+    _job_stop.set()
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m duomind_app.ingest")
+    parser.add_argument("source")
+    parser.add_argument("--store", default=CORPUS_STORE_DIR)
+    parser.add_argument("--watch", type=float, default=0.0, help="re-scan every N seconds")
+    args = parser.parse_args(argv)
+
+    def report(p: Dict[str, Any]) -> None:
+        t = throughput(p)
+        sys.stderr.write(
+            f"\r[{p['files_done']}/{p['files_total']}] +{p['chunks_added']} chunks "
+            f"({p['chunks_deduped']} dup) {t['chunks_per_s']} chunks/s {t['mb_per_s']} MB/s   "
+        )
+        sys.stderr.flush()
+
+    while True:
+        p = ingest(args.source, args.store, on_file=report)
+        t = throughput(p)
+        sys.stderr.write("\n")
+        print(
+            f"{p['status']}: {p['files_added']} added, {p['files_updated']} updated, "
+            f"{p['files_unchanged']} unchanged, {p['files_removed']} removed, "
+            f"{p['files_reindexed']} re-indexed, {p['files_failed']} failed; "
+            f"{p['chunks_added']} chunks ({p['chunks_deduped']} duplicates skipped), "
+            f"{p['rows_compacted']} rows compacted in {t['elapsed_s']}s ({t['mb_per_s']} MB/s)"
+        )
+        if args.watch <= 0:
+            return 0 if p["files_failed"] == 0 else 1
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
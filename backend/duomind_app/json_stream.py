@@ -0,0 +1,163 @@
+"""Incremental parser for a JSON object that arrives in chunks (streamed LLM output).
+
+    parser = JsonStreamParser(fields=("final_answer",))
+    for chunk in stream:
+        for key, text in parser.feed(chunk):
+            ...  # decoded text of a top-level string value, as soon as it arrives
+    obj = parser.result()
+
+Text before the first "{" (prose, a Markdown fence) and after the matching "}"
+is ignored, so the same parser also extracts the first JSON object from a
+complete reply that did not come from a provider JSON mode.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Where the parser is at depth 1 (the top-level object).
+_KEY, _COLON, _VALUE, _AFTER_VALUE = range(4)
+
+
+class JsonStreamParser:
+    """Character-level state machine over one JSON object.
+
+    `feed()` returns (key, text) pairs with newly decoded text of top-level string
+    values (only for `fields`, if given). Nested values are only tracked for
+    nesting and strings; `result()` parses the complete object with json.loads.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.fields = set(fields) if fields is not None else None
+        self.done = False
+        self._raw: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._state = _KEY
+        self._in_string = False
+        self._escape: Optional[str] = None  # pending escape sequence, without the backslash
+        self._key_parts: List[str] = []
+        self._key: Optional[str] = None
+        self._streaming = False  # inside a top-level string value we report
+        self._high_surrogate: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        out: List[Tuple[str, str]] = []
+        if self.done or not chunk:
+            return out
+        start = 0
+        if not self._started:
+            start = chunk.find("{")
+            if start < 0:
+                return out
+            self._started = True
+        end = len(chunk)
+        delta: List[Tuple[str, str]] = []
+
+        for i in range(start, len(chunk)):
+            c = chunk[i]
+            if self._in_string:
+                self._string_char(c, delta)
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == _KEY:
+                        self._key_parts = []
+                    elif self._state == _VALUE:
+                        self._streaming = self.fields is None or self._key in self.fields
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 2:
+                    self._state = _AFTER_VALUE
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    end = i + 1
+                    break
+            elif self._depth == 1:
+                if c == ":":
+                    self._state = _VALUE
+                elif c == ",":
+                    self._state = _KEY
+                elif self._state == _VALUE and not c.isspace():
+                    self._state = _AFTER_VALUE  # number / true / false / null
+
+        self._raw.append(chunk[start:end])
+        # One (key, text) pair per run of characters from the same value.
+        for key, text in delta:
+            if out and out[-1][0] == key:
+                out[-1] = (key, out[-1][1] + text)
+            else:
+                out.append((key, text))
+        return out
+
+    def _string_char(self, c: str, delta: List[Tuple[str, str]]) -> None:
+        at_top = self._depth == 1
+        if self._escape is not None:
+            self._escape += c
+            if self._escape[0] == "u" and len(self._escape) < 5:
+                return
+            if at_top:
+                self._emit(self._decode_escape(self._escape), delta)
+            self._escape = None
+            return
+        if c == "\\":
+            self._escape = ""
+            return
+        if c == '"':
+            self._in_string = False
+            if at_top:
+                if self._state == _KEY:
+                    self._key = "".join(self._key_parts)
+                    self._state = _COLON
+                else:
+                    self._state = _AFTER_VALUE
+                    self._streaming = False
+            return
+        if at_top:
+            self._emit(c, delta)
+
+    def _emit(self, text: str, delta: List[Tuple[str, str]]) -> None:
+        if self._state == _KEY:
+            self._key_parts.append(text)
+        elif self._streaming and text:
+            delta.append((self._key or "", text))
+
+    def _decode_escape(self, esc: str) -> str:
+        if esc[0] != "u":
+            return _SIMPLE_ESCAPES.get(esc, esc)
+        try:
+            code = int(esc[1:], 16)
+        except ValueError:
+            return ""
+        if 0xD800 <= code <= 0xDBFF:
+            # First half of a surrogate pair; wait for the second \\u escape.
+            self._high_surrogate = chr(code)
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate:
+            pair = self._high_surrogate + chr(code)
+            self._high_surrogate = None
+            return pair.encode("utf-16", "surrogatepass").decode("utf-16")
+        self._high_surrogate = None
+        return chr(code)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The complete object, or None if it was cut off or is not valid JSON."""
+        if not self.done:
+            return None
+        try:
+            obj = json.loads("".join(self._raw))
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def first_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """The first JSON object in `text` (a whole reply), or None."""
+    parser = JsonStreamParser(fields=())
+    parser.feed(text or "")
+    return parser.result()
@@ -10,7 +10,7 @@ def resolve_keys(user: Optional[models.User]) -> Dict[str, str | None]:
     # - "guest": not logged in
     # - "server": logged in but no BYOK keys saved (uses server env keys)
     # - "byok": at least one BYOK key saved
-    keys = {"openai": None, "gemini": None, "mode": "guest"}
+    keys = {"openai": None, "gemini": None, "mistral": None, "mode": "guest"}
     if user:
         db = SessionLocal()
         try:
@@ -20,12 +20,15 @@ def resolve_keys(user: Optional[models.User]) -> Dict[str, str | None]:
                     keys["openai"] = decrypt_to_str(r.key_encrypted)
                 elif r.provider == "gemini":
                     keys["gemini"] = decrypt_to_str(r.key_encrypted)
+                elif r.provider == "mistral":
+                    keys["mistral"] = decrypt_to_str(r.key_encrypted)
         finally:
             db.close()
-    if keys["openai"] or keys["gemini"]:
+    if keys["openai"] or keys["gemini"] or keys["mistral"]:
         keys["mode"] = "byok"
         return keys
     keys["openai"] = os.getenv("OPENAI_PROJECT_KEY", os.getenv("OPENAI_API_KEY"))
     keys["gemini"] = os.getenv("GEMINI_PROJECT_KEY", os.getenv("GEMINI_API_KEY"))
+    keys["mistral"] = os.getenv("MISTRAL_PROJECT_KEY", os.getenv("MISTRAL_API_KEY"))
     keys["mode"] = "server" if user else "guest"
     return keys
@@ -0,0 +1,64 @@
+"""Response cache for provider calls.
+
+Keyed by a hash of (provider, model, prompt, parameters) — never by API key —
+so a repeated prompt is answered from memory/SQLite without a provider round-trip.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from .cache_store import TwoLevelCache
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+_cache = TwoLevelCache(
+    "llm",
+    ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600))),
+    max_memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "512")),
+    max_disk_items=int(os.getenv("LLM_CACHE_DISK_ITEMS", "20000")),
+    max_disk_bytes=int(os.getenv("LLM_CACHE_DISK_MB", "128")) * 1024 * 1024,
+)
+
+
+def cache_key(model_id: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    provider, _, model = model_id.partition(":")
+    raw = json.dumps([provider, model, prompt, params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(model_id: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    entry = _cache.get(cache_key(model_id, prompt, params))
+    if entry is None or not isinstance(entry.value, str):
+        return None
+    return entry.value
+
+
+def put(model_id: str, prompt: str, text: str, params: Optional[Dict[str, Any]] = None) -> None:
+    if not LLM_CACHE_ENABLED or not text:
+        return
+    _cache.set(cache_key(model_id, prompt, params), text)
+
+
+async def aget(model_id: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """get() for async callers (the SQLite tier is read off the event loop)."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    entry = await _cache.aget(cache_key(model_id, prompt, params))
+    if entry is None or not isinstance(entry.value, str):
+        return None
+    return entry.value
+
+
+async def aput(model_id: str, prompt: str, text: str, params: Optional[Dict[str, Any]] = None) -> None:
+    if not LLM_CACHE_ENABLED or not text:
+        return
+    await _cache.aset(cache_key(model_id, prompt, params), text)
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": LLM_CACHE_ENABLED, **_cache.stats()}
@@ -1,22 +1,24 @@
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, AsyncIterator, Awaitable, Callable
 import asyncio
 
 from duomind_app.config import RESEARCHER_PROVIDER, EDITOR_PROVIDER
 from duomind_app.providers import gpt_client, gemini_client
 
+# Legacy (sync) researcher/editor clients, selected by RESEARCHER_PROVIDER / EDITOR_PROVIDER.
+_LEGACY_CLIENTS = {
+    "gemini": gemini_client,
+    "gpt": gpt_client,
+    "openai": gpt_client,
+}
+
+
 def researcher_generate_notes(query: str, context: str) -> List[Dict]:
-    if RESEARCHER_PROVIDER == "gemini":
-        return gemini_client.researcher_notes(query, context)
-    if RESEARCHER_PROVIDER == "gpt":
-        return gpt_client.researcher_notes(query, context)
-    return gemini_client.researcher_notes(query, context)
+    client = _LEGACY_CLIENTS.get(RESEARCHER_PROVIDER, gemini_client)
+    return client.researcher_notes(query, context)
 
 def editor_generate_report(query: str, notes: List[Dict], verified: bool) -> str:
-    if EDITOR_PROVIDER == "gpt":
-        return gpt_client.editor_report(query, notes, verified)
-    if EDITOR_PROVIDER == "gemini":
-        return gemini_client.editor_report(query, notes, verified)
-    return gpt_client.editor_report(query, notes, verified)
+    client = _LEGACY_CLIENTS.get(EDITOR_PROVIDER, gpt_client)
+    return client.editor_report(query, notes, verified)
 
 def dual_run(query: str, context: str, verified: bool = True) -> Tuple[List[Dict], str]:
     notes = researcher_generate_notes(query, context)
@@ -24,10 +26,215 @@ def dual_run(query: str, context: str, verified: bool = True) -> Tuple[List[Dict
     return notes, report_md
 
 # Day 8 compare
-from duomind_app.providers import openai_provider, gemini_provider
+from duomind_app.providers import registry, circuit_breaker, resilience
+from duomind_app import llm_cache
+from duomind_app.singleflight import SingleFlight, flight_key, normalize_query
+from duomind_app.stage_graph import Stage, run_stage_graph
+from duomind_app import json_stream, storage, textsim
 
 import json
-import re
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# build_synthesis sentence alignment (TF-IDF cosine).
+SYNTH_AGREE_THRESHOLD = float(os.getenv("SYNTH_AGREE_THRESHOLD", "0.5"))
+SYNTH_DIFFER_THRESHOLD = float(os.getenv("SYNTH_DIFFER_THRESHOLD", "0.2"))
+SYNTH_MAX_ITEMS = 3
+SYNTH_MIN_TOKENS = 3
+
+# Per-stage time limits for the debate pipeline (seconds).
+DEBATE_ANSWER_TIMEOUT = float(os.getenv("DEBATE_ANSWER_TIMEOUT", "60"))
+DEBATE_RETRIEVAL_TIMEOUT = float(os.getenv("DEBATE_RETRIEVAL_TIMEOUT", "8"))
+DEBATE_JUDGE_TIMEOUT = float(os.getenv("DEBATE_JUDGE_TIMEOUT", "60"))
+# Candidate passages pulled from the user's uploaded documents (before re-ranking).
+DEBATE_DOCUMENT_PASSAGES = int(os.getenv("DEBATE_DOCUMENT_PASSAGES", "6"))
+# Debate rounds (1 = initial answers only; each further round lets both models
+# revise after seeing the other's claims, at extra LLM calls). Requests opt in with
+# max_rounds, up to DEBATE_ROUNDS_LIMIT.
+DEBATE_MAX_ROUNDS = int(os.getenv("DEBATE_MAX_ROUNDS", "1"))
+DEBATE_ROUNDS_LIMIT = int(os.getenv("DEBATE_ROUNDS_LIMIT", "4"))
+# Stop early once A and B agree this much (build_synthesis agreement_score) ...
+DEBATE_CONVERGE_THRESHOLD = float(os.getenv("DEBATE_CONVERGE_THRESHOLD", "0.75"))
+# ... or once revisions stop moving: every revised answer this similar to its previous version.
+DEBATE_STABLE_THRESHOLD = float(os.getenv("DEBATE_STABLE_THRESHOLD", "0.9"))
+
+# N-model research: models per request, model calls in flight across all requests,
+# and the per-model time limit (a model that misses it is reported, not awaited).
+MULTI_MAX_MODELS = int(os.getenv("MULTI_MAX_MODELS", "6"))
+MULTI_MAX_CONCURRENCY = int(os.getenv("MULTI_MAX_CONCURRENCY", "8"))
+MULTI_MODEL_TIMEOUT = float(os.getenv("MULTI_MODEL_TIMEOUT", "60"))
+
+
+def _object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON Schema object as strict structured outputs want it: all keys required, no others."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# Key order matters: providers generate keys in schema order, so final_answer streams first.
+JUDGE_SCHEMA = {"name": "debate_verdict", "schema": _object({
+    "final_answer": {"type": "string"},
+    "supported_facts": _STRING_LIST,
+    "rejected_claims": {
+        "type": "array",
+        "items": _object({"claim": {"type": "string"}, "reason": {"type": "string"}}),
+    },
+    "sources": {
+        "type": "array",
+        "items": _object({"label": {"type": "string"}, "url": {"type": "string"}}),
+    },
+    "confidence": {"type": "string", "enum": ["low", "medium", "high"]},
+})}
+
+COMPARE_SCHEMA = {"name": "answer_comparison", "schema": _object({
+    "summary": {"type": "string"},
+    "agreements": _STRING_LIST,
+    "disagreements": _STRING_LIST,
+    "recommendation": {"type": "string"},
+    "open_questions": _STRING_LIST,
+})}
+
+_research_flights = SingleFlight()
+_debate_flights = SingleFlight()
+_multi_slots = asyncio.Semaphore(max(1, MULTI_MAX_CONCURRENCY))
+
+
+def coalescing_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        "research": {**_research_flights.stats, "in_flight": _research_flights.in_flight()},
+        "debate": {**_debate_flights.stats, "in_flight": _debate_flights.in_flight()},
+    }
+
+# Judge/reconciler candidates, in order of preference; the first one with a key wins.
+JUDGE_MODELS = ["openai:gpt-4o-mini", "gemini:1.5-flash", "mistral:mistral-small-latest"]
+
+
+def provider_keys(
+    openai_key: Optional[str] = None,
+    gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    """Map provider name -> API key, as consumed by providers.registry."""
+    return {"openai": openai_key, "gemini": gemini_key, "mistral": mistral_key}
+
+
+def pick_judge_model(keys: Dict[str, Optional[str]]) -> Optional[str]:
+    """First keyed judge candidate, skipping ones whose circuit breaker is open."""
+    keyed = [m for m in JUDGE_MODELS if (keys.get(registry.provider_of(m) or "") or "").strip()]
+    for model_id in keyed:
+        if not circuit_breaker.get_breaker(model_id).is_open():
+            return model_id
+    # Everything keyed is tripped: let the call fail fast with a proper Retry-After.
+    return keyed[0] if keyed else None
+
+
+def _cacheable(model_id: str, keys: Dict[str, Optional[str]]) -> bool:
+    # Without an explicit key the provider may answer with a MOCK string; never cache those.
+    provider = registry.provider_of(model_id)
+    return bool(provider and (keys.get(provider) or "").strip())
+
+
+async def cached_route_call(
+    model_id: str,
+    prompt: str,
+    keys: Dict[str, Optional[str]],
+    *,
+    use_cache: bool = True,
+    json_schema: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, str]:
+    """registry.route_call with the response cache in front.
+
+    Returns (text, model ID that answered). Only answers from the requested model
+    are cached (a breaker fallback answer is not stored under the primary's key).
+    With `json_schema` the provider's structured-output mode is used.
+    """
+    params = {"json_schema": json_schema["name"]} if json_schema else None
+    if use_cache:
+        hit = await llm_cache.aget(model_id, prompt, params)
+        if hit is not None:
+            return hit, model_id
+    text, answered_by = await registry.route_call(model_id, prompt, keys, json_schema=json_schema)
+    if use_cache and answered_by == model_id and _cacheable(model_id, keys):
+        await llm_cache.aput(model_id, prompt, text, params)
+    return text, answered_by
+
+
+async def cached_hedged_call(
+    model_id: str, prompt: str, keys: Dict[str, Optional[str]], *, use_cache: bool = True
+) -> Tuple[str, str, Dict[str, Any]]:
+    """cached_route_call through registry.hedged_route_call: a slow call is raced
+    against a backup model or key. Returns (text, model ID that answered, hedge info)."""
+    if use_cache:
+        hit = await llm_cache.aget(model_id, prompt)
+        if hit is not None:
+            return hit, model_id, {"hedged": False}
+    text, answered_by, info = await registry.hedged_route_call(model_id, prompt, keys)
+    if use_cache and answered_by == model_id and _cacheable(model_id, keys):
+        await llm_cache.aput(model_id, prompt, text)
+    return text, answered_by, info
+
+
+async def cached_route_stream(
+    model_id: str,
+    prompt: str,
+    keys: Dict[str, Optional[str]],
+    *,
+    use_cache: bool = True,
+    json_schema: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Streaming counterpart of cached_route_call: a cache hit is yielded as one chunk."""
+    params = {"json_schema": json_schema["name"]} if json_schema else None
+    hit = await llm_cache.aget(model_id, prompt, params) if use_cache else None
+    if hit is not None:
+        yield hit
+        return
+    target = registry.pick_route(model_id, keys)
+    parts: List[str] = []
+    async for delta in registry.stream_model(target, prompt, keys, json_schema=json_schema):
+        parts.append(delta)
+        yield delta
+    if use_cache and target == model_id and _cacheable(model_id, keys):
+        await llm_cache.aput(model_id, prompt, "".join(parts), params)
+
+
+def _public_error(e: Exception) -> str:
+    """What a client is told about a failed model call (provider errors can embed request
+    URLs, and with them API keys); the exception itself goes to the server log."""
+    if isinstance(e, resilience.ProviderCallError):
+        return f"provider unavailable ({e.status_code})" if e.status_code else "provider unavailable"
+    return "model call failed"
+
+
+def _model_result(
+    tag: str, requested: str, answered_by: str, content: str, hedge: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Per-model entry of a research result; notes when a fallback or hedge model
+    answered, and how a hedged call was decided."""
+    provider = registry.provider_of(answered_by)
+    if provider is None:
+        return {"provider": "unknown", "model": answered_by, "tag": tag, "content": content}
+    out = {"provider": provider, "model": answered_by.split(":", 1)[1], "tag": tag, "content": content}
+    if answered_by != requested:
+        out["requested_model"] = requested
+    if hedge and hedge.get("hedged"):
+        out["hedge"] = hedge
+    return out
+
+
+def _keys_fingerprint(keys: Dict[str, Optional[str]]) -> Dict[str, str]:
+    return {p: resilience.key_fingerprint(k) for p, k in sorted(keys.items())}
+
 
 async def run_dual_research(
     query: str,
@@ -36,43 +243,246 @@ async def run_dual_research(
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
     user: Optional[Dict[str, Any]] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
 ):
-    async def run_model(tag: str, model_id: str, key_override: Optional[str]):
-        if model_id.startswith("openai:"):
-            mn = model_id.split(":", 1)[1]
-            content = await openai_provider.call_openai_model(query, mn, key_override)
-            return {"provider": "openai", "model": mn, "tag": tag, "content": content}
-        if model_id.startswith("gemini:"):
-            mn = model_id.split(":", 1)[1]
-            content = await gemini_provider.call_gemini_model(query, mn, key_override)
-            return {"provider": "gemini", "model": mn, "tag": tag, "content": content}
-        return {"provider": "unknown", "model": model_id, "tag": tag, "content": f"Unsupported model {model_id}"}
+    """Run both models on the same query and build the no-LLM synthesis.
+
+    Concurrent calls with the same normalized query, models and provider keys share
+    one in-flight run (single-flight); callers still record quota/history themselves.
+    """
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    flight = flight_key("research", normalize_query(query), model_a, model_b, _keys_fingerprint(keys))
+    result, _ = await _research_flights.do(
+        flight, lambda: _run_dual_research(query, model_a, model_b, keys, use_cache)
+    )
+    result["query"] = query
+    return result
+
+
+async def _run_dual_research(
+    query: str,
+    model_a: str,
+    model_b: str,
+    keys: Dict[str, Optional[str]],
+    use_cache: bool,
+) -> Dict[str, Any]:
+
+    async def run_model(tag: str, model_id: str):
+        content, answered_by, hedge = await cached_hedged_call(model_id, query, keys, use_cache=use_cache)
+        return _model_result(tag, model_id, answered_by, content, hedge)
 
     res_a, res_b = await asyncio.gather(
-        run_model("A", model_a, openai_key if model_a.startswith("openai:") else None),
-        run_model("B", model_b, gemini_key if model_b.startswith("gemini:") else None),
+        run_model("A", model_a),
+        run_model("B", model_b),
     )
 
     synthesis = build_synthesis(query, res_a.get("content", ""), res_b.get("content", ""))
 
     return {"query": query, "model_a": res_a, "model_b": res_b, "synthesis": synthesis}
 
+
+async def stream_dual_research(
+    query: str,
+    model_a: str = "openai:gpt-4o-mini",
+    model_b: str = "gemini:1.5-flash",
+    openai_key: Optional[str] = None,
+    gemini_key: Optional[str] = None,
+    user: Optional[Dict[str, Any]] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Streaming variant of run_dual_research.
+
+    Yields (event, data) pairs:
+      - "token": {tag, delta} interleaved from A and B as the providers emit them
+      - "model_done": {tag, provider, model, content} once a model has finished
+      - "error": {tag, detail} if a model fails mid-stream (its content stays partial)
+      - "result": the same payload run_dual_research returns, synthesis included
+    """
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(tag: str, model_id: str) -> None:
+        target = model_id
+        parts: List[str] = []
+        try:
+            hit = await llm_cache.aget(model_id, query) if use_cache else None
+            if hit is not None:
+                parts.append(hit)
+                await queue.put(("token", {"tag": tag, "delta": hit}))
+            else:
+                target = registry.pick_route(model_id, keys)
+                async for delta in registry.stream_model(target, query, keys):
+                    parts.append(delta)
+                    await queue.put(("token", {"tag": tag, "delta": delta}))
+                if use_cache and target == model_id and _cacheable(model_id, keys):
+                    await llm_cache.aput(model_id, query, "".join(parts))
+        except Exception as e:
+            logger.warning("research stream: %s failed", model_id, exc_info=True)
+            await queue.put(("error", {"tag": tag, "detail": _public_error(e)}))
+        await queue.put(("model_done", _model_result(tag, model_id, target, "".join(parts))))
+
+    tasks = [
+        asyncio.create_task(pump("A", model_a)),
+        asyncio.create_task(pump("B", model_b)),
+    ]
+    done: Dict[str, Dict[str, Any]] = {}
+    try:
+        while len(done) < len(tasks):
+            event, data = await queue.get()
+            if event == "model_done":
+                done[data["tag"]] = data
+            yield event, data
+    finally:
+        # Client went away (or we're done): never leave provider streams running.
+        for t in tasks:
+            t.cancel()
+
+    res_a, res_b = done["A"], done["B"]
+    synthesis = build_synthesis(query, res_a.get("content", ""), res_b.get("content", ""))
+    yield "result", {"query": query, "model_a": res_a, "model_b": res_b, "synthesis": synthesis}
+
+def model_tag(i: int) -> str:
+    """"A", "B", ... for the i-th model of a multi-model request."""
+    return chr(ord("A") + i)
+
+
+async def run_multi_research(
+    query: str,
+    models: List[str],
+    openai_key: Optional[str] = None,
+    gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """Ask every model in `models` concurrently and score how much they agree.
+
+    Model calls share a process-wide cap of MULTI_MAX_CONCURRENCY, and each is
+    limited to MULTI_MODEL_TIMEOUT, so a request takes about as long as its slowest
+    model. A failed or timed-out model is reported in its entry and left out of
+    the consensus. Identical concurrent requests share one run.
+    """
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    flight = flight_key("multi", normalize_query(query), list(models), _keys_fingerprint(keys))
+    result, _ = await _research_flights.do(
+        flight, lambda: _run_multi_research(query, list(models), keys, use_cache)
+    )
+    result["query"] = query
+    return result
+
+
+async def _run_multi_research(
+    query: str,
+    models: List[str],
+    keys: Dict[str, Optional[str]],
+    use_cache: bool,
+) -> Dict[str, Any]:
+    """Failed models are reported per entry; if none answered because providers were
+    unavailable, the first ProviderCallError is raised (the route answers 503)."""
+    unavailable: List[resilience.ProviderCallError] = []
+
+    async def run_model(tag: str, model_id: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            async with _multi_slots:
+                content, answered_by, hedge = await asyncio.wait_for(
+                    cached_hedged_call(model_id, query, keys, use_cache=use_cache), MULTI_MODEL_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            out = _model_result(tag, model_id, model_id, "")
+            out["error"] = f"timed out after {MULTI_MODEL_TIMEOUT:.0f}s"
+        except Exception as e:
+            logger.warning("multi research: %s failed", model_id, exc_info=True)
+            if isinstance(e, resilience.ProviderCallError):
+                unavailable.append(e)
+            out = _model_result(tag, model_id, model_id, "")
+            out["error"] = _public_error(e)
+        else:
+            out = _model_result(tag, model_id, answered_by, content, hedge)
+        out["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return out
+
+    results = await asyncio.gather(*(run_model(model_tag(i), m) for i, m in enumerate(models)))
+    answered = [r for r in results if "error" not in r]
+    if not answered and unavailable:
+        raise unavailable[0]
+    consensus = build_consensus([r["content"] for r in answered])
+    consensus["tags"] = [r["tag"] for r in answered]
+    return {"query": query, "models": results, "consensus": consensus}
+
+
+def build_consensus(answers: List[str]) -> Dict[str, Any]:
+    """Pairwise agreement between N answers, computed in one pass over all their claims.
+
+    All claims share one TF-IDF space and one similarity matrix. matrix[i][j] is
+    the build_synthesis agreement score of answers i and j: the mean, over the
+    claims of both, of each claim's best match in the other answer. `centrality`
+    is each answer's mean agreement with the others; `consensus_score` is the
+    mean over all pairs.
+    """
+    n = len(answers)
+    claims = [textsim.split_claims(a, min_tokens=SYNTH_MIN_TOKENS) for a in answers]
+    counts = np.array([len(c) for c in claims])
+    matrix = np.eye(n)
+    has = np.nonzero(counts)[0]
+    if len(has) > 1:
+        flat = [textsim.tokenize(c) for i in has for c in claims[i]]
+        vecs = textsim.tfidf_vectors(flat)
+        sim = vecs @ vecs.T
+        sizes = counts[has]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        # best[k, j]: similarity of claim k to its closest claim of answer j.
+        best = np.maximum.reduceat(sim, starts, axis=1)
+        # totals[i, j]: sum of those best matches over the claims of answer i.
+        totals = np.add.reduceat(best, starts, axis=0)
+        scores = (totals + totals.T) / (sizes[:, None] + sizes[None, :])
+        np.fill_diagonal(scores, 1.0)
+        matrix[np.ix_(has, has)] = scores
+        for i in range(n):
+            if counts[i] == 0:
+                matrix[i, i] = 0.0
+
+    off = ~np.eye(n, dtype=bool)
+    centrality = matrix[off].reshape(n, n - 1).mean(axis=1) if n > 1 else np.zeros(n)
+    pairs = matrix[np.triu_indices(n, k=1)]
+    return {
+        "matrix": np.round(matrix, 3).tolist(),
+        "centrality": np.round(centrality, 3).tolist(),
+        "consensus_score": round(float(pairs.mean()), 3) if len(pairs) else 0.0,
+    }
+
+
 def build_synthesis(query: str, a: str, b: str) -> Dict[str, Any]:
+    """No-LLM comparison: align the sentences of both answers by TF-IDF cosine.
+
+    Mutual best matches at or above SYNTH_AGREE_THRESHOLD are agreements; sentences
+    whose best match on the other side stays below SYNTH_DIFFER_THRESHOLD are
+    claims only one model made (disagreements).
+    """
     agreements: List[str] = []
     disagreements: List[Dict[str, str]] = []
+    score = 0.0
 
-    if a and b:
-        a_lines = [ln.strip() for ln in a.split("\n") if ln.strip()]
-        b_lines = [ln.strip() for ln in b.split("\n") if ln.strip()]
-        overlap = set(a_lines) & set(b_lines)
-        for item in list(overlap)[:3]:
-            agreements.append(item)
-        diff_a = [ln for ln in a_lines if ln not in overlap][:3]
-        diff_b = [ln for ln in b_lines if ln not in overlap][:3]
-        for item in diff_a:
-            disagreements.append({"from": "A", "text": item})
-        for item in diff_b:
-            disagreements.append({"from": "B", "text": item})
+    a_claims = textsim.split_claims(a, min_tokens=SYNTH_MIN_TOKENS)
+    b_claims = textsim.split_claims(b, min_tokens=SYNTH_MIN_TOKENS)
+    if a_claims and b_claims:
+        sim = textsim.cosine_matrix(
+            [textsim.tokenize(s) for s in a_claims], [textsim.tokenize(s) for s in b_claims]
+        )
+        best_b = sim.argmax(axis=1)  # for each A sentence, its closest B sentence
+        best_a = sim.argmax(axis=0)
+        best_for_a = sim.max(axis=1)
+        best_for_b = sim.max(axis=0)
+        mutual = np.nonzero(best_a[best_b] == np.arange(len(a_claims)))[0]
+        matched = [i for i in mutual if best_for_a[i] >= SYNTH_AGREE_THRESHOLD]
+        for i in sorted(matched, key=lambda i: -best_for_a[i])[:SYNTH_MAX_ITEMS]:
+            agreements.append(a_claims[i])
+        for i in np.nonzero(best_for_a < SYNTH_DIFFER_THRESHOLD)[0][:SYNTH_MAX_ITEMS]:
+            disagreements.append({"from": "A", "text": a_claims[i]})
+        for j in np.nonzero(best_for_b < SYNTH_DIFFER_THRESHOLD)[0][:SYNTH_MAX_ITEMS]:
+            disagreements.append({"from": "B", "text": b_claims[j]})
+        score = float((best_for_a.sum() + best_for_b.sum()) / (len(a_claims) + len(b_claims)))
 
     return {
         # UI localizes the section title. Keep content language-neutral.
@@ -80,38 +490,26 @@ def build_synthesis(query: str, a: str, b: str) -> Dict[str, Any]:
         "summary": "",
         "agreements": agreements,
         "disagreements": disagreements,
+        # Mean best-match similarity of all sentences (0 = unrelated, 1 = same content).
+        "agreement_score": round(score, 3),
     }
 
 
 def _extract_first_json_object(text: str) -> Optional[Dict[str, Any]]:
-    """Best-effort JSON extraction for LLM output.
+    """JSON object from LLM output.
 
-    Accepts raw JSON or JSON wrapped in Markdown fences.
+    Structured-output replies are plain JSON (fast path). Otherwise the first
+    balanced {...} object is taken, skipping prose or Markdown fences around it.
     """
     if not text:
         return None
-    t = text.strip()
-    # Strip ```json ... ``` fences
-    t = re.sub(r"^```(?:json)?\s*", "", t, flags=re.IGNORECASE)
-    t = re.sub(r"\s*```$", "", t)
-
-    # Fast path
     try:
-        obj = json.loads(t)
+        obj = json.loads(text)
         if isinstance(obj, dict):
             return obj
-    except Exception:
+    except ValueError:
         pass
-
-    # Find first {...} block
-    m = re.search(r"\{.*\}", t, flags=re.DOTALL)
-    if not m:
-        return None
-    try:
-        obj = json.loads(m.group(0))
-        return obj if isinstance(obj, dict) else None
-    except Exception:
-        return None
+    return json_stream.first_json_object(text)
 
 
 async def run_compare_reconcile(
@@ -122,10 +520,12 @@ async def run_compare_reconcile(
     lang: str = "en",
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """LLM-powered comparison (opt-in).
 
-    Uses OpenAI if an OpenAI key is available, otherwise Gemini.
+    Uses the first JUDGE_MODELS entry with a key (OpenAI, then Gemini, then Mistral).
     """
 
     lang_map = {
@@ -161,20 +561,12 @@ async def run_compare_reconcile(
         f"ANSWER B:\n{answer_b}\n"
     )
 
-    used_provider = None
-    used_model = None
-    raw = ""
-
-    if (openai_key or "").strip():
-        used_provider = "openai"
-        used_model = "gpt-4o-mini"
-        raw = await openai_provider.call_openai_model(prompt, used_model, openai_key)
-    elif (gemini_key or "").strip():
-        used_provider = "gemini"
-        used_model = "1.5-flash"
-        raw = await gemini_provider.call_gemini_model(prompt, used_model, gemini_key)
-    else:
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    judge_model = pick_judge_model(keys)
+    if judge_model is None:
         return {"ok": False, "detail": "Missing API key."}
+    used_provider, used_model = judge_model.split(":", 1)
+    raw, _ = await cached_route_call(judge_model, prompt, keys, use_cache=use_cache, json_schema=COMPARE_SCHEMA)
 
     obj = _extract_first_json_object(raw) or {}
 
@@ -200,18 +592,242 @@ async def run_debate_and_converge(
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
     evidence_lang: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+    user_id: Optional[int] = None,
+    max_rounds: Optional[int] = None,
 ) -> Dict[str, Any]:
     """Two-LLM debate + web retrieval (Wikipedia) + evidence-gated judge.
 
-    This is "RAG-lite": retrieval comes from public sources (Wikipedia) so we don't need a custom vector DB.
+    Evidence comes from public sources (Wikipedia or the offline index) plus, for a
+    logged-in `user_id`, passages from their uploaded documents (vector_store.py).
+    With `max_rounds` > 1 (default DEBATE_MAX_ROUNDS) both models revise their answers
+    after seeing each other's claims until they converge (see _debate_rounds).
+    Concurrent identical debates (normalized query, models, lang, provider keys) share one run.
+    """
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    rounds = _clamp_rounds(max_rounds)
+    flight = flight_key(
+        "debate", normalize_query(query), model_a, model_b, lang, evidence_lang, _keys_fingerprint(keys), user_id,
+        rounds,
+    )
+    result, _ = await _debate_flights.do(
+        flight,
+        lambda: _run_debate_and_converge(
+            query=query,
+            model_a=model_a,
+            model_b=model_b,
+            lang=lang,
+            keys=keys,
+            evidence_lang=evidence_lang,
+            use_cache=use_cache,
+            user_id=user_id,
+            max_rounds=rounds,
+        ),
+    )
+    return result
+
+
+def _clamp_rounds(max_rounds: Optional[int]) -> int:
+    return max(1, min(DEBATE_ROUNDS_LIMIT, max_rounds or DEBATE_MAX_ROUNDS))
+
+
+async def stream_debate_and_converge(
+    *,
+    query: str,
+    model_a: str = "openai:gpt-4o-mini",
+    model_b: str = "gemini:1.5-flash",
+    lang: str = "en",
+    openai_key: Optional[str] = None,
+    gemini_key: Optional[str] = None,
+    evidence_lang: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+    user_id: Optional[int] = None,
+    max_rounds: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Streaming variant of run_debate_and_converge.
+
+    Yields (event, data) pairs:
+      - "answer": {tag, provider, model, content} as each initial answer completes
+      - "round": {round, revised, answer_a, answer_b, agreement} after each revision round
+      - "evidence": {evidence} the passages handed to the judge
+      - "final_answer": {delta} text of the judge's final answer as it is generated
+      - "result": the same payload run_debate_and_converge returns
+    Errors of the pipeline (ProviderCallError, StageTimeout) are raised.
     """
-    from duomind_app.web_retriever import retrieve_evidence
+    keys = provider_keys(openai_key, gemini_key, mistral_key)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await queue.put((event, data))
+
+    task = asyncio.create_task(
+        _run_debate_and_converge(
+            query=query,
+            model_a=model_a,
+            model_b=model_b,
+            lang=lang,
+            keys=keys,
+            evidence_lang=evidence_lang,
+            use_cache=use_cache,
+            user_id=user_id,
+            max_rounds=_clamp_rounds(max_rounds),
+            emit=emit,
+        )
+    )
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+        yield "result", task.result()
+    finally:
+        task.cancel()
+
+
+def _answer_similarity(a: str, b: str) -> float:
+    return build_synthesis("", a, b)["agreement_score"]
+
+
+def _revision_prompt(q: str, own: str, other: str) -> str:
+    claims = textsim.split_claims(other, min_tokens=SYNTH_MIN_TOKENS)
+    other_block = "\n".join(f"- {c}" for c in claims) if claims else other
+    return (
+        "You are debating another model on the question below.\n"
+        "Check the other model's claims against your previous answer: keep what you still think is right, "
+        "correct your own mistakes, adopt their claims only where they are better, "
+        "and say which of their claims you reject.\n"
+        "Answer the user question.\n"
+        "Then list your key claims as bullet points.\n"
+        "Be concise.\n\n"
+        f"QUESTION:\n{q}\n\n"
+        f"YOUR PREVIOUS ANSWER:\n{own}\n\n"
+        f"OTHER MODEL'S CLAIMS:\n{other_block}\n"
+    )
+
+
+async def _debate_rounds(
+    q: str,
+    answers: Dict[str, str],
+    models: Dict[str, str],
+    keys: Dict[str, Optional[str]],
+    *,
+    max_rounds: int,
+    use_cache: bool,
+    emit: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """Revision rounds 2..max_rounds after the initial answers {"A": ..., "B": ...}.
+
+    Each round a model revises against the other's current claims, but only if
+    those changed since it last revised (otherwise it would get the same input).
+    Stops early when the answers agree (DEBATE_CONVERGE_THRESHOLD), when
+    revisions no longer change much (DEBATE_STABLE_THRESHOLD) or when no model
+    has new input. A failed or timed-out round keeps the answers so far.
+    """
+    current = dict(answers)
+    seen_other: Dict[str, str] = {}  # tag -> normalized other answer it last revised against
+    rounds: List[Dict[str, Any]] = []
+    agreement = _answer_similarity(current["A"], current["B"])
+    stop = "max_rounds"
+    if max_rounds <= 1:
+        stop = "single_round"
+    elif agreement >= DEBATE_CONVERGE_THRESHOLD:
+        stop = "converged"
+
+    async def revise(tag: str, other: str) -> str:
+        text, _ = await cached_route_call(
+            models[tag], _revision_prompt(q, current[tag], other), keys, use_cache=use_cache
+        )
+        return text
+
+    last_round = max_rounds if stop == "max_rounds" else 1
+    for r in range(2, last_round + 1):
+        other_of = {"A": current["B"], "B": current["A"]}
+        todo = [t for t in ("A", "B") if seen_other.get(t) != normalize_query(other_of[t])]
+        if not todo:
+            stop = "unchanged"
+            break
+        try:
+            revised = await asyncio.wait_for(
+                asyncio.gather(*(revise(t, other_of[t]) for t in todo)), DEBATE_ANSWER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            stop = "timeout"
+            break
+        except Exception:
+            # Provider error text can include response bodies and URLs; keep it in the log.
+            logger.warning("debate revision round %d failed", r, exc_info=True)
+            stop = "error"
+            break
+        drift = 1.0
+        for t, text in zip(todo, revised):
+            seen_other[t] = normalize_query(other_of[t])
+            drift = min(drift, _answer_similarity(current[t], text))
+            current[t] = text
+        agreement = _answer_similarity(current["A"], current["B"])
+        entry = {
+            "round": r,
+            "revised": todo,
+            "answer_a": current["A"],
+            "answer_b": current["B"],
+            "agreement": agreement,
+        }
+        rounds.append(entry)
+        if emit:
+            await emit("round", entry)
+        if agreement >= DEBATE_CONVERGE_THRESHOLD:
+            stop = "converged"
+            break
+        if drift >= DEBATE_STABLE_THRESHOLD:
+            stop = "stable"
+            break
+
+    return {
+        "answer_a": current["A"],
+        "answer_b": current["B"],
+        "rounds": rounds,
+        "agreement": agreement,
+        "stop_reason": stop,
+    }
+
+
+def _without_page_text(evidence: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in item.items() if k != "text"} for item in evidence]
+
+
+async def _run_debate_and_converge(
+    *,
+    query: str,
+    model_a: str,
+    model_b: str,
+    lang: str,
+    keys: Dict[str, Optional[str]],
+    evidence_lang: Optional[str],
+    use_cache: bool,
+    user_id: Optional[int] = None,
+    max_rounds: int = 1,
+    emit: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """The debate pipeline. With `emit`, progress events are reported while it runs
+    and the judge reply is streamed (see stream_debate_and_converge)."""
+    from duomind_app.web_retriever import rerank_evidence, retrieve_evidence
+    from duomind_app.vector_store import search_user_documents
+    from duomind_app import claim_store
 
     q = (query or "").strip()
     if not q:
         return {"ok": False, "detail": "query is required"}
 
-    # 1) Get initial answers from both models
+    judge_model = pick_judge_model(keys)
+    if judge_model is None:
+        return {"ok": False, "detail": "Missing API key."}
+    used_provider, used_model = judge_model.split(":", 1)
+
+    # 1) Initial answers from both models and 2) evidence retrieval run concurrently;
+    # the judge starts as soon as all three are in.
     base_prompt = (
         "Answer the user question.\n"
         "Then list your key claims as bullet points.\n"
@@ -219,87 +835,175 @@ async def run_debate_and_converge(
         f"QUESTION:\n{q}\n"
     )
 
-    async def run_model_answer(model_id: str) -> str:
-        if model_id.startswith("openai:"):
-            mn = model_id.split(":", 1)[1]
-            return await openai_provider.call_openai_model(base_prompt, mn, openai_key)
-        if model_id.startswith("gemini:"):
-            mn = model_id.split(":", 1)[1]
-            return await gemini_provider.call_gemini_model(base_prompt, mn, gemini_key)
-        return f"Unsupported model: {model_id}"
-
-    answer_a, answer_b = await asyncio.gather(
-        run_model_answer(model_a),
-        run_model_answer(model_b),
-    )
-
-    # 2) Retrieve evidence (Wikipedia)
     ev_lang = (evidence_lang or lang or "en").lower()
     if ev_lang not in {"en", "de", "fr", "es", "pt", "it", "nl"}:
         ev_lang = "en"
-    evidence = await retrieve_evidence(q, lang=ev_lang, max_pages=3)
 
-    evidence_block = ""
-    if evidence:
-        parts = []
-        for i, item in enumerate(evidence, start=1):
-            parts.append(
-                f"[E{i}] {item.get('title','')}\nURL: {item.get('url','')}\nSNIPPET: {item.get('snippet','')}\n"
+    async def answer(tag: str, model_id: str) -> str:
+        text, answered_by = await cached_route_call(model_id, base_prompt, keys, use_cache=use_cache)
+        if emit:
+            await emit("answer", _model_result(tag, model_id, answered_by, text))
+        return text
+
+    async def rerank(
+        answer_a: str, answer_b: str, evidence: List[Dict[str, Any]], documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if not evidence and not documents:
+            return []
+        return await asyncio.to_thread(rerank_evidence, documents + evidence, q, (answer_a, answer_b))
+
+    reuse = {"claims": 0, "judge_skipped": False}
+    answer_lang = (lang or "en").lower()
+
+    async def judge(answer_a: str, answer_b: str, evidence: List[Dict[str, Any]]) -> str:
+        if emit:
+            await emit("evidence", {"evidence": _without_page_text(evidence)})
+        # Verdicts from this user's earlier debates in this language (claim_store.py).
+        # If every claim of both answers was judged before against evidence we have
+        # again, skip the judge; otherwise pass them along as hints.
+        prior: Dict[str, Dict[str, Any]] = {}
+        if use_cache and user_id is not None:
+            claims = textsim.split_claims(answer_a, min_tokens=claim_store.CLAIM_MIN_TOKENS)
+            claims += textsim.split_claims(answer_b, min_tokens=claim_store.CLAIM_MIN_TOKENS)
+            prior = await storage.run_db(claim_store.lookup_verdicts, user_id, claims, answer_lang)
+            reuse["claims"] = len(prior)
+            reused = claim_store.reuse_judgement(claims, prior, [str(e.get("url", "")) for e in evidence])
+            if reused is not None:
+                reuse["judge_skipped"] = True
+                if emit:
+                    await emit("final_answer", {"delta": reused["final_answer"]})
+                return json.dumps(reused, ensure_ascii=False)
+
+        prior_block = ""
+        if prior:
+            prior_block = "\n".join(
+                f"- [{v['verdict']}] {v['claim']}" for v in prior.values()
             )
-        evidence_block = "\n\n".join(parts)
 
-    # 3) Evidence-gated judge: decide what's true based on evidence
-    lang_map = {
-        "en": "English",
-        "de": "German",
-        "fr": "French",
-        "es": "Spanish",
-        "pt": "Portuguese",
-        "tr": "Turkish",
-        "ru": "Russian",
-        "ja": "Japanese",
-        "ko": "Korean",
-        "zh": "Chinese",
-        "th": "Thai",
-        "id": "Indonesian",
-        "vi": "Vietnamese",
-        "ar": "Arabic",
-    }
-    lang_name = lang_map.get((lang or "en").lower(), "English")
+        evidence_block = ""
+        if evidence:
+            parts = []
+            for i, item in enumerate(evidence, start=1):
+                parts.append(
+                    f"[E{i}] {item.get('title','')}\nURL: {item.get('url','')}\nSNIPPET: {item.get('snippet','')}\n"
+                )
+            evidence_block = "\n\n".join(parts)
 
-    judge_prompt = (
-        "You are a strict fact-checking judge. Your job: reconcile two answers using ONLY the provided EVIDENCE.\n"
-        "Rules:\n"
-        "1) If a claim is not supported by EVIDENCE, mark it as unsupported (even if it sounds plausible).\n"
-        "2) Prefer the most directly supported statements.\n"
-        "3) If evidence is insufficient, say so clearly and suggest what to look up next.\n\n"
-        "Return STRICT JSON (no markdown) with keys:\n"
-        "- final_answer: string (4–10 sentences)\n"
-        "- supported_facts: array of 3–8 short bullet strings\n"
-        "- rejected_claims: array of objects {claim: string, reason: string}\n"
-        "- sources: array of objects {label: string, url: string}\n"
-        "- confidence: string (one of: low, medium, high)\n\n"
-        f"Write in {lang_name}.\n\n"
-        f"QUESTION:\n{q}\n\n"
-        f"ANSWER A:\n{answer_a}\n\n"
-        f"ANSWER B:\n{answer_b}\n\n"
-        f"EVIDENCE:\n{evidence_block if evidence_block else 'No evidence retrieved.'}\n"
-    )
+        # 3) Evidence-gated judge: decide what's true based on evidence
+        lang_map = {
+            "en": "English",
+            "de": "German",
+            "fr": "French",
+            "es": "Spanish",
+            "pt": "Portuguese",
+            "tr": "Turkish",
+            "ru": "Russian",
+            "ja": "Japanese",
+            "ko": "Korean",
+            "zh": "Chinese",
+            "th": "Thai",
+            "id": "Indonesian",
+            "vi": "Vietnamese",
+            "ar": "Arabic",
+        }
+        lang_name = lang_map.get((lang or "en").lower(), "English")
 
-    used_provider = None
-    used_model = None
-    raw = ""
-
-    if (openai_key or "").strip():
-        used_provider = "openai"
-        used_model = "gpt-4o-mini"
-        raw = await openai_provider.call_openai_model(judge_prompt, used_model, openai_key)
-    elif (gemini_key or "").strip():
-        used_provider = "gemini"
-        used_model = "1.5-flash"
-        raw = await gemini_provider.call_gemini_model(judge_prompt, used_model, gemini_key)
-    else:
-        return {"ok": False, "detail": "Missing API key."}
+        judge_prompt = (
+            "You are a strict fact-checking judge. Your job: reconcile two answers using ONLY the provided EVIDENCE.\n"
+            "Rules:\n"
+            "1) If a claim is not supported by EVIDENCE, mark it as unsupported (even if it sounds plausible).\n"
+            "2) Prefer the most directly supported statements.\n"
+            "3) If evidence is insufficient, say so clearly and suggest what to look up next.\n\n"
+            "Return STRICT JSON (no markdown) with keys:\n"
+            "- final_answer: string (4–10 sentences)\n"
+            "- supported_facts: array of 3–8 short bullet strings\n"
+            "- rejected_claims: array of objects {claim: string, reason: string}\n"
+            "- sources: array of objects {label: string, url: string}\n"
+            "- confidence: string (one of: low, medium, high)\n\n"
+            f"Write in {lang_name}.\n\n"
+            f"QUESTION:\n{q}\n\n"
+            f"ANSWER A:\n{answer_a}\n\n"
+            f"ANSWER B:\n{answer_b}\n\n"
+            f"EVIDENCE:\n{evidence_block if evidence_block else 'No evidence retrieved.'}\n"
+        )
+        if prior_block:
+            judge_prompt += (
+                "\nPREVIOUSLY JUDGED CLAIMS (verdicts from earlier fact-checks; keep them unless "
+                f"the EVIDENCE contradicts them):\n{prior_block}\n"
+            )
+        if emit is None:
+            raw, _ = await cached_route_call(
+                judge_model, judge_prompt, keys, use_cache=use_cache, json_schema=JUDGE_SCHEMA
+            )
+            return raw
+
+        # Forward final_answer while the rest of the verdict is still being generated.
+        parser = json_stream.JsonStreamParser(fields=("final_answer",))
+        parts: List[str] = []
+        async for delta in cached_route_stream(
+            judge_model, judge_prompt, keys, use_cache=use_cache, json_schema=JUDGE_SCHEMA
+        ):
+            parts.append(delta)
+            for _, text in parser.feed(delta):
+                await emit("final_answer", {"delta": text})
+        return "".join(parts)
+
+    # Retrieval is best-effort: on error/timeout the judge runs with no evidence.
+    # Re-ranking swaps whole (truncated) pages for the passages most relevant to the
+    # query and both answers; if it fails the judge gets the truncated pages.
+    results, timings = await run_stage_graph([
+        Stage("answer_a", lambda: answer("A", model_a), timeout=DEBATE_ANSWER_TIMEOUT),
+        Stage("answer_b", lambda: answer("B", model_b), timeout=DEBATE_ANSWER_TIMEOUT),
+        Stage(
+            "evidence",
+            lambda: retrieve_evidence(q, lang=ev_lang, max_pages=3, full_text=True),
+            timeout=DEBATE_RETRIEVAL_TIMEOUT,
+            default=[],
+        ),
+        Stage(
+            "documents",
+            lambda: asyncio.to_thread(search_user_documents, user_id, q, k=DEBATE_DOCUMENT_PASSAGES),
+            timeout=DEBATE_RETRIEVAL_TIMEOUT,
+            default=[],
+        ),
+        Stage(
+            "rounds",
+            lambda answer_a, answer_b: _debate_rounds(
+                q,
+                {"A": answer_a, "B": answer_b},
+                {"A": model_a, "B": model_b},
+                keys,
+                max_rounds=max_rounds,
+                use_cache=use_cache,
+                emit=emit,
+            ),
+            deps=("answer_a", "answer_b"),
+        ),
+        Stage(
+            "rerank",
+            lambda rounds, evidence, documents: rerank(
+                rounds["answer_a"], rounds["answer_b"], evidence, documents
+            ),
+            deps=("rounds", "evidence", "documents"),
+            default=None,
+        ),
+        Stage(
+            "judge",
+            lambda rounds, evidence, documents, rerank: judge(
+                rounds["answer_a"],
+                rounds["answer_b"],
+                documents + _without_page_text(evidence) if rerank is None else rerank,
+            ),
+            deps=("rounds", "evidence", "documents", "rerank"),
+            timeout=DEBATE_JUDGE_TIMEOUT,
+        ),
+    ])
+    debate = results["rounds"]
+    answer_a, answer_b = debate["answer_a"], debate["answer_b"]
+    evidence = results["rerank"]
+    if evidence is None:
+        evidence = results["documents"] + _without_page_text(results["evidence"])
+    raw = results["judge"]
 
     obj = _extract_first_json_object(raw) or {}
 
@@ -314,11 +1018,13 @@ async def run_debate_and_converge(
             url = str(s.get("url", "")).strip()
             if lbl and url:
                 norm_sources.append({"label": lbl, "url": url})
-    # If model didn't include sources, add evidence urls
+    # If model didn't include sources, add evidence urls (several passages may share a page)
     if not norm_sources and evidence:
+        seen = set()
         for i, item in enumerate(evidence, start=1):
             u = str(item.get("url", "")).strip()
-            if u:
+            if u and u not in seen:
+                seen.add(u)
                 norm_sources.append({"label": f"E{i}", "url": u})
 
     data = {
@@ -333,5 +1039,18 @@ async def run_debate_and_converge(
         "sources": norm_sources,
         "confidence": str(obj.get("confidence", "")).strip() or "medium",
         "raw": raw,
+        "timings_ms": timings,
+        # Revision rounds after the initial answers (answer_a/answer_b are the final ones).
+        "initial_answers": {"A": results["answer_a"], "B": results["answer_b"]},
+        "rounds": debate["rounds"],
+        "rounds_run": 1 + len(debate["rounds"]),
+        "agreement": debate["agreement"],
+        "stop_reason": debate["stop_reason"],
+        "lang": answer_lang,
+        # Answer claims with a stored verdict, and whether those made the judge call unnecessary
+        # ("stored": the verdict above was rebuilt from earlier verdicts, not judged now).
+        "reused_claims": reuse["claims"],
+        "judge_skipped": reuse["judge_skipped"],
+        "verdict_source": "stored" if reuse["judge_skipped"] else "judge",
     }
     return {"ok": True, "data": data}
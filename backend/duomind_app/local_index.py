@@ -0,0 +1,237 @@
+"""Offline BM25 index over a local corpus (Wikipedia dump or a folder of text files).
+
+Build once, then query without any network access:
+
+    python -m duomind_app.local_index build SOURCE [--out DIR]
+    python -m duomind_app.local_index search "query" [--dir DIR]
+
+SOURCE is a directory (every *.txt / *.md file is one document, the first line
+is its title) or a JSONL file with {"title", "text", "url"} objects per line.
+
+On-disk layout (all little-endian uint32 unless noted):
+    meta.json      corpus stats + BM25 parameters
+    vocab.json     term -> [offset into postings.bin (in entries), document frequency]
+    postings.bin   per term: df doc ids followed by df term frequencies
+    doclens.bin    token count per document
+    docs.jsonl     one {"title", "url", "text"} object per document
+    docs.idx       byte offset of each line in docs.jsonl (uint64)
+
+postings/doclens/docs are memory-mapped, so opening an index is cheap and only
+the pages a query touches are read.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import sys
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .textsim import BM25_B, BM25_K1, tokenize
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_INDEX_DIR = str(BASE_DIR / "local_index_data")
+
+K1 = BM25_K1
+B = BM25_B
+
+
+# ---- build ----
+def _iter_source(source: str) -> Iterator[Dict[str, str]]:
+    path = Path(source)
+    if path.is_dir():
+        for f in sorted(path.rglob("*")):
+            if f.suffix.lower() not in {".txt", ".md"} or not f.is_file():
+                continue
+            text = f.read_text(encoding="utf-8", errors="replace").strip()
+            if not text:
+                continue
+            title = text.splitlines()[0].lstrip("# ").strip() or f.stem
+            yield {"title": title, "url": f.resolve().as_uri(), "text": text}
+        return
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            text = str(obj.get("text") or "").strip()
+            if not text:
+                continue
+            yield {"title": str(obj.get("title") or "").strip(), "url": str(obj.get("url") or ""), "text": text}
+
+
+def build_index(source: str, out_dir: str = DEFAULT_INDEX_DIR) -> Dict[str, Any]:
+    """Build an index from `source` into `out_dir` (overwrites). Returns meta."""
+    os.makedirs(out_dir, exist_ok=True)
+    postings: Dict[str, Tuple[array, array]] = {}
+    doclens = array("I")
+    offsets = array("Q")
+
+    with open(os.path.join(out_dir, "docs.jsonl"), "wb") as docs:
+        for doc_id, doc in enumerate(_iter_source(source)):
+            offsets.append(docs.tell())
+            docs.write(json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n")
+            counts = Counter(tokenize(doc["title"] + "\n" + doc["text"]))
+            doclens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = (array("I"), array("I"))
+                    postings[term] = entry
+                entry[0].append(doc_id)
+                entry[1].append(tf)
+
+    vocab: Dict[str, List[int]] = {}
+    with open(os.path.join(out_dir, "postings.bin"), "wb") as fh:
+        pos = 0
+        for term in sorted(postings):
+            ids, tfs = postings[term]
+            vocab[term] = [pos, len(ids)]
+            fh.write(_le(ids).tobytes())
+            fh.write(_le(tfs).tobytes())
+            pos += 2 * len(ids)
+
+    with open(os.path.join(out_dir, "doclens.bin"), "wb") as fh:
+        fh.write(_le(doclens).tobytes())
+    with open(os.path.join(out_dir, "docs.idx"), "wb") as fh:
+        fh.write(_le(offsets).tobytes())
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as fh:
+        json.dump(vocab, fh, ensure_ascii=False, separators=(",", ":"))
+
+    n = len(doclens)
+    meta = {
+        "version": 1,
+        "n_docs": n,
+        "n_terms": len(vocab),
+        "avgdl": (sum(doclens) / n) if n else 0.0,
+        "k1": K1,
+        "b": B,
+        "built_at": int(time.time()),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+def _le(arr: array) -> array:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+def _view(mm: Optional[mmap.mmap], fmt: str) -> memoryview:
+    if mm is None:
+        return memoryview(b"").cast(fmt)
+    return memoryview(mm).cast(fmt)
+
+
+# ---- query ----
+class LocalIndex:
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as fh:
+            self.vocab: Dict[str, List[int]] = json.load(fh)
+        if sys.byteorder != "little":
+            raise RuntimeError("local_index: big-endian hosts are not supported")
+        self._files = []
+        self._postings = _view(self._map("postings.bin"), "I")
+        self._doclens = _view(self._map("doclens.bin"), "I")
+        self._offsets = _view(self._map("docs.idx"), "Q")
+        self._docs = self._map("docs.jsonl")
+        self.n_docs = int(self.meta["n_docs"])
+        self.avgdl = float(self.meta["avgdl"]) or 1.0
+        self.k1 = float(self.meta.get("k1", K1))
+        self.b = float(self.meta.get("b", B))
+
+    def _map(self, name: str) -> Optional[mmap.mmap]:
+        fh = open(os.path.join(self.index_dir, name), "rb")
+        self._files.append(fh)
+        if os.fstat(fh.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        for fh in self._files:
+            fh.close()
+        self._files = []
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        start = self._offsets[doc_id]
+        end = self._offsets[doc_id + 1] if doc_id + 1 < self.n_docs else len(self._docs)
+        return json.loads(self._docs[start:end].decode("utf-8"))
+
+    def search(self, query: str, *, limit: int = 5) -> List[Tuple[int, float]]:
+        """BM25 top-`limit` (doc_id, score) pairs."""
+        scores: Dict[int, float] = {}
+        n, k1, b, avgdl = self.n_docs, self.k1, self.b, self.avgdl
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            pos, df = entry
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            ids = self._postings[pos:pos + df]
+            tfs = self._postings[pos + df:pos + 2 * df]
+            for doc_id, tf in zip(ids, tfs):
+                norm = k1 * (1.0 - b + b * self._doclens[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+
+
+_indexes: Dict[str, LocalIndex] = {}
+
+
+def get_index(index_dir: str = DEFAULT_INDEX_DIR) -> LocalIndex:
+    """Open (once per process) the index in `index_dir`."""
+    index = _indexes.get(index_dir)
+    if index is None:
+        index = LocalIndex(index_dir)
+        _indexes[index_dir] = index
+    return index
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m duomind_app.local_index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="build an index from a directory or JSONL dump")
+    p_build.add_argument("source")
+    p_build.add_argument("--out", default=os.getenv("LOCAL_INDEX_DIR", DEFAULT_INDEX_DIR))
+    p_search = sub.add_parser("search", help="query an existing index")
+    p_search.add_argument("query")
+    p_search.add_argument("--dir", default=os.getenv("LOCAL_INDEX_DIR", DEFAULT_INDEX_DIR))
+    p_search.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        meta = build_index(args.source, args.out)
+        print(f"indexed {meta['n_docs']} docs / {meta['n_terms']} terms into {args.out} "
+              f"in {time.perf_counter() - t0:.1f}s")
+        return 0
+
+    index = get_index(args.dir)
+    t0 = time.perf_counter()
+    hits = index.search(args.query, limit=args.limit)
+    took = (time.perf_counter() - t0) * 1000
+    for doc_id, score in hits:
+        print(f"{score:7.3f}  {index.document(doc_id)['title']}")
+    print(f"({len(hits)} hits in {took:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -11,6 +11,9 @@ from . import routes_research
 from . import routes_settings
 from . import routes_models
 from . import routes_debate
+from . import routes_documents
+from . import routes_claims
+from . import routes_quota
 
 app = FastAPI(title="DuoMind")
 
@@ -19,11 +22,39 @@ from .mcp_server import mcp
 app.mount("/mcp", mcp.streamable_http_app())
 
 from .db import init_db
+from .providers import http_pool
+from . import ingest, storage
 
 @app.on_event("startup")
 def _startup_init_db():
     init_db()
 
+
+@app.on_event("startup")
+def _startup_http_pool():
+    http_pool.startup()
+
+
+@app.on_event("shutdown")
+async def _shutdown_http_pool():
+    await http_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def _shutdown_storage():
+    storage.close_pool()
+
+
+@app.on_event("startup")
+def _startup_ingest():
+    # No-op unless INGEST_SOURCE_DIR is set (see ingest.py).
+    ingest.start_background()
+
+
+@app.on_event("shutdown")
+def _shutdown_ingest():
+    ingest.stop_background()
+
 BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
@@ -37,6 +68,9 @@ app.include_router(routes_research.router)
 app.include_router(routes_settings.router)
 app.include_router(routes_models.router)
 app.include_router(routes_debate.router)
+app.include_router(routes_documents.router)
+app.include_router(routes_claims.router)
+app.include_router(routes_quota.router)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
 
-from .llm_orchestrator import run_dual_research, run_compare_reconcile, run_debate_and_converge
+from .llm_orchestrator import (
+    run_compare_reconcile,
+    run_debate_and_converge,
+    run_dual_research,
+    run_multi_research,
+)
 
 mcp = FastMCP("DuoMind", json_response=True)
 
@@ -16,6 +21,8 @@ async def duomind_dual_research(
     model_b: str = "gemini:1.5-flash",
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """Run DuoMind dual research (two models + lightweight synthesis)."""
     return await run_dual_research(
@@ -24,6 +31,28 @@ async def duomind_dual_research(
         model_b=model_b,
         openai_key=openai_key,
         gemini_key=gemini_key,
+        mistral_key=mistral_key,
+        use_cache=use_cache,
+    )
+
+
+@mcp.tool()
+async def duomind_multi_research(
+    query: str,
+    models: List[str],
+    openai_key: Optional[str] = None,
+    gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """Ask several models at once; returns all answers plus a pairwise agreement matrix and consensus score."""
+    return await run_multi_research(
+        query=query,
+        models=models,
+        openai_key=openai_key,
+        gemini_key=gemini_key,
+        mistral_key=mistral_key,
+        use_cache=use_cache,
     )
 
 
@@ -35,6 +64,8 @@ async def duomind_compare_reconcile_tool(
     lang: str = "en",
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """LLM-powered comparison/reconciliation (returns JSON)."""
     return await run_compare_reconcile(
@@ -44,6 +75,8 @@ async def duomind_compare_reconcile_tool(
         lang=lang,
         openai_key=openai_key,
         gemini_key=gemini_key,
+        mistral_key=mistral_key,
+        use_cache=use_cache,
     )
 
 
@@ -55,8 +88,14 @@ async def duomind_debate_and_converge(
     lang: str = "en",
     openai_key: Optional[str] = None,
     gemini_key: Optional[str] = None,
+    mistral_key: Optional[str] = None,
+    use_cache: bool = True,
+    max_rounds: Optional[int] = None,
 ) -> Dict[str, Any]:
-    """Two-LLM debate + public retrieval (Wikipedia) + evidence-gated final answer."""
+    """Two-LLM debate + public retrieval (Wikipedia) + evidence-gated final answer.
+
+    max_rounds > 1 lets both models revise after seeing each other's claims (stops early on convergence).
+    """
     return await run_debate_and_converge(
         query=query,
         model_a=model_a,
@@ -64,4 +103,7 @@ async def duomind_debate_and_converge(
         lang=lang,
         openai_key=openai_key,
         gemini_key=gemini_key,
+        mistral_key=mistral_key,
+        use_cache=use_cache,
+        max_rounds=max_rounds,
     )
@@ -30,6 +30,10 @@ class Session(Base):
     id = Column(String, primary_key=True, default=uuid4_str)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     user_query = Column(Text, nullable=False)
+    # "research" | "debate" (sessions written by claim_store.py)
+    kind = Column(String, nullable=True)
+    # Answer language of a debate; stored verdicts are only reused for the same language.
+    lang = Column(String, nullable=True)
     status = Column(String, default="draft")
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
@@ -49,6 +53,12 @@ class Note(Base):
         String, ForeignKey("sessions.id", ondelete="CASCADE"), index=True, nullable=False
     )
     claim = Column(Text, nullable=False)
+    # Lower-cased content words of `claim` (claim_store.normalize_claim); lookup key.
+    claim_norm = Column(Text, nullable=True, index=True)
+    # "supported" | "rejected" (judged) | "agreed" | "unverified"
+    verdict = Column(String, nullable=True)
+    # Which side made the claim: "A", "B" or "judge".
+    source = Column(String, nullable=True)
     evidence_json = Column(Text, nullable=True)
     confidence = Column(Float, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
@@ -0,0 +1,165 @@
+"""Per-model circuit breakers.
+
+closed    -> calls flow; outcomes are tracked over a rolling time window.
+open      -> tripped by a high error rate or too many slow calls; calls fail fast
+             (or are rerouted to a configured fallback model) until the cooldown ends.
+half_open -> a trickle of probe calls is let through; enough successes close the
+             breaker again, any failure re-opens it.
+"""
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .resilience import ProviderCallError
+
+WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "20"))
+SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+HALF_OPEN_PROBES = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1"))
+CLOSE_AFTER = int(os.getenv("LLM_BREAKER_CLOSE_AFTER", "2"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ProviderCallError):
+    """Raised instead of calling a model whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.last_error: Optional[str] = None
+        # (timestamp, ok, slow)
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > WINDOW_SECONDS:
+            self._outcomes.popleft()
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, COOLDOWN_SECONDS - (time.monotonic() - self.opened_at))
+
+    def is_open(self) -> bool:
+        """True while tripped and still cooling down (half-open counts as not open)."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < COOLDOWN_SECONDS
+
+    def allow(self) -> bool:
+        """Reserve a call slot; False means fail fast."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < COOLDOWN_SECONDS:
+                return False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= HALF_OPEN_PROBES:
+                return False
+            self.probes_in_flight += 1
+        return True
+
+    def record(self, ok: Optional[bool], latency: float = 0.0, error: Optional[str] = None) -> None:
+        """Record a call outcome. ok=None means "not the provider's fault" (e.g. a 401)."""
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if ok is False:
+                self._trip(now, error)
+            elif ok:
+                self.probe_successes += 1
+                if self.probe_successes >= CLOSE_AFTER:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+            return
+        if ok is None or self.state == OPEN:
+            return
+        if error:
+            self.last_error = error
+        self._outcomes.append((now, ok, latency >= SLOW_CALL_SECONDS))
+        self._prune(now)
+        total = len(self._outcomes)
+        if total < MIN_CALLS:
+            return
+        failures = sum(1 for _, good, _ in self._outcomes if not good)
+        slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+        if failures / total >= ERROR_RATE or slow / total >= SLOW_RATE:
+            self._trip(now, error)
+
+    def _trip(self, now: float, error: Optional[str]) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        if error:
+            self.last_error = error
+        self._outcomes.clear()
+
+    def open_error(self) -> CircuitOpenError:
+        return CircuitOpenError(
+            self.name.split(":", 1)[0],
+            f"{self.name} is temporarily unavailable (circuit open)",
+            status_code=503,
+            retry_after=self.retry_after() or COOLDOWN_SECONDS,
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        total = len(self._outcomes)
+        failures = sum(1 for _, good, _ in self._outcomes if not good)
+        return {
+            "state": self.state,
+            "calls_in_window": total,
+            "error_rate": round(failures / total, 3) if total else 0.0,
+            "trips": self.trips,
+            "retry_after": round(self.retry_after(), 1),
+            "last_error": self.last_error,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model_id: str) -> CircuitBreaker:
+    breaker = _breakers.get(model_id)
+    if breaker is None:
+        breaker = CircuitBreaker(model_id)
+        _breakers[model_id] = breaker
+    return breaker
+
+
+def breaker_snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
+
+
+def parse_model_map(raw: str) -> Dict[str, str]:
+    # "gemini:1.5-flash=openai:gpt-4o-mini,openai:gpt-4o=openai:gpt-4o-mini"
+    out: Dict[str, str] = {}
+    for pair in (raw or "").split(","):
+        src, sep, dst = pair.partition("=")
+        if sep and src.strip() and dst.strip():
+            out[src.strip()] = dst.strip()
+    return out
+
+
+FALLBACK_MODELS = parse_model_map(os.getenv("LLM_FALLBACK_MODELS", ""))
+
+
+def fallback_for(model_id: str) -> Optional[str]:
+    return FALLBACK_MODELS.get(model_id)
@@ -1,18 +1,87 @@
-import os, httpx
+import os
+from typing import Any, AsyncIterator, Optional
 
-async def call_gemini_model(prompt: str, model: str, api_key_override=None) -> str:
+from . import usage
+from .http_pool import get_client, iter_sse_json
+
+
+def _base_url() -> str:
+    return os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+
+
+def _candidate_text(data: dict) -> str:
+    return data["candidates"][0]["content"]["parts"][0]["text"]
+
+
+def _report_usage(data: dict) -> None:
+    # Stream chunks carry running totals, so the last report of a call is the final count.
+    u = data.get("usageMetadata") or {}
+    usage.report(u.get("promptTokenCount"), u.get("candidatesTokenCount"))
+
+
+def _response_schema(schema: Any) -> Any:
+    """JSON Schema -> Gemini's OpenAPI subset: no additionalProperties; keys keep schema order."""
+    if isinstance(schema, list):
+        return [_response_schema(s) for s in schema]
+    if not isinstance(schema, dict):
+        return schema
+    out = {k: _response_schema(v) for k, v in schema.items() if k != "additionalProperties"}
+    if isinstance(schema.get("properties"), dict):
+        out["properties"] = {k: _response_schema(v) for k, v in schema["properties"].items()}
+        out["propertyOrdering"] = list(schema["properties"])
+    return out
+
+
+def _body(prompt: str, json_schema: Optional[dict]) -> dict:
+    body: dict = {"contents": [{"parts": [{"text": prompt}]}]}
+    if json_schema:
+        body["generationConfig"] = {
+            "responseMimeType": "application/json",
+            "responseSchema": _response_schema(json_schema["schema"]),
+        }
+    return body
+
+
+async def call_gemini_model(prompt: str, model: str, api_key_override=None, json_schema: Optional[dict] = None) -> str:
     api_key = api_key_override or os.getenv("GEMINI_API_KEY")
     if not api_key:
         return f"[Gemini MOCK] {prompt}"
-    base = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(
-            f"{base}/models/{model}:generateContent?key={api_key}",
-            json={"contents": [{"parts": [{"text": prompt}]}]},
-        )
+    client = get_client("gemini")
+    r = await client.post(
+        f"{_base_url()}/models/{model}:generateContent?key={api_key}",
+        json=_body(prompt, json_schema),
+        timeout=30.0,
+    )
+    r.raise_for_status()
+    data = r.json()
+    _report_usage(data)
+    try:
+        return _candidate_text(data)
+    except Exception:
+        return str(data)
+
+
+async def stream_gemini_model(
+    prompt: str, model: str, api_key_override=None, json_schema: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """Yield text chunks as Gemini emits them (streamGenerateContent over SSE)."""
+    api_key = api_key_override or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        yield f"[Gemini MOCK] {prompt}"
+        return
+    client = get_client("gemini")
+    async with client.stream(
+        "POST",
+        f"{_base_url()}/models/{model}:streamGenerateContent?alt=sse&key={api_key}",
+        json=_body(prompt, json_schema),
+        timeout=30.0,
+    ) as r:
         r.raise_for_status()
-        data = r.json()
-        try:
-            return data["candidates"][0]["content"]["parts"][0]["text"]
-        except Exception:
-            return str(data)
+        async for chunk in iter_sse_json(r):
+            _report_usage(chunk)
+            try:
+                text = _candidate_text(chunk)
+            except (KeyError, IndexError, TypeError):
+                continue
+            if text:
+                yield text
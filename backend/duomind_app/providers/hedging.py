@@ -0,0 +1,118 @@
+"""Hedged requests: latency statistics and policy (registry.hedged_route_call does the racing).
+
+If a call has not answered within the LLM_HEDGE_PERCENTILE latency of its model,
+a backup call is fired and whichever answers first wins; the other is cancelled.
+The backup is an equivalent model (LLM_HEDGE_MODELS, else the model's
+LLM_FALLBACK_MODELS entry) or, for requests on the server's own key, the same
+model on <PROVIDER>_BACKUP_API_KEY. Hedging only fires for the slowest few
+percent of calls and is capped at LLM_HEDGE_MAX_RATIO of recent calls per
+model, so the extra cost stays small.
+"""
+from __future__ import annotations
+
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .circuit_breaker import parse_model_map
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Until a model has this many latency samples, hedge after LLM_HEDGE_DEFAULT_DELAY.
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "20"))
+HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# "gemini:1.5-flash=openai:gpt-4o-mini,..." (same format as LLM_FALLBACK_MODELS)
+HEDGE_MODELS = parse_model_map(os.getenv("LLM_HEDGE_MODELS", ""))
+
+
+class _ModelStats:
+    def __init__(self) -> None:
+        self.latencies: Deque[float] = deque(maxlen=_WINDOW)
+        self.decisions: Deque[bool] = deque(maxlen=_WINDOW)  # hedged or not, per call
+        self.calls = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+
+_stats: Dict[str, _ModelStats] = {}
+
+
+def _get(model_id: str) -> _ModelStats:
+    s = _stats.get(model_id)
+    if s is None:
+        s = _stats[model_id] = _ModelStats()
+    return s
+
+
+def record_latency(model_id: str, seconds: float) -> None:
+    """Successful call latency; also called with the elapsed time of a cancelled
+    slow call, so hedged-away tails still count."""
+    _get(model_id).latencies.append(seconds)
+
+
+def _percentile(values: Deque[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def hedge_delay(model_id: str) -> Optional[float]:
+    """Seconds to wait for `model_id` before hedging, or None if hedging is off."""
+    if not HEDGE_ENABLED:
+        return None
+    s = _get(model_id)
+    if len(s.latencies) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, _percentile(s.latencies, HEDGE_PERCENTILE)))
+
+
+def backup_key(provider: str, api_key: Optional[str]) -> Optional[str]:
+    """The server's backup key for `provider`, if this request runs on the server's primary key."""
+    server_key = (os.getenv(f"{provider.upper()}_API_KEY") or "").strip()
+    backup = (os.getenv(f"{provider.upper()}_BACKUP_API_KEY") or "").strip()
+    if backup and server_key and (api_key or "").strip() == server_key:
+        return backup
+    return None
+
+
+def note_call(model_id: str, hedged: bool) -> None:
+    s = _get(model_id)
+    s.calls += 1
+    s.decisions.append(hedged)
+    if hedged:
+        s.hedged += 1
+
+
+def may_hedge(model_id: str) -> bool:
+    """False once hedges make up LLM_HEDGE_MAX_RATIO of this model's recent calls."""
+    s = _get(model_id)
+    return sum(s.decisions) < max(1.0, HEDGE_MAX_RATIO * len(s.decisions))
+
+
+def note_backup_win(model_id: str) -> None:
+    _get(model_id).backup_wins += 1
+
+
+def hedge_snapshot() -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "enabled": HEDGE_ENABLED,
+        "percentile": HEDGE_PERCENTILE,
+        "max_ratio": HEDGE_MAX_RATIO,
+        "backups": dict(HEDGE_MODELS),
+        "models": {},
+    }
+    for model_id, s in sorted(_stats.items()):
+        out["models"][model_id] = {
+            "samples": len(s.latencies),
+            "p50_s": round(_percentile(s.latencies, 50), 3) if s.latencies else None,
+            "p95_s": round(_percentile(s.latencies, 95), 3) if s.latencies else None,
+            "hedge_delay_s": round(hedge_delay(model_id) or 0.0, 3),
+            "calls": s.calls,
+            "hedged": s.hedged,
+            "backup_wins": s.backup_wins,
+        }
+    return out
@@ -0,0 +1,87 @@
+"""App-scoped pooled HTTP clients for the LLM providers (and Wikipedia retrieval).
+
+One ``httpx.AsyncClient`` per provider keeps TCP/TLS connections alive across
+requests instead of paying a DNS lookup + handshake on every call.
+Clients are created in the FastAPI startup hook (``main.py``) and closed at
+shutdown; ``get_client`` also creates them lazily so the MCP tools and scripts
+work without the app lifecycle.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]").
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except Exception:
+    _HTTP2_AVAILABLE = False
+
+PROVIDERS = ("openai", "gemini", "mistral")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("LLM_HTTP2", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    # Per-request read timeouts are passed by each provider call.
+    timeout = httpx.Timeout(60.0, connect=HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=HTTP2_ENABLED and _HTTP2_AVAILABLE,
+    )
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """Return the shared client for `provider`, creating it on first use."""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _new_client()
+        _clients[provider] = client
+    return client
+
+
+def startup() -> None:
+    for provider in PROVIDERS:
+        get_client(provider)
+
+
+async def shutdown() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        if not client.is_closed:
+            await client.aclose()
+
+
+async def iter_sse_json(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the JSON payload of each `data:` line of a Server-Sent Events response."""
+    async for line in response.aiter_lines():
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            continue
+        try:
+            obj = json.loads(data)
+        except ValueError:
+            continue
+        if isinstance(obj, dict):
+            yield obj
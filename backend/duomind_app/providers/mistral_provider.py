@@ -1,15 +1,37 @@
-from typing import Optional
+import os
+from typing import AsyncIterator, Optional
 
 import httpx
 
+from . import usage
+from .http_pool import get_client, iter_sse_json
+
 
 MISTRAL_URL = "https://api.mistral.ai/v1/chat/completions"
 
 
-async def call_mistral_model(prompt: str, model: str, api_key_override: Optional[str] = None) -> str:
+def _report_usage(data: dict) -> None:
+    u = data.get("usage") or {}
+    usage.report(u.get("prompt_tokens"), u.get("completion_tokens"))
+
+
+def _response_format(json_schema: Optional[dict]) -> dict:
+    if not json_schema:
+        return {}
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": json_schema["name"], "schema": json_schema["schema"], "strict": True},
+        }
+    }
+
+
+async def call_mistral_model(
+    prompt: str, model: str, api_key_override: Optional[str] = None, json_schema: Optional[dict] = None
+) -> str:
     """Call the Mistral chat completions API and return the assistant text."""
 
-    api_key = (api_key_override or "").strip()
+    api_key = (api_key_override or os.getenv("MISTRAL_API_KEY") or "").strip()
     if not api_key:
         raise RuntimeError("Mistral API key missing")
 
@@ -22,16 +44,61 @@ async def call_mistral_model(prompt: str, model: str, api_key_override: Optional
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.3,
+        **_response_format(json_schema),
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(MISTRAL_URL, headers=headers, json=payload)
+    client = get_client("mistral")
+    resp = await client.post(MISTRAL_URL, headers=headers, json=payload, timeout=60)
 
     if resp.status_code >= 400:
-        raise RuntimeError(f"Mistral error {resp.status_code}: {resp.text}")
+        # HTTPStatusError keeps the response so retries can read status + Retry-After.
+        raise httpx.HTTPStatusError(
+            f"Mistral error {resp.status_code}: {resp.text}", request=resp.request, response=resp
+        )
 
     data = resp.json() or {}
+    _report_usage(data)
     try:
         return (data.get("choices", [])[0].get("message", {}).get("content") or "").strip()
     except Exception:
         raise RuntimeError("Mistral response contained no text output")
+
+
+async def stream_mistral_model(
+    prompt: str, model: str, api_key_override: Optional[str] = None, json_schema: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """Stream the Mistral chat completion, yielding text deltas."""
+
+    api_key = (api_key_override or os.getenv("MISTRAL_API_KEY") or "").strip()
+    if not api_key:
+        raise RuntimeError("Mistral API key missing")
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.3,
+        "stream": True,
+        **_response_format(json_schema),
+    }
+
+    client = get_client("mistral")
+    async with client.stream("POST", MISTRAL_URL, headers=headers, json=payload, timeout=60) as resp:
+        if resp.status_code >= 400:
+            body = (await resp.aread()).decode("utf-8", "replace")
+            raise httpx.HTTPStatusError(
+                f"Mistral error {resp.status_code}: {body}", request=resp.request, response=resp
+            )
+        async for chunk in iter_sse_json(resp):
+            if chunk.get("usage"):  # sent with the final chunk
+                _report_usage(chunk)
+            try:
+                delta = chunk["choices"][0]["delta"].get("content")
+            except (KeyError, IndexError, AttributeError):
+                continue
+            if delta:
+                yield delta
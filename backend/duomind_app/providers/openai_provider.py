@@ -1,21 +1,75 @@
-import os, httpx
+import os
+from typing import AsyncIterator, Optional
 
-async def call_openai_model(prompt: str, model: str, api_key_override=None) -> str:
+from . import usage
+from .http_pool import get_client, iter_sse_json
+
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+
+
+def _report_usage(data: dict) -> None:
+    u = data.get("usage") or {}
+    usage.report(u.get("prompt_tokens"), u.get("completion_tokens"))
+
+
+def _payload(prompt: str, model: str, json_schema: Optional[dict] = None) -> dict:
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a precise research assistant."},
+            {"role": "user", "content": prompt},
+        ],
+    }
+    if json_schema:
+        # Structured outputs: the reply is guaranteed to match the schema.
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": json_schema["name"], "schema": json_schema["schema"], "strict": True},
+        }
+    return payload
+
+
+async def call_openai_model(prompt: str, model: str, api_key_override=None, json_schema: Optional[dict] = None) -> str:
     api_key = api_key_override or os.getenv("OPENAI_API_KEY")
     if not api_key:
         return f"[OpenAI MOCK] {prompt}"
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": "You are a precise research assistant."},
-                    {"role": "user", "content": prompt},
-                ],
-            },
-        )
+    client = get_client("openai")
+    r = await client.post(
+        OPENAI_URL,
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json=_payload(prompt, model, json_schema),
+        timeout=30.0,
+    )
+    r.raise_for_status()
+    data = r.json()
+    _report_usage(data)
+    return data["choices"][0]["message"]["content"]
+
+
+async def stream_openai_model(
+    prompt: str, model: str, api_key_override=None, json_schema: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """Yield text deltas as OpenAI emits them (chat completions with stream=true)."""
+    api_key = api_key_override or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        yield f"[OpenAI MOCK] {prompt}"
+        return
+    client = get_client("openai")
+    async with client.stream(
+        "POST",
+        OPENAI_URL,
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        # include_usage: the last chunk carries the token counts (and no choices).
+        json={**_payload(prompt, model, json_schema), "stream": True, "stream_options": {"include_usage": True}},
+        timeout=30.0,
+    ) as r:
         r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"]
+        async for chunk in iter_sse_json(r):
+            if chunk.get("usage"):
+                _report_usage(chunk)
+            try:
+                delta = chunk["choices"][0]["delta"].get("content")
+            except (KeyError, IndexError, AttributeError):
+                continue
+            if delta:
+                yield delta
@@ -0,0 +1,326 @@
+"""Provider registry: maps model-ID prefixes ("openai:", "gemini:", ...) to async adapters.
+
+The orchestrator resolves every "<provider>:<model>" ID through here instead of
+hand-written prefix branches, so adding a provider is one `register_provider` call.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import circuit_breaker, gemini_provider, hedging, mistral_provider, openai_provider, resilience, usage
+
+CallFn = Callable[[str, str, Optional[str]], Awaitable[str]]
+StreamFn = Callable[[str, str, Optional[str]], AsyncIterator[str]]
+
+
+class ProviderAdapter:
+    """Async adapter for one LLM provider.
+
+    `call(prompt, model, api_key)` returns the full text; `stream(...)` (optional)
+    yields text deltas. Adapters with `supports_json_mode` also accept a
+    `json_schema={"name": ..., "schema": {...}}` keyword and then constrain the
+    reply to that JSON Schema. Calls share the provider's pooled HTTP client and
+    are bounded by `max_concurrency` in-flight requests per provider. Adapters pass
+    the token counts of each response to usage.report(); calls without them are
+    estimated (see providers.usage).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        call: CallFn,
+        *,
+        stream: Optional[StreamFn] = None,
+        supports_json_mode: bool = False,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.name = name
+        self.prefix = f"{name}:"
+        self.call = call
+        self.stream = stream
+        self.supports_streaming = stream is not None
+        self.supports_json_mode = supports_json_mode
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv(f"LLM_MAX_CONCURRENCY_{name.upper()}", "8"))
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def capabilities(self) -> Dict[str, object]:
+        return {
+            "provider": self.name,
+            "streaming": self.supports_streaming,
+            "json_mode": self.supports_json_mode,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_REGISTRY: Dict[str, ProviderAdapter] = {}
+
+
+def register_provider(adapter: ProviderAdapter) -> ProviderAdapter:
+    _REGISTRY[adapter.name] = adapter
+    return adapter
+
+
+def registered_providers() -> List[ProviderAdapter]:
+    return list(_REGISTRY.values())
+
+
+def provider_of(model_id: Optional[str]) -> Optional[str]:
+    """Return the registered provider name for a "<provider>:<model>" ID, else None."""
+    prefix, sep, _ = (model_id or "").partition(":")
+    if sep and prefix in _REGISTRY:
+        return prefix
+    return None
+
+
+def resolve_model(model_id: str) -> Optional[Tuple[ProviderAdapter, str]]:
+    """Split a model ID into (adapter, provider-side model name)."""
+    name = provider_of(model_id)
+    if name is None:
+        return None
+    return _REGISTRY[name], model_id.split(":", 1)[1]
+
+
+def _usable_fallback(model_id: str, keys: Dict[str, Optional[str]]) -> Optional[str]:
+    """Configured fallback for `model_id` if it is registered, keyed and not itself tripped."""
+    fb = circuit_breaker.fallback_for(model_id)
+    if not fb or fb == model_id:
+        return None
+    name = provider_of(fb)
+    if name is None or not (keys.get(name) or "").strip():
+        return None
+    if circuit_breaker.get_breaker(fb).is_open():
+        return None
+    return fb
+
+
+def pick_route(model_id: str, keys: Dict[str, Optional[str]]) -> str:
+    """Model to call right now: `model_id`, or its fallback while its breaker is open.
+
+    Raises CircuitOpenError when the breaker is open and no fallback is usable.
+    """
+    breaker = circuit_breaker.get_breaker(model_id)
+    if not breaker.is_open():
+        return model_id
+    fb = _usable_fallback(model_id, keys)
+    if fb is None:
+        raise breaker.open_error()
+    return fb
+
+
+def _json_kwargs(adapter: ProviderAdapter, json_schema: Optional[dict]) -> Dict[str, dict]:
+    # Providers without a JSON mode get the plain prompt (which still asks for JSON).
+    return {"json_schema": json_schema} if json_schema and adapter.supports_json_mode else {}
+
+
+async def _call(
+    model_id: str, prompt: str, keys: Dict[str, Optional[str]], json_schema: Optional[dict] = None
+) -> str:
+    resolved = resolve_model(model_id)
+    if resolved is None:
+        return f"Unsupported model {model_id}"
+    adapter, model = resolved
+    api_key = keys.get(adapter.name)
+    breaker = circuit_breaker.get_breaker(model_id)
+    kwargs = _json_kwargs(adapter, json_schema)
+
+    async def attempt() -> str:
+        if not breaker.allow():
+            raise breaker.open_error()
+        async with adapter._semaphore:
+            started = time.monotonic()
+            reported = usage.begin_call()
+            try:
+                text = await adapter.call(prompt, model, api_key, **kwargs)
+            except Exception as e:
+                retryable = resilience.classify(e)[0]
+                breaker.record(False if retryable else None, time.monotonic() - started, resilience.describe(e))
+                raise
+            except BaseException:
+                breaker.record(None)
+                raise
+            elapsed = time.monotonic() - started
+            breaker.record(True, elapsed)
+            hedging.record_latency(model_id, elapsed)
+            usage.record(model_id, prompt, text, reported)
+            return text
+
+    return await resilience.call_with_retry(adapter.name, api_key, adapter.max_concurrency, attempt)
+
+
+async def route_call(
+    model_id: str, prompt: str, keys: Dict[str, Optional[str]], *, json_schema: Optional[dict] = None
+) -> Tuple[str, str]:
+    """Call `model_id` (or its fallback while its circuit is open).
+
+    Returns (text, model ID that actually answered). Transient failures are retried
+    (see providers.resilience); exhausted retries raise ProviderCallError, an open
+    circuit without fallback raises CircuitOpenError.
+    """
+    target = pick_route(model_id, keys)
+    try:
+        return await _call(target, prompt, keys, json_schema), target
+    except circuit_breaker.CircuitOpenError:
+        # Lost the race for a half-open probe slot; reroute if we can.
+        fb = _usable_fallback(target, keys)
+        if fb is None:
+            raise
+        return await _call(fb, prompt, keys, json_schema), fb
+
+
+def _hedge_backup(model_id: str, keys: Dict[str, Optional[str]]) -> Optional[Tuple[str, Dict[str, Optional[str]]]]:
+    """(model ID, keys) for a hedge of `model_id`: an equivalent keyed model whose
+    breaker is closed, else the same model on the server's backup key."""
+    alt = hedging.HEDGE_MODELS.get(model_id) or circuit_breaker.fallback_for(model_id)
+    name = provider_of(alt)
+    if alt and alt != model_id and name and (keys.get(name) or "").strip():
+        if not circuit_breaker.get_breaker(alt).is_open():
+            return alt, keys
+    provider = provider_of(model_id)
+    key = hedging.backup_key(provider, keys.get(provider)) if provider else None
+    if key:
+        return model_id, {**keys, provider: key}
+    return None
+
+
+async def hedged_route_call(
+    model_id: str, prompt: str, keys: Dict[str, Optional[str]], *, json_schema: Optional[dict] = None
+) -> Tuple[str, str, Dict[str, Any]]:
+    """route_call that fires a backup call when the primary is slower than usual.
+
+    After hedging.hedge_delay(model) without an answer, the backup from
+    _hedge_backup is started; the first successful answer wins and the other call
+    is cancelled. Returns (text, model ID that answered, hedge info).
+    """
+    target = pick_route(model_id, keys)
+    backup = _hedge_backup(target, keys)
+    delay = hedging.hedge_delay(target)
+    started = time.monotonic()
+    primary = asyncio.ensure_future(route_call(target, prompt, keys, json_schema=json_schema))
+    if backup is None or delay is None:
+        hedging.note_call(target, False)
+        text, answered_by = await primary
+        return text, answered_by, {"hedged": False}
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except BaseException:
+        primary.cancel()
+        raise
+    if done or not hedging.may_hedge(target):
+        hedging.note_call(target, False)
+        text, answered_by = await primary
+        return text, answered_by, {"hedged": False}
+
+    hedging.note_call(target, True)
+    backup_model, backup_keys = backup
+    second = asyncio.ensure_future(route_call(backup_model, prompt, backup_keys, json_schema=json_schema))
+    info: Dict[str, Any] = {
+        "hedged": True,
+        "delay_ms": round(delay * 1000),
+        "backup": backup_model if backup_model != target else f"{target} (backup key)",
+    }
+    pending = {primary, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (primary, second):
+                if task in done and task.exception() is None:
+                    text, answered_by = task.result()
+                    info["winner"] = "primary" if task is primary else "backup"
+                    if task is second:
+                        hedging.note_backup_win(target)
+                    return text, answered_by, info
+        # Both failed: report the primary's error.
+        raise primary.exception()
+    finally:
+        if not primary.done():
+            # The slow primary lost; its elapsed time is a lower bound on its latency.
+            hedging.record_latency(target, time.monotonic() - started)
+        for task in (primary, second):
+            if not task.done():
+                task.cancel()
+
+
+async def call_model(model_id: str, prompt: str, keys: Dict[str, Optional[str]]) -> str:
+    """Call `model_id` with the key registered for its provider in `keys`; returns the text."""
+    text, _ = await route_call(model_id, prompt, keys)
+    return text
+
+
+async def stream_model(
+    model_id: str, prompt: str, keys: Dict[str, Optional[str]], *, json_schema: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """Yield text deltas for `model_id`; providers without streaming yield one chunk.
+
+    Callers that need breaker fallback should resolve the model with pick_route first.
+    """
+    resolved = resolve_model(model_id)
+    if resolved is None:
+        yield f"Unsupported model {model_id}"
+        return
+    adapter, model = resolved
+    api_key = keys.get(adapter.name)
+    breaker = circuit_breaker.get_breaker(model_id)
+    kwargs = _json_kwargs(adapter, json_schema)
+
+    async def open_stream() -> AsyncIterator[str]:
+        if not breaker.allow():
+            raise breaker.open_error()
+        outcome: Optional[bool] = None
+        error: Optional[str] = None
+        parts: List[str] = []
+        async with adapter._semaphore:
+            started = time.monotonic()
+            reported = usage.begin_call()
+            try:
+                if adapter.stream is None:
+                    parts.append(await adapter.call(prompt, model, api_key, **kwargs))
+                    yield parts[-1]
+                else:
+                    async for delta in adapter.stream(prompt, model, api_key, **kwargs):
+                        parts.append(delta)
+                        yield delta
+                outcome = True
+            except Exception as e:
+                outcome = False if resilience.classify(e)[0] else None
+                error = resilience.describe(e)
+                raise
+            finally:
+                breaker.record(outcome, time.monotonic() - started, error)
+                # Streams the caller stopped early were billed for what was generated so far.
+                if outcome or (error is None and parts):
+                    usage.record(model_id, prompt, "".join(parts), reported)
+
+    async for delta in resilience.stream_with_retry(adapter.name, api_key, adapter.max_concurrency, open_stream):
+        yield delta
+
+
+register_provider(
+    ProviderAdapter(
+        "openai",
+        openai_provider.call_openai_model,
+        stream=openai_provider.stream_openai_model,
+        supports_json_mode=True,
+    )
+)
+register_provider(
+    ProviderAdapter(
+        "gemini",
+        gemini_provider.call_gemini_model,
+        stream=gemini_provider.stream_gemini_model,
+        supports_json_mode=True,
+    )
+)
+register_provider(
+    ProviderAdapter(
+        "mistral",
+        mistral_provider.call_mistral_model,
+        stream=mistral_provider.stream_mistral_model,
+        supports_json_mode=True,
+    )
+)
@@ -0,0 +1,251 @@
+"""Retry + adaptive concurrency for provider calls.
+
+- Transient failures (429, 5xx, timeouts, dropped connections) are retried with
+  jittered exponential backoff; a provider `Retry-After` header wins over our own delay.
+- Every (provider, API key) pair gets an AIMD concurrency window: it grows by ~1 slot
+  per window of successes and halves on overload, so bursts queue instead of failing.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Longest provider Retry-After we are willing to sleep through inside one request.
+RETRY_MAX_WAIT = float(os.getenv("LLM_RETRY_MAX_WAIT", "20"))
+# How long a call may queue for a concurrency slot before giving up.
+QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+
+class ProviderCallError(RuntimeError):
+    """A provider call failed after retries (or could not get a slot in time)."""
+
+    def __init__(
+        self,
+        provider: str,
+        detail: str,
+        *,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(detail)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window for one (provider, key)."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, timeout: float = QUEUE_TIMEOUT) -> None:
+        async with self._cond:
+            await asyncio.wait_for(
+                self._cond.wait_for(lambda: self.in_flight < int(self.limit)),
+                timeout=timeout,
+            )
+            self.in_flight += 1
+
+    async def release(self, *, overloaded: bool = False, succeeded: bool = False) -> None:
+        async with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if overloaded:
+                # Multiplicative decrease.
+                self.limit = max(float(self.min_limit), self.limit / 2.0)
+            elif succeeded:
+                # Additive increase: +1 slot per full window of successes.
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "max_limit": self.max_limit}
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Stable, non-reversible label for an API key (never keep raw keys around)."""
+    if not (api_key or "").strip():
+        return "env"
+    return hashlib.sha256(api_key.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def get_limiter(provider: str, api_key: Optional[str], max_limit: int) -> AdaptiveLimiter:
+    k = (provider, key_fingerprint(api_key))
+    limiter = _limiters.get(k)
+    if limiter is None:
+        limiter = AdaptiveLimiter(max_limit)
+        _limiters[k] = limiter
+    return limiter
+
+
+def limiter_snapshot() -> Dict[str, Dict[str, float]]:
+    return {f"{p}:{fp}": lim.snapshot() for (p, fp), lim in _limiters.items()}
+
+
+def parse_retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds to wait according to `retry-after-ms` / `Retry-After` (delta-seconds or HTTP date)."""
+    if response is None:
+        return None
+    ms = response.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException) -> Tuple[bool, bool, Optional[int], Optional[float]]:
+    """Return (retryable, overloaded, status_code, retry_after) for a provider exception."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code in RETRYABLE_STATUS, code in OVERLOAD_STATUS, code, parse_retry_after(exc.response)
+    if isinstance(exc, httpx.TransportError):
+        # Timeouts, connection resets, protocol errors.
+        return True, isinstance(exc, httpx.TimeoutException), None, None
+    return False, False, None, None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; honors Retry-After when the provider sends one."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, RETRY_BASE_DELAY)
+    return delay
+
+
+async def _acquire(provider: str, limiter: AdaptiveLimiter) -> None:
+    try:
+        await limiter.acquire()
+    except asyncio.TimeoutError:
+        raise ProviderCallError(
+            provider,
+            f"{provider} is saturated; no capacity within {QUEUE_TIMEOUT:.0f}s",
+            status_code=503,
+            retry_after=RETRY_BASE_DELAY * 4,
+        )
+
+
+def describe(exc: BaseException) -> str:
+    """Exception summary safe to show to clients.
+
+    httpx messages include the request URL, and some providers (Gemini) put the
+    API key in its query string, so only the type and status code are kept.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"HTTP {exc.response.status_code}"
+    return type(exc).__name__
+
+
+def _give_up(provider: str, attempt: int, exc: Exception, code, retry_after) -> ProviderCallError:
+    logger.warning("%s call failed after %d attempt(s)", provider, attempt + 1, exc_info=exc)
+    return ProviderCallError(
+        provider,
+        f"{provider} unavailable after {attempt + 1} attempt(s) ({describe(exc)})",
+        status_code=code,
+        retry_after=retry_after,
+    )
+
+
+async def call_with_retry(
+    provider: str,
+    api_key: Optional[str],
+    max_concurrency: int,
+    fn: Callable[[], Awaitable[T]],
+) -> T:
+    """Run `fn()` inside the (provider, key) window, retrying transient failures."""
+    limiter = get_limiter(provider, api_key, max_concurrency)
+    attempts = max(1, RETRY_ATTEMPTS)
+    for attempt in range(attempts):
+        await _acquire(provider, limiter)
+        try:
+            result = await fn()
+        except Exception as e:
+            retryable, overloaded, code, retry_after = classify(e)
+            await limiter.release(overloaded=overloaded)
+            if not retryable:
+                raise
+            if attempt == attempts - 1 or (retry_after is not None and retry_after > RETRY_MAX_WAIT):
+                raise _give_up(provider, attempt, e, code, retry_after) from e
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+            continue
+        except BaseException:
+            # Cancelled by the caller: free the slot without judging the provider.
+            await asyncio.shield(limiter.release())
+            raise
+        await limiter.release(succeeded=True)
+        return result
+    raise AssertionError("unreachable")
+
+
+async def stream_with_retry(
+    provider: str,
+    api_key: Optional[str],
+    max_concurrency: int,
+    open_stream: Callable[[], AsyncIterator[str]],
+) -> AsyncIterator[str]:
+    """Streaming counterpart of call_with_retry.
+
+    Only failures before the first delta are retried; once text reached the caller
+    a restart would duplicate output, so later errors propagate.
+    """
+    limiter = get_limiter(provider, api_key, max_concurrency)
+    attempts = max(1, RETRY_ATTEMPTS)
+    for attempt in range(attempts):
+        await _acquire(provider, limiter)
+        started = False
+        released = False
+        try:
+            async for delta in open_stream():
+                started = True
+                yield delta
+        except Exception as e:
+            retryable, overloaded, code, retry_after = classify(e)
+            released = True
+            await limiter.release(overloaded=overloaded)
+            if started or not retryable:
+                raise
+            if attempt == attempts - 1 or (retry_after is not None and retry_after > RETRY_MAX_WAIT):
+                raise _give_up(provider, attempt, e, code, retry_after) from e
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+            continue
+        finally:
+            if not released:
+                released = True
+                await asyncio.shield(limiter.release(succeeded=started))
+        return
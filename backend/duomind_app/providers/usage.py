@@ -0,0 +1,156 @@
+"""Token counts and estimated cost of every provider call.
+
+Adapters hand the token counts of a response to `report()`. registry opens a
+slot per call with `begin_call()` and passes it to `record()` once the call
+answered; counts the provider did not send are estimated locally (~4
+characters per token). The call is priced from LLM_PRICES and added to the
+process totals and to the request's UsageMeter, if the route started one:
+
+    meter = usage.start_meter()
+    result = await run_dual_research(...)
+    meter.records  # one UsageRecord per provider call (cache hits cost nothing)
+
+The meter lives in a context variable, so tasks the orchestrator spawns
+(parallel model calls, hedges, debate stages) report into it as well.
+"""
+from __future__ import annotations
+
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from ..textsim import estimate_tokens
+
+# USD per 1M tokens, "input/output"; LLM_PRICES overrides or extends these:
+# "openai:gpt-4o-mini=0.15/0.60,mistral:mistral-small-latest=0.2/0.6"
+_DEFAULT_PRICES = {
+    "openai:gpt-4o-mini": (0.15, 0.60),
+    "openai:gpt-4o": (2.50, 10.00),
+    "gemini:1.5-flash": (0.075, 0.30),
+    "gemini:1.5-pro": (1.25, 5.00),
+    "mistral:mistral-small-latest": (0.20, 0.60),
+    "mistral:mistral-large-latest": (2.00, 6.00),
+}
+# Price of models missing from the table (err on the expensive side).
+LLM_PRICE_DEFAULT = os.getenv("LLM_PRICE_DEFAULT", "2.5/10")
+
+
+def _parse_price(raw: str) -> Tuple[float, float]:
+    inp, _, out = raw.strip().partition("/")
+    return float(inp), float(out or inp)
+
+
+def _parse_prices(raw: str) -> Dict[str, Tuple[float, float]]:
+    prices: Dict[str, Tuple[float, float]] = {}
+    for item in (raw or "").split(","):
+        model_id, sep, price = item.partition("=")
+        if sep and model_id.strip() and price.strip():
+            prices[model_id.strip()] = _parse_price(price)
+    return prices
+
+
+PRICES = {**_DEFAULT_PRICES, **_parse_prices(os.getenv("LLM_PRICES", ""))}
+DEFAULT_PRICE = _parse_price(LLM_PRICE_DEFAULT)
+
+
+class UsageRecord(NamedTuple):
+    model_id: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    estimated: bool  # True if any count came from the local estimate
+
+
+class UsageMeter:
+    """Provider calls made on behalf of one request."""
+
+    def __init__(self) -> None:
+        self.records: List[UsageRecord] = []
+
+    @property
+    def tokens(self) -> int:
+        return sum(r.prompt_tokens + r.completion_tokens for r in self.records)
+
+    @property
+    def cost_usd(self) -> float:
+        return sum(r.cost_usd for r in self.records)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": len(self.records),
+            "prompt_tokens": sum(r.prompt_tokens for r in self.records),
+            "completion_tokens": sum(r.completion_tokens for r in self.records),
+            "cost_usd": round(self.cost_usd, 6),
+            "estimated": any(r.estimated for r in self.records),
+        }
+
+
+_meter: ContextVar[Optional[UsageMeter]] = ContextVar("duomind_usage_meter", default=None)
+_slot: ContextVar[Optional[Dict[str, int]]] = ContextVar("duomind_usage_slot", default=None)
+_totals: Dict[str, Dict[str, float]] = {}
+
+
+def start_meter() -> UsageMeter:
+    """Meter the provider calls of the current request (and the tasks it starts from now on)."""
+    meter = UsageMeter()
+    _meter.set(meter)
+    return meter
+
+
+def price(model_id: str, prompt_tokens: int, completion_tokens: int) -> float:
+    inp, out = PRICES.get(model_id, DEFAULT_PRICE)
+    return (prompt_tokens * inp + completion_tokens * out) / 1_000_000
+
+
+def begin_call() -> Dict[str, int]:
+    """Open the slot the adapter's `report()` fills for the call about to be made."""
+    slot: Dict[str, int] = {}
+    _slot.set(slot)
+    return slot
+
+
+def report(prompt_tokens: Any, completion_tokens: Any) -> None:
+    """Token counts from a provider response; later reports of a call (stream chunks) win."""
+    slot = _slot.get()
+    if slot is None:
+        return
+    if isinstance(prompt_tokens, int):
+        slot["prompt_tokens"] = prompt_tokens
+    if isinstance(completion_tokens, int):
+        slot["completion_tokens"] = completion_tokens
+
+
+def record(model_id: str, prompt: str, text: str, slot: Dict[str, int]) -> UsageRecord:
+    """Price a finished call and add it to the totals and the current request's meter."""
+    prompt_tokens = slot.get("prompt_tokens")
+    completion_tokens = slot.get("completion_tokens")
+    estimated = prompt_tokens is None or completion_tokens is None
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if completion_tokens is None:
+        completion_tokens = estimate_tokens(text)
+    rec = UsageRecord(model_id, prompt_tokens, completion_tokens, price(model_id, prompt_tokens, completion_tokens), estimated)
+
+    t = _totals.get(model_id)
+    if t is None:
+        t = _totals[model_id] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "estimated": 0}
+    t["calls"] += 1
+    t["prompt_tokens"] += prompt_tokens
+    t["completion_tokens"] += completion_tokens
+    t["cost_usd"] += rec.cost_usd
+    t["estimated"] += int(estimated)
+
+    meter = _meter.get()
+    if meter is not None:
+        meter.records.append(rec)
+    return rec
+
+
+def usage_snapshot() -> Dict[str, Any]:
+    """Process-wide totals per model since start (includes MCP and other unmetered callers)."""
+    return {
+        "models": {
+            model_id: {**t, "cost_usd": round(t["cost_usd"], 6)} for model_id, t in sorted(_totals.items())
+        },
+        "prices_per_1m": {m: {"input": p[0], "output": p[1]} for m, p in sorted(PRICES.items())},
+    }
@@ -0,0 +1,242 @@
+"""Daily request quotas as (subject, day) -> count counters.
+
+Subjects are "ip:<address>" for guests and "user:<id>" for logged-in users on
+server keys. A request is counted when it is admitted: `admit()` increments the
+counter with one conditional UPDATE, so concurrent requests cannot overshoot
+the limit, and a request that then fails is handed back with `refund()`. Reads are
+primary-key lookups, answered from an in-memory front for QUOTA_MEMORY_TTL
+seconds (other workers' admissions show up after that), so neither admission
+nor /api/quota depends on the size of the history table.
+
+The same rows also sum the tokens and estimated cost (USD) of the subject's
+provider calls, added by usage_ledger.save() via `spend()`; usage_ledger checks
+them against the daily token/cost budgets.
+
+Days are UTC dates, like the CURRENT_TIMESTAMP `history.created_at` they
+replace. A subject's first counter of the day is seeded from that day's history
+rows, so counts carry over when this table is introduced mid-day.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+
+from . import storage
+
+QUOTA_MEMORY_TTL = float(os.getenv("QUOTA_MEMORY_TTL", "2"))
+# Counter rows older than this many days are deleted at the first admission of a new day.
+QUOTA_KEEP_DAYS = int(os.getenv("QUOTA_KEEP_DAYS", "7"))
+# Behind a reverse proxy that sets X-Forwarded-For (and strips client-sent ones);
+# otherwise clients could pick their own guest subject with a forged header.
+TRUST_X_FORWARDED_FOR = os.getenv("TRUST_X_FORWARDED_FOR", "false").strip().lower() in {"1", "true", "yes", "on"}
+
+_lock = threading.Lock()
+_memory: Dict[Tuple[str, str], Tuple[int, float]] = {}  # (subject, day) -> (count, read at)
+_table_ready = False
+_pruned_day: Optional[str] = None
+
+
+def client_ip(request: Request) -> str:
+    """The address guest quotas, budgets and per-IP rate limits are keyed on."""
+    if TRUST_X_FORWARDED_FOR:
+        xff = request.headers.get("x-forwarded-for")
+        if xff:
+            return xff.split(",")[0].strip() or "unknown"
+    return request.client.host if request.client else "unknown"
+
+
+def guest_subject(ip: str) -> str:
+    return f"ip:{ip}"
+
+
+def user_subject(user_id: int) -> str:
+    return f"user:{int(user_id)}"
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _ensure_table(conn: storage.PooledConnection) -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS quota_counters (
+            subject TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (subject, day)
+        ) WITHOUT ROWID
+        """
+    )
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(quota_counters)").fetchall()}
+    if "tokens" not in cols:
+        conn.execute("ALTER TABLE quota_counters ADD COLUMN tokens INTEGER NOT NULL DEFAULT 0")
+    if "cost_usd" not in cols:
+        conn.execute("ALTER TABLE quota_counters ADD COLUMN cost_usd REAL NOT NULL DEFAULT 0")
+    conn.commit()
+    _table_ready = True
+
+
+def _history_count(conn: storage.PooledConnection, subject: str, day: str) -> int:
+    kind, _, value = subject.partition(":")
+    if kind == "ip":
+        where, param = "user_id IS NULL AND ip = ?", value
+    else:
+        where, param = "user_id = ?", int(value)
+    next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    try:
+        row = conn.execute(
+            f"SELECT COUNT(*) AS c FROM history WHERE {where} AND created_at >= ? AND created_at < ?",
+            (param, day, next_day),
+        ).fetchone()
+    except sqlite3.OperationalError:  # no history table yet
+        return 0
+    return int(row["c"])
+
+
+def _seed(conn: storage.PooledConnection, subject: str, day: str) -> None:
+    """Create the subject's counter for `day` (from history) if it doesn't exist."""
+    if conn.execute("SELECT 1 FROM quota_counters WHERE subject = ? AND day = ?", (subject, day)).fetchone():
+        return
+    conn.execute(
+        "INSERT OR IGNORE INTO quota_counters (subject, day, count) VALUES (?, ?, ?)",
+        (subject, day, _history_count(conn, subject, day)),
+    )
+
+
+def _remember(subject: str, day: str, count: int) -> None:
+    with _lock:
+        _memory[(subject, day)] = (count, time.monotonic())
+        if len(_memory) > 10000:
+            for key in [k for k in _memory if k[1] != day]:
+                del _memory[key]
+
+
+def _recall(subject: str, day: str) -> Optional[int]:
+    with _lock:
+        hit = _memory.get((subject, day))
+    if hit is None or time.monotonic() - hit[1] > QUOTA_MEMORY_TTL:
+        return None
+    return hit[0]
+
+
+def _prune(conn: storage.PooledConnection, day: str) -> None:
+    global _pruned_day
+    if _pruned_day == day:
+        return
+    _pruned_day = day
+    cutoff = (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=QUOTA_KEEP_DAYS)).strftime("%Y-%m-%d")
+    conn.execute("DELETE FROM quota_counters WHERE day < ?", (cutoff,))
+
+
+def used(subject: str) -> int:
+    """Requests counted for `subject` today."""
+    day = today()
+    count = _recall(subject, day)
+    if count is not None:
+        return count
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        _seed(conn, subject, day)
+        conn.commit()
+        row = conn.execute(
+            "SELECT count FROM quota_counters WHERE subject = ? AND day = ?", (subject, day)
+        ).fetchone()
+    finally:
+        conn.close()
+    count = int(row["count"]) if row else 0
+    _remember(subject, day, count)
+    return count
+
+
+def admit(subject: str, limit: int) -> Tuple[bool, int]:
+    """Count one request for `subject` if it is under `limit` today.
+
+    Returns (admitted, count after the call). Blocking; async callers use storage.run_db.
+    """
+    day = today()
+    cached = _recall(subject, day)
+    if cached is not None and cached >= limit:
+        return False, cached
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        _prune(conn, day)
+        _seed(conn, subject, day)
+        cur = conn.execute(
+            "UPDATE quota_counters SET count = count + 1 WHERE subject = ? AND day = ? AND count < ?",
+            (subject, day, int(limit)),
+        )
+        admitted = cur.rowcount == 1
+        row = conn.execute(
+            "SELECT count FROM quota_counters WHERE subject = ? AND day = ?", (subject, day)
+        ).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    count = int(row["count"]) if row else 0
+    _remember(subject, day, count)
+    return admitted, count
+
+
+def refund(subject: Optional[str]) -> None:
+    """Give back a request counted by admit() today (it failed before producing a result)."""
+    if not subject:
+        return
+    day = today()
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        conn.execute(
+            "UPDATE quota_counters SET count = count - 1 WHERE subject = ? AND day = ? AND count > 0",
+            (subject, day),
+        )
+        row = conn.execute(
+            "SELECT count FROM quota_counters WHERE subject = ? AND day = ?", (subject, day)
+        ).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    if row is not None:
+        _remember(subject, day, int(row["count"]))
+
+
+def spend(subject: str, tokens: int, cost_usd: float) -> None:
+    """Add provider usage to `subject`'s counter for today. Blocking."""
+    day = today()
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        _seed(conn, subject, day)
+        conn.execute(
+            "UPDATE quota_counters SET tokens = tokens + ?, cost_usd = cost_usd + ? WHERE subject = ? AND day = ?",
+            (int(tokens), float(cost_usd), subject, day),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def spent(subject: str) -> Tuple[int, float]:
+    """(tokens, estimated cost in USD) of `subject`'s provider calls today. Blocking."""
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        row = conn.execute(
+            "SELECT tokens, cost_usd FROM quota_counters WHERE subject = ? AND day = ?", (subject, today())
+        ).fetchone()
+    finally:
+        conn.close()
+    return (int(row["tokens"]), float(row["cost_usd"])) if row else (0, 0.0)
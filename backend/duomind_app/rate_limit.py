@@ -0,0 +1,169 @@
+"""Token-bucket rate limits per IP, per user and per server provider key.
+
+The daily quotas (quota_store.py) cap volume; these buckets smooth bursts. A
+policy "N/S" allows N requests per S seconds with bursts of up to N. Bucket
+state lives in the shared SQLite database (`rate_buckets`) and is updated
+inside BEGIN IMMEDIATE, so every uvicorn worker process draws from the same
+budget.
+
+    @router.post("/research", dependencies=[Depends(rate_limit.limit_requests)])
+
+`limit_requests` charges the caller's bucket (user if logged in, else IP);
+`check_provider_keys` charges the server keys a request is about to use.
+Both raise 429 with a Retry-After header when the bucket is empty.
+"""
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from . import quota_store, storage
+from .providers import registry
+from .providers.resilience import key_fingerprint
+from .routes_auth import get_current_user_optional
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+# "<requests>/<seconds>"; empty disables that scope.
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "10/60")
+RATE_LIMIT_USER = os.getenv("RATE_LIMIT_USER", "30/60")
+# Per server-side provider key (guests and users without BYOK share these keys).
+RATE_LIMIT_PROVIDER_KEY = os.getenv("RATE_LIMIT_PROVIDER_KEY", "120/60")
+# Buckets untouched for this long are deleted (they would be full anyway).
+_IDLE_SECONDS = 24 * 3600
+_PRUNE_EVERY = 500
+
+
+class Policy(NamedTuple):
+    rate: float  # tokens per second
+    burst: float  # bucket capacity
+
+
+def parse_policy(raw: str) -> Optional[Policy]:
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    count, _, seconds = raw.partition("/")
+    n, s = float(count), float(seconds or 1)
+    if n <= 0 or s <= 0:
+        return None
+    return Policy(rate=n / s, burst=n)
+
+
+IP_POLICY = parse_policy(RATE_LIMIT_IP)
+USER_POLICY = parse_policy(RATE_LIMIT_USER)
+PROVIDER_KEY_POLICY = parse_policy(RATE_LIMIT_PROVIDER_KEY)
+
+_table_ready = False
+_takes = 0
+
+
+def _ensure_table(conn: storage.PooledConnection) -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    conn.commit()
+    _table_ready = True
+
+
+def take(key: str, policy: Policy, cost: float = 1.0) -> Tuple[bool, float]:
+    """Take `cost` tokens from bucket `key`. Returns (allowed, seconds until it would be).
+
+    Blocking; async callers use storage.run_db.
+    """
+    global _takes
+    now = time.time()  # wall clock: shared by all worker processes
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+        tokens = policy.burst
+        if row is not None:
+            tokens = min(policy.burst, float(row["tokens"]) + max(0.0, now - float(row["updated_at"])) * policy.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        conn.execute(
+            "INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (key, tokens, now),
+        )
+        _takes += 1
+        if _takes % _PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - _IDLE_SECONDS,))
+        conn.commit()
+    finally:
+        conn.close()
+    return allowed, 0.0 if allowed else (cost - tokens) / policy.rate
+
+
+def _too_many(scope: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Too many requests ({scope}). Please retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def limit_requests(
+    request: Request,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+) -> None:
+    """FastAPI dependency: one token from the user's bucket, or the IP's for guests."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    if current_user:
+        key, policy, scope = f"user:{current_user['id']}", USER_POLICY, "per user"
+    else:
+        key, policy, scope = f"ip:{quota_store.client_ip(request)}", IP_POLICY, "per IP"
+    if policy is None:
+        return
+    allowed, retry_after = await storage.run_db(take, key, policy)
+    if not allowed:
+        raise _too_many(scope, retry_after)
+
+
+def check_provider_keys(model_ids: Iterable[str], keys: Dict[str, Optional[str]], key_mode: str) -> None:
+    """One token per server key the request will use; raises 429 if any is exhausted.
+
+    BYOK requests are not limited here (the user's own key, the user's own provider limits).
+    Blocking, like take().
+    """
+    if not RATE_LIMIT_ENABLED or PROVIDER_KEY_POLICY is None or key_mode == "byok":
+        return
+    providers = sorted({p for p in (registry.provider_of(m) for m in model_ids) if p})
+    for provider in providers:
+        key = f"key:{provider}:{key_fingerprint(keys.get(provider))}"
+        allowed, retry_after = take(key, PROVIDER_KEY_POLICY)
+        if not allowed:
+            raise _too_many(f"{provider} server key", retry_after)
+
+
+def bucket_snapshot() -> Dict[str, Any]:
+    """Policies and live bucket counts per scope (no IPs or user IDs)."""
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        rows = conn.execute(
+            "SELECT substr(key, 1, instr(key, ':') - 1) AS scope, COUNT(*) AS n FROM rate_buckets GROUP BY scope"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "policies": {"ip": RATE_LIMIT_IP, "user": RATE_LIMIT_USER, "provider_key": RATE_LIMIT_PROVIDER_KEY},
+        "buckets": {r["scope"]: int(r["n"]) for r in rows},
+    }
@@ -2,7 +2,6 @@ from datetime import timedelta
 from pathlib import Path
 from typing import Optional
 
-import sqlite3
 from fastapi import (
     APIRouter,
     Depends,
@@ -19,6 +18,7 @@ from fastapi.templating import Jinja2Templates
 from jose import JWTError, jwt
 from pydantic import BaseModel, EmailStr
 
+from . import storage
 from .security import (
     SECRET_KEY,
     ALGORITHM,
@@ -32,7 +32,6 @@ from .security import (
 router = APIRouter()
 
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = str(BASE_DIR / "duomind.db")
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 
@@ -55,33 +54,77 @@ class LoginRequest(BaseModel):
 # DB helpers
 # =========================
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
 def init_db():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE,
-            password_hash TEXT,
-            username TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE,
+                password_hash TEXT,
+                username TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
         )
-        """
-    )
-    conn.commit()
-    conn.close()
+        conn.commit()
+    finally:
+        conn.close()
 
 
 init_db()
 
 
+def _create_user(email: str, password: str, username: str, *, suffix_taken_username: bool) -> Optional[str]:
+    """Insert a user. Returns "email_exists" / "username_taken", or None on success.
+
+    A taken username gets a numeric suffix when `suffix_taken_username` is set.
+    Blocking (SQLite + argon2 hashing); async handlers await it through storage.run_db.
+    """
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+        if cur.fetchone():
+            return "email_exists"
+
+        cur.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+        if cur.fetchone():
+            if not suffix_taken_username:
+                return "username_taken"
+            base = username
+            idx = 1
+            while True:
+                candidate = f"{base}{idx}"
+                cur.execute("SELECT 1 FROM users WHERE username = ?", (candidate,))
+                if not cur.fetchone():
+                    username = candidate
+                    break
+                idx += 1
+
+        hashed = get_password_hash(password)  # ✅ argon2
+        cur.execute(
+            "INSERT INTO users (email, password_hash, username) VALUES (?, ?, ?)",
+            (email, hashed, username),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return None
+
+
+def _check_credentials(email: str, password: str) -> bool:
+    """Blocking (SQLite + hash verification); await through storage.run_db."""
+    conn = storage.connect()
+    try:
+        user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+    finally:
+        conn.close()
+    return bool(user) and verify_password(password, user["password_hash"])
+
+
 # =========================
 # Helpers
 # =========================
@@ -202,40 +245,15 @@ async def register(request: Request):
                 status_code=status.HTTP_303_SEE_OTHER,
             )
 
-        conn = get_db()
-        cur = conn.cursor()
-
-        cur.execute("SELECT 1 FROM users WHERE email = ?", (email,))
-        if cur.fetchone():
-            conn.close()
+        error = await storage.run_db(
+            _create_user, email, password, username or email.split("@")[0], suffix_taken_username=True
+        )
+        if error:
             return RedirectResponse(
-                url="/?error=email_exists",
+                url=f"/?error={error}",
                 status_code=status.HTTP_303_SEE_OTHER,
             )
 
-        if not username:
-            username = email.split("@")[0]
-
-        cur.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-        if cur.fetchone():
-            base = username
-            idx = 1
-            while True:
-                candidate = f"{base}{idx}"
-                cur.execute("SELECT 1 FROM users WHERE username = ?", (candidate,))
-                if not cur.fetchone():
-                    username = candidate
-                    break
-                idx += 1
-
-        hashed = get_password_hash(password)  # ✅ argon2
-        cur.execute(
-            "INSERT INTO users (email, password_hash, username) VALUES (?, ?, ?)",
-            (email, hashed, username),
-        )
-        conn.commit()
-        conn.close()
-
         token = create_access_token({"sub": email})
         return build_cookie_login_response(token)
 
@@ -255,34 +273,16 @@ async def register(request: Request):
             detail="Password must be >=8 chars, >=2 digits, >=1 special, >=1 uppercase.",
         )
 
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT 1 FROM users WHERE email = ?", (req_model.email,))
-    if cur.fetchone():
-        conn.close()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-
     username = req_model.username or req_model.email.split("@")[0]
-    cur.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-    if cur.fetchone():
-        conn.close()
+    error = await storage.run_db(
+        _create_user, req_model.email, req_model.password, username, suffix_taken_username=False
+    )
+    if error:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken",
+            detail="Email already registered" if error == "email_exists" else "Username already taken",
         )
 
-    hashed = get_password_hash(req_model.password)  # ✅ argon2
-    cur.execute(
-        "INSERT INTO users (email, password_hash, username) VALUES (?, ?, ?)",
-        (req_model.email, hashed, username),
-    )
-    conn.commit()
-    conn.close()
-
     token = create_access_token({"sub": req_model.email})
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -315,13 +315,7 @@ async def login(request: Request):
         email = str(form.get("email", "")).strip().lower()
         password = str(form.get("password", ""))
 
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = cur.fetchone()
-        conn.close()
-
-        if not user or not verify_password(password, user["password_hash"]):
+        if not await storage.run_db(_check_credentials, email, password):
             return RedirectResponse(
                 url="/?error=invalid_credentials",
                 status_code=status.HTTP_303_SEE_OTHER,
@@ -340,13 +334,7 @@ async def login(request: Request):
             detail="Invalid login payload.",
         )
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE email = ?", (req_model.email,))
-    user = cur.fetchone()
-    conn.close()
-
-    if not user or not verify_password(req_model.password, user["password_hash"]):
+    if not await storage.run_db(_check_credentials, req_model.email, req_model.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
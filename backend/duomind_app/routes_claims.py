@@ -0,0 +1,26 @@
+from typing import Optional, Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from .routes_auth import get_current_user_optional
+from .claim_store import search_claims
+
+router = APIRouter(prefix="/api", tags=["claims"])
+
+
+@router.get("/claims")
+def list_claims(
+    q: str = "",
+    verdict: Optional[str] = None,
+    limit: int = 50,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    """Claims extracted from the user's research and debate results, newest first.
+
+    `q` matches claims containing all of its words; `verdict` is one of
+    supported, rejected, agreed, unverified.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    claims = search_claims(int(current_user["id"]), q, verdict=verdict, limit=max(1, min(limit, 200)))
+    return {"ok": True, "claims": claims}
@@ -1,24 +1,28 @@
 import os
+import logging
 from typing import Optional, Any, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .routes_auth import get_current_user_optional
-from .llm_orchestrator import run_debate_and_converge
-from .key_resolver import resolve_keys
+from .llm_orchestrator import run_debate_and_converge, stream_debate_and_converge
+from . import claim_store, quota_store, rate_limit, storage
+from .providers import usage
 
 # Reuse quota + history helpers from routes_research
 from .routes_research import (
-    count_guest_for_ip_today,
-    count_user_for_today,
-    save_history,
-    _missing_key_message,
-    _needs_openai,
-    _needs_gemini,
-    GUEST_MAX_PER_DAY,
-    USER_SERVER_MAX_PER_DAY,
+    store_result,
+    save_usage,
+    provider_unavailable,
+    _resolve_access,
+    _sse,
 )
+from .providers.resilience import ProviderCallError
+from .stage_graph import StageTimeout
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["debate"])
 
@@ -31,11 +35,16 @@ class DebateRequest(BaseModel):
     # Advanced: allow explicit overrides (testing)
     openai_key: Optional[str] = None
     gemini_key: Optional[str] = None
+    mistral_key: Optional[str] = None
+    # Skip the LLM response cache for this request.
+    no_cache: Optional[bool] = False
+    # Debate rounds incl. the initial answers (server default DEBATE_MAX_ROUNDS, capped).
+    max_rounds: Optional[int] = None
 
     model_config = {"protected_namespaces": ()}
 
 
-@router.post("/debate")
+@router.post("/debate", dependencies=[Depends(rate_limit.limit_requests)])
 async def debate(
     payload: DebateRequest,
     request: Request,
@@ -45,85 +54,124 @@ async def debate(
     if not query:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
 
-    client_ip = request.client.host if request.client else "unknown"
-
-    # Guests: strict daily cap + fixed cheap models.
-    if not current_user:
-        used = count_guest_for_ip_today(client_ip)
-        if used >= GUEST_MAX_PER_DAY:
-            return {
-                "ok": False,
-                "detail": (
-                    f"Daily guest limit reached for this IP ({GUEST_MAX_PER_DAY} free requests). "
-                    "Please log in or register to continue."
-                ),
-            }
-        payload.model_a = "openai:gpt-4o-mini"
-        payload.model_b = "gemini:1.5-flash"
-
-    # Resolve keys (BYOK for logged in, otherwise server env keys)
-    resolved_openai = payload.openai_key
-    resolved_gemini = payload.gemini_key
-    key_mode = "guest"
-
-    if current_user:
-        from duomind_app.db import SessionLocal
-        from duomind_app import models
-
-        db = SessionLocal()
-        try:
-            orm_user = db.query(models.User).get(current_user["id"])
-            keyset = resolve_keys(orm_user)
-        finally:
-            db.close()
-
-        key_mode = keyset.get("mode", "guest")
-        if resolved_openai is None:
-            resolved_openai = keyset.get("openai")
-        if resolved_gemini is None:
-            resolved_gemini = keyset.get("gemini")
-
-        if key_mode != "byok":
-            used_u = count_user_for_today(int(current_user["id"]))
-            if used_u >= USER_SERVER_MAX_PER_DAY:
-                return {
-                    "ok": False,
-                    "detail": (
-                        f"Daily limit reached ({USER_SERVER_MAX_PER_DAY} requests) for your account on the free tier. "
-                        "Add your own API keys in Settings to continue."
-                    ),
-                }
-    else:
-        keyset = resolve_keys(None)
-        if resolved_openai is None:
-            resolved_openai = keyset.get("openai")
-        if resolved_gemini is None:
-            resolved_gemini = keyset.get("gemini")
-
-    # Ensure needed provider keys exist
-    if _needs_openai(payload.model_a) and not (resolved_openai or "").strip():
-        return {"ok": False, "detail": _missing_key_message("openai")}
-    if _needs_gemini(payload.model_a) and not (resolved_gemini or "").strip():
-        return {"ok": False, "detail": _missing_key_message("gemini")}
-    if _needs_openai(payload.model_b) and not (resolved_openai or "").strip():
-        return {"ok": False, "detail": _missing_key_message("openai")}
-    if _needs_gemini(payload.model_b) and not (resolved_gemini or "").strip():
-        return {"ok": False, "detail": _missing_key_message("gemini")}
-
-    result = await run_debate_and_converge(
-        query=query,
-        model_a=payload.model_a,
-        model_b=payload.model_b,
-        lang=(payload.lang or "en"),
-        openai_key=resolved_openai,
-        gemini_key=resolved_gemini,
+    client_ip = quota_store.client_ip(request)
+
+    error, keys, key_mode, charge = await storage.run_db(
+        _resolve_access, payload, client_ip, current_user, guest_limit_label="free requests"
     )
+    if error:
+        return error
 
-    # save to history (reuse existing table)
+    uid = int(current_user["id"]) if current_user else None
+    meter = usage.start_meter()
     try:
-        uid = int(current_user["id"]) if current_user else None
-        save_history(uid, query, f"debate:{payload.model_a}|{payload.model_b}", result, client_ip)
+        result = await run_debate_and_converge(
+            query=query,
+            model_a=payload.model_a,
+            model_b=payload.model_b,
+            lang=(payload.lang or "en"),
+            openai_key=keys["openai"],
+            gemini_key=keys["gemini"],
+            mistral_key=keys["mistral"],
+            use_cache=not payload.no_cache,
+            user_id=uid,
+            max_rounds=payload.max_rounds,
+        )
+    except ProviderCallError as e:
+        await storage.run_db(quota_store.refund, charge)
+        raise provider_unavailable(e)
+    except StageTimeout as e:
+        await storage.run_db(quota_store.refund, charge)
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
     except Exception:
-        pass
+        logger.exception("/debate failed")
+        await storage.run_db(quota_store.refund, charge)
+        raise HTTPException(status_code=500, detail="Debate failed; please try again.")
+    finally:
+        await save_usage(meter, "debate", charge, current_user, client_ip)
+
+    # save to history (reuse existing table)
+    await storage.run_db(
+        store_result, uid, query, f"debate:{payload.model_a}|{payload.model_b}", result, client_ip,
+        claim_store.save_debate,
+    )
+
+    return {
+        "ok": True,
+        "data": result.get("data") if result.get("ok") else result,
+        "mode": key_mode,
+        "usage": meter.summary(),
+    }
+
+
+@router.post("/debate/stream", dependencies=[Depends(rate_limit.limit_requests)])
+async def debate_stream(
+    payload: DebateRequest,
+    request: Request,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    """Server-Sent Events variant of /debate.
+
+    Events: answer (per model), round (per revision round), evidence, final_answer
+    (text deltas of the judge's answer while the verdict is generated), error,
+    result (same data as /debate), end (with the request's token usage).
+    """
+    query = (payload.query or "").strip()
+    if not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+
+    client_ip = quota_store.client_ip(request)
 
-    return {"ok": True, "data": result.get("data") if result.get("ok") else result, "mode": key_mode}
+    error, keys, key_mode, charge = await storage.run_db(
+        _resolve_access, payload, client_ip, current_user, guest_limit_label="free requests"
+    )
+    if error:
+        return error
+
+    uid = int(current_user["id"]) if current_user else None
+
+    async def events():
+        result: Optional[Dict[str, Any]] = None
+        meter = usage.start_meter()
+        try:
+            async for event, data in stream_debate_and_converge(
+                query=query,
+                model_a=payload.model_a,
+                model_b=payload.model_b,
+                lang=(payload.lang or "en"),
+                openai_key=keys["openai"],
+                gemini_key=keys["gemini"],
+                mistral_key=keys["mistral"],
+                use_cache=not payload.no_cache,
+                user_id=uid,
+                max_rounds=payload.max_rounds,
+            ):
+                if event == "result":
+                    result = data
+                    data = data.get("data") if data.get("ok") else data
+                yield _sse(event, data)
+        except ProviderCallError as e:
+            err = provider_unavailable(e)
+            yield _sse("error", {"status_code": err.status_code, "detail": err.detail})
+        except StageTimeout as e:
+            yield _sse("error", {"status_code": status.HTTP_504_GATEWAY_TIMEOUT, "detail": str(e)})
+        except Exception:
+            logger.exception("/debate/stream failed")
+            yield _sse("error", {"status_code": 500, "detail": "Debate failed; please try again."})
+        finally:
+            await save_usage(meter, "debate/stream", charge, current_user, client_ip)
+
+        if result is not None:
+            await storage.run_db(
+                store_result, uid, query, f"debate:{payload.model_a}|{payload.model_b}", result, client_ip,
+                claim_store.save_debate,
+            )
+        else:
+            await storage.run_db(quota_store.refund, charge)
+        yield _sse("end", {"ok": result is not None, "mode": key_mode, "usage": meter.summary()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
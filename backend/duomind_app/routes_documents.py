@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import os
+from typing import Optional, Any, Dict
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+
+from . import storage
+from .routes_auth import get_current_user_optional
+from .vector_store import UnsupportedDocument, get_user_store, iter_chunks, iter_pages
+
+router = APIRouter(prefix="/api", tags=["documents"])
+
+MAX_UPLOAD_BYTES = int(os.getenv("DOC_MAX_UPLOAD_MB", "20")) * 1024 * 1024
+
+
+def _require_user(current_user: Optional[Dict[str, Any]]) -> int:
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return int(current_user["id"])
+
+
+@router.post("/documents")
+async def upload_document(
+    file: UploadFile = File(...),
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    """Upload a .txt / .md / .pdf file into the user's document store.
+
+    Debates of this user then also draw evidence from it.
+    """
+    uid = _require_user(current_user)
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    name = file.filename or "upload"
+    sha256 = hashlib.sha256(data).hexdigest()
+    store = await storage.run_db(get_user_store, uid)
+    existing = await storage.run_db(store.find_document, sha256=sha256)
+    if existing:
+        return {"ok": True, "document": existing, "duplicate": True}
+
+    try:
+        # Parsing, chunking and embedding are CPU-bound; keep them off the event loop.
+        doc = await asyncio.to_thread(store.add_document, name, iter_chunks(iter_pages(name, data)), sha256=sha256)
+    except UnsupportedDocument as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return {
+        "ok": True,
+        "document": {"id": doc["id"], "name": doc["name"], "chunks": doc["end"] - doc["start"]},
+        "duplicate": False,
+    }
+
+
+@router.get("/documents")
+def list_documents(current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional)):
+    uid = _require_user(current_user)
+    return {"ok": True, "documents": get_user_store(uid).list_documents()}
+
+
+@router.delete("/documents/{doc_id}")
+def delete_document(doc_id: str, current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional)):
+    uid = _require_user(current_user)
+    if not get_user_store(uid).delete_document(doc_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"ok": True}
+
+
+@router.get("/documents/search")
+def search_documents(
+    q: str,
+    k: int = 5,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    uid = _require_user(current_user)
+    hits = get_user_store(uid).search(q, k=max(1, min(k, 50)))
+    return {"ok": True, "results": [{"score": round(s, 4), **chunk} for s, chunk in hits]}
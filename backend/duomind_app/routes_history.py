@@ -1,46 +1,37 @@
 from __future__ import annotations
 
-import sqlite3
-from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 
+from . import storage
 from .routes_auth import get_current_user_optional
+from .routes_research import ensure_history_table
 
 router = APIRouter(tags=["history"])
 
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = str(BASE_DIR / "duomind.db")
+# Same table (and indexes) as routes_research.save_history writes to.
+ensure_history_table()
 
 
-def _db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def _init_db() -> None:
-    """Keep history storage compatible with routes_research.py."""
-    conn = _db()
-    cur = conn.cursor()
-    # routes_research stores the full response JSON in `response`.
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            query TEXT,
-            response BLOB,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+def _list_for_user(uid: int) -> List[Dict[str, Any]]:
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id, query, created_at
+            FROM history
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT 200
+            """,
+            (uid,),
         )
-        """
-    )
-    conn.commit()
-    conn.close()
-
-
-_init_db()
+        rows = [dict(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+    return rows
 
 
 @router.get("/history")
@@ -60,19 +51,4 @@ async def list_history(
     except Exception:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    conn = _db()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, query, created_at
-        FROM history
-        WHERE user_id = ?
-        ORDER BY id DESC
-        LIMIT 200
-        """,
-        (uid,),
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-
-    return {"items": rows}
+    return {"items": await storage.run_db(_list_for_user, uid)}
@@ -1,21 +1,32 @@
-from typing import Optional, Dict, Any
+import hmac
+import os
+from typing import Optional, Dict, Any, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 
 from .routes_auth import get_current_user_optional
 from .key_resolver import resolve_keys
+from .providers import registry, resilience, circuit_breaker, hedging, usage
+from . import ingest, llm_cache, rate_limit, storage
+from .llm_orchestrator import coalescing_stats
+from .web_retriever import evidence_cache_stats
 
 router = APIRouter(prefix="/api", tags=["models"])
 
-# Keep these conservative; only include providers you actually support in llm_orchestrator.
+# Operators send this as X-Admin-Token to get the full /providers/health report
+# (usage and cost totals, key fingerprints, breaker errors, ingest paths).
+# Unset: everyone gets the public up/down summary only.
+HEALTH_ADMIN_TOKEN = os.getenv("HEALTH_ADMIN_TOKEN", "").strip()
+
+# Keep these conservative; only include providers registered in providers/registry.py.
 GUEST_MODELS = {
     "model_a": ["openai:gpt-4o-mini"],
     "model_b": ["gemini:1.5-flash"],
 }
 
 REGISTERED_MODELS = {
-    "model_a": ["openai:gpt-4o-mini", "openai:gpt-4o"],
-    "model_b": ["gemini:1.5-flash", "gemini:1.5-pro"],
+    "model_a": ["openai:gpt-4o-mini", "openai:gpt-4o", "mistral:mistral-small-latest"],
+    "model_b": ["gemini:1.5-flash", "gemini:1.5-pro", "mistral:mistral-large-latest"],
 }
 
 
@@ -41,3 +52,49 @@ def list_models(current_user: Optional[Dict[str, Any]] = Depends(get_current_use
         pass
 
     return {"ok": True, "mode": key_mode, "models": REGISTERED_MODELS}
+
+
+def _provider_status() -> Dict[str, str]:
+    """"down" when every tracked model of the provider has an open breaker, else "up"."""
+    states: Dict[str, List[str]] = {a.name: [] for a in registry.registered_providers()}
+    for model_id, snap in circuit_breaker.breaker_snapshot().items():
+        provider = registry.provider_of(model_id)
+        if provider in states:
+            states[provider].append(snap["state"])
+    return {p: "down" if s and all(x == "open" for x in s) else "up" for p, s in states.items()}
+
+
+def _is_operator(token: Optional[str]) -> bool:
+    return bool(HEALTH_ADMIN_TOKEN) and hmac.compare_digest((token or "").encode(), HEALTH_ADMIN_TOKEN.encode())
+
+
+@router.get("/providers/health")
+def providers_health(x_admin_token: Optional[str] = Header(default=None)):
+    """Up/down status per provider.
+
+    With X-Admin-Token = HEALTH_ADMIN_TOKEN, also: circuit breaker state per model,
+    adaptive concurrency windows per (provider, key), LLM response and evidence cache
+    hit/miss counters, single-flight (request coalescing) counters, token usage and
+    estimated cost per model since start, and background corpus ingestion progress.
+
+    A breaker in "open" state means calls to that model currently fail fast (or go to
+    its LLM_FALLBACK_MODELS entry); "half_open" means recovery probes are being let through.
+    """
+    status = {"ok": True, "status": _provider_status()}
+    if not _is_operator(x_admin_token):
+        return status
+    return {
+        **status,
+        "providers": [a.capabilities() for a in registry.registered_providers()],
+        "breakers": circuit_breaker.breaker_snapshot(),
+        "hedging": hedging.hedge_snapshot(),
+        "usage": usage.usage_snapshot(),
+        "fallbacks": dict(circuit_breaker.FALLBACK_MODELS),
+        "concurrency": resilience.limiter_snapshot(),
+        "cache": llm_cache.stats(),
+        "sqlite_pool": storage.pool_stats(),
+        "rate_limits": rate_limit.bucket_snapshot(),
+        "evidence_cache": evidence_cache_stats(),
+        "coalescing": coalescing_stats(),
+        "ingest": ingest.status(),
+    }
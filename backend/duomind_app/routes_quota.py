@@ -5,22 +5,20 @@ from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends, Request
 
+from . import quota_store, storage, usage_ledger
 from .routes_auth import get_current_user_optional
-from .routes_research import GUEST_MAX_PER_DAY, count_guest_for_ip_today
-from .key_resolver import resolve_keys
+from .routes_research import (
+    GUEST_MAX_PER_DAY,
+    USER_SERVER_MAX_PER_DAY,
+    _user_keyset,
+    count_guest_for_ip_today,
+    count_user_for_today,
+)
 
 
 router = APIRouter(prefix="/api", tags=["quota"])
 
 
-def _get_client_ip(request: Request) -> str:
-    # Prefer X-Forwarded-For if behind a proxy/load balancer.
-    xff = request.headers.get("x-forwarded-for")
-    if xff:
-        return xff.split(",")[0].strip() or "unknown"
-    return request.client.host if request.client else "unknown"
-
-
 def _next_utc_midnight_iso() -> str:
     now = datetime.now(timezone.utc)
     next_midnight = datetime(now.year, now.month, now.day, tzinfo=timezone.utc) + timedelta(days=1)
@@ -34,36 +32,37 @@ async def quota(
 ):
     """Return remaining free requests for guest-like users.
 
-    Guest-like = true guests OR logged-in users without BYOK keys.
-    BYOK users are unlimited.
+    Guest-like = true guests (per IP) OR logged-in users without BYOK keys
+    (per account, mode "server"). BYOK users are unlimited. Counts come from
+    quota_store's daily counters; tokens_used/cost_usd are today's billed provider
+    usage next to the daily budgets (usage_ledger, null = no budget).
     """
 
-    client_ip = _get_client_ip(request)
+    client_ip = quota_store.client_ip(request)
 
     # Determine key mode (guest vs byok)
     key_mode = "guest"
     if current_user:
-        from duomind_app.db import SessionLocal
-        from duomind_app import models
-
-        db = SessionLocal()
-        try:
-            orm_user = db.query(models.User).get(current_user["id"])
-            keyset = resolve_keys(orm_user)
-        finally:
-            db.close()
+        keyset = await storage.run_db(_user_keyset, current_user["id"])
         key_mode = keyset.get("mode", "guest")
 
     if key_mode == "byok":
         return {"mode": "byok", "limit": None, "used": None, "remaining": None, "reset_at_utc": None}
 
-    used = count_guest_for_ip_today(client_ip)
-    limit = int(GUEST_MAX_PER_DAY)
+    if key_mode == "server":
+        used = await storage.run_db(count_user_for_today, int(current_user["id"]))
+        limit = int(USER_SERVER_MAX_PER_DAY)
+        subject = quota_store.user_subject(current_user["id"])
+    else:
+        used = await storage.run_db(count_guest_for_ip_today, client_ip)
+        limit = int(GUEST_MAX_PER_DAY)
+        subject = quota_store.guest_subject(client_ip)
     remaining = max(0, limit - used)
     return {
-        "mode": "guest",
+        "mode": key_mode,
         "limit": limit,
         "used": used,
         "remaining": remaining,
+        **(await storage.run_db(usage_ledger.status, subject)),
         "reset_at_utc": _next_utc_midnight_iso(),
     }
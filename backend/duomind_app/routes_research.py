@@ -1,18 +1,29 @@
 import os
+import math
+import logging
 import sqlite3
 import json
-from pathlib import Path
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .routes_auth import get_current_user_optional
-from .llm_orchestrator import run_dual_research, run_compare_reconcile
+from .llm_orchestrator import (
+    MULTI_MAX_MODELS,
+    run_dual_research,
+    run_compare_reconcile,
+    run_multi_research,
+    stream_dual_research,
+)
 from .key_resolver import resolve_keys
+from . import claim_store, quota_store, rate_limit, storage, usage_ledger
+from .providers import registry, usage
+from .providers.resilience import ProviderCallError
+
+logger = logging.getLogger(__name__)
 
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = str(BASE_DIR / "duomind.db")
 
 # Guest requests billed to server keys -> keep this low.
 GUEST_MAX_PER_DAY = int(os.getenv("GUEST_MAX_PER_DAY", "5"))
@@ -21,6 +32,9 @@ USER_SERVER_MAX_PER_DAY = int(os.getenv("USER_SERVER_MAX_PER_DAY", "20"))
 
 router = APIRouter(prefix="/api", tags=["research"])
 
+PROVIDER_NAMES = ("openai", "gemini", "mistral")
+GUEST_MODELS = ("openai:gpt-4o-mini", "gemini:1.5-flash")
+
 
 class ResearchRequest(BaseModel):
     query: str
@@ -30,65 +44,76 @@ class ResearchRequest(BaseModel):
     # Advanced: allow explicit overrides (e.g. for testing)
     openai_key: Optional[str] = None
     gemini_key: Optional[str] = None
+    mistral_key: Optional[str] = None
+    # Skip the LLM response cache for this request (always ask the providers).
+    no_cache: Optional[bool] = False
 
     model_config = {"protected_namespaces": ()}
 
 
+class MultiResearchRequest(BaseModel):
+    query: str
+    # 2..MULTI_MAX_MODELS full model IDs, e.g. ["openai:gpt-4o-mini", "gemini:1.5-flash", "mistral:mistral-small-latest"]
+    models: List[str]
+    openai_key: Optional[str] = None
+    gemini_key: Optional[str] = None
+    mistral_key: Optional[str] = None
+    no_cache: Optional[bool] = False
+
+
 class CompareRequest(BaseModel):
     query: str
     answer_a: str
     answer_b: str
     lang: Optional[str] = "en"
+    no_cache: Optional[bool] = False
 
     model_config = {"protected_namespaces": ()}
 
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+_history_ready = False
 
 
 def ensure_history_table():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NULL,
-            query TEXT NOT NULL,
-            model_used TEXT,
-            response TEXT,
-            ip TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    global _history_ready
+    if _history_ready:
+        return
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NULL,
+                query TEXT NOT NULL,
+                model_used TEXT,
+                response TEXT,
+                ip TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
         )
-        """
-    )
-    conn.commit()
-    conn.close()
-
-
-def _count_for_today(where_sql: str, params: tuple) -> int:
-    ensure_history_table()
-    conn = get_db()
-    cur = conn.cursor()
-    # created_at defaults to CURRENT_TIMESTAMP (UTC). Compare against UTC "now".
-    cur.execute(
-        f"SELECT COUNT(*) AS c FROM history WHERE {where_sql} AND DATE(created_at) = DATE('now')",
-        params,
-    )
-    row = cur.fetchone()
-    conn.close()
-    return int(row["c"] if row else 0)
+        # Tables created by older routes_history.py lacked these columns.
+        existing = {row["name"] for row in cur.execute("PRAGMA table_info(history)").fetchall()}
+        for column in ("model_used", "ip"):
+            if column not in existing:
+                cur.execute(f"ALTER TABLE history ADD COLUMN {column} TEXT")
+        # Per-user listing (/api/history) and per-subject day ranges (quota_store seeding).
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_history_user_created ON history (user_id, created_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_history_ip_created ON history (ip, created_at)")
+        conn.commit()
+    finally:
+        conn.close()
+    _history_ready = True
 
 
 def count_guest_for_ip_today(ip: str) -> int:
-    return _count_for_today("user_id IS NULL AND ip = ?", (ip,))
+    return quota_store.used(quota_store.guest_subject(ip))
 
 
 def count_user_for_today(user_id: int) -> int:
-    return _count_for_today("user_id = ?", (user_id,))
+    return quota_store.used(quota_store.user_subject(user_id))
 
 
 def save_history(
@@ -99,28 +124,31 @@ def save_history(
     ip: Optional[str],
 ):
     ensure_history_table()
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO history (user_id, query, model_used, response, ip) VALUES (?, ?, ?, ?, ?)",
-        (
-            user_id,
-            query,
-            model_used,
-            sqlite3.Binary(json.dumps(response, ensure_ascii=False).encode("utf-8")),
-            ip,
-        ),
-    )
-    conn.commit()
-    conn.close()
-
-
-def _needs_openai(model_id: str) -> bool:
-    return (model_id or "").startswith("openai:")
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO history (user_id, query, model_used, response, ip) VALUES (?, ?, ?, ?, ?)",
+            (
+                user_id,
+                query,
+                model_used,
+                sqlite3.Binary(json.dumps(response, ensure_ascii=False).encode("utf-8")),
+                ip,
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
 
 
-def _needs_gemini(model_id: str) -> bool:
-    return (model_id or "").startswith("gemini:")
+def _missing_provider_key(model_ids, keys: Dict[str, Optional[str]]) -> Optional[str]:
+    """Return the first registered provider used by `model_ids` that has no key, else None."""
+    for model_id in model_ids:
+        provider = registry.provider_of(model_id)
+        if provider and not (keys.get(provider) or "").strip():
+            return provider
+    return None
 
 
 def _missing_key_message(provider: str) -> str:
@@ -137,129 +165,343 @@ def _missing_key_message(provider: str) -> str:
             "If you're the admin, set GEMINI_API_KEY on the server. "
             "Otherwise, register/log in and add your own Gemini key in Settings."
         )
+    if provider == "mistral":
+        return (
+            "Mistral is not configured for guest usage. "
+            "If you're the admin, set MISTRAL_API_KEY on the server. "
+            "Otherwise, register/log in and add your own Mistral key in Settings."
+        )
     return "LLM provider is not configured. Please register/log in and add your own key."
 
 
-@router.post("/research")
-async def research(
-    payload: ResearchRequest,
-    request: Request,
-    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
-):
-    query = (payload.query or "").strip()
-    if not query:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+def _user_keyset(user_id: int) -> Dict[str, Optional[str]]:
+    from duomind_app.db import SessionLocal
+    from duomind_app import models
+
+    db = SessionLocal()
+    try:
+        orm_user = db.query(models.User).get(user_id)
+        return resolve_keys(orm_user)
+    finally:
+        db.close()
+
+
+def store_result(
+    uid: Optional[int],
+    query: str,
+    model_used: str,
+    result: Dict[str, Any],
+    client_ip: Optional[str],
+    save_claims,
+) -> None:
+    """History row + claim notes of a finished request; best effort (await via storage.run_db)."""
+    try:
+        save_history(uid, query, model_used, result, client_ip)
+    except Exception:
+        pass
+    try:
+        save_claims(uid, query, result)
+    except Exception:
+        pass
+
+
+async def save_usage(
+    meter: usage.UsageMeter,
+    route: str,
+    charge: Optional[str],
+    current_user: Optional[Dict[str, Any]],
+    client_ip: str,
+) -> None:
+    """Ledger rows for the provider calls of a request; billed to `charge` (server keys) if set."""
+    if charge:
+        subject = charge
+    elif current_user:
+        subject = quota_store.user_subject(current_user["id"])
+    else:
+        subject = quota_store.guest_subject(client_ip)
+    try:
+        await storage.run_db(usage_ledger.save, list(meter.records), route, subject, charge is not None)
+    except Exception:
+        pass
 
-    client_ip = request.client.host if request.client else "unknown"
 
+def _budget_message(reason: str, guest: bool) -> str:
+    if guest:
+        return f"{reason} Please log in or register to continue."
+    return f"{reason} Add your own API keys in Settings to continue."
+
+
+def _resolve_access(
+    payload,
+    client_ip: str,
+    current_user: Optional[Dict[str, Any]],
+    *,
+    guest_limit_label: str = "free research requests",
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Optional[str]], str, Optional[str]]:
+    """Apply quotas + key resolution shared by /research, /research/stream, /research/multi and /debate.
+
+    `payload` needs model_a/model_b (or a `models` list) and optional <provider>_key overrides.
+    Returns (error_response, keys, key_mode, charge); `keys` maps provider -> API key and
+    `error_response` is the `{ok: False, ...}` body to return when the request must stop.
+    `charge` is the quota subject this request was counted against (None if unmetered);
+    callers hand it back with quota_store.refund() when the request fails, and bill
+    the request's provider usage to it with save_usage(). Subjects over their daily
+    token/cost budget (usage_ledger) are refused.
+    May rewrite payload.model_a/model_b or payload.models (guests get fixed cheap models).
+    Blocking (SQLite/SQLAlchemy): async handlers await it through storage.run_db.
+    """
+    charge: Optional[str] = None
     # Guests: fixed cheap models, strict daily cap.
     if not current_user:
-        used = count_guest_for_ip_today(client_ip)
-        if used >= GUEST_MAX_PER_DAY:
+        charge = quota_store.guest_subject(client_ip)
+        admitted, _ = quota_store.admit(charge, GUEST_MAX_PER_DAY)
+        if not admitted:
             return {
                 "ok": False,
                 "detail": (
-                    f"Daily guest limit reached for this IP ({GUEST_MAX_PER_DAY} free research requests). "
+                    f"Daily guest limit reached for this IP ({GUEST_MAX_PER_DAY} {guest_limit_label}). "
                     "Please log in or register to continue."
                 ),
-            }
-        payload.model_a = "openai:gpt-4o-mini"
-        payload.model_b = "gemini:1.5-flash"
+            }, {}, "guest", None
+        if hasattr(payload, "models"):
+            payload.models = list(GUEST_MODELS)
+        else:
+            payload.model_a, payload.model_b = GUEST_MODELS
 
     # Resolve keys (BYOK for logged in, otherwise server env keys)
-    resolved_openai = payload.openai_key
-    resolved_gemini = payload.gemini_key
     key_mode = "guest"
-
     if current_user:
-        from duomind_app.db import SessionLocal
-        from duomind_app import models
-
-        db = SessionLocal()
-        try:
-            orm_user = db.query(models.User).get(current_user["id"])
-            keyset = resolve_keys(orm_user)
-        finally:
-            db.close()
-
+        keyset = _user_keyset(current_user["id"])
         key_mode = keyset.get("mode", "guest")
-        if resolved_openai is None:
-            resolved_openai = keyset.get("openai")
-        if resolved_gemini is None:
-            resolved_gemini = keyset.get("gemini")
 
         # Optional safety: if user has no BYOK and is using server keys, cap usage too.
         if key_mode != "byok":
-            used_u = count_user_for_today(int(current_user["id"]))
-            if used_u >= USER_SERVER_MAX_PER_DAY:
+            charge = quota_store.user_subject(current_user["id"])
+            admitted, _ = quota_store.admit(charge, USER_SERVER_MAX_PER_DAY)
+            if not admitted:
                 return {
                     "ok": False,
                     "detail": (
                         f"Daily limit reached ({USER_SERVER_MAX_PER_DAY} requests) for your account on the free tier. "
                         "Add your own API keys in Settings to continue."
                     ),
-                }
+                }, {}, key_mode, None
     else:
         keyset = resolve_keys(None)
-        if resolved_openai is None:
-            resolved_openai = keyset.get("openai")
-        if resolved_gemini is None:
-            resolved_gemini = keyset.get("gemini")
+
+    # Explicit overrides in the payload win over resolved keys.
+    keys: Dict[str, Optional[str]] = {}
+    for provider in PROVIDER_NAMES:
+        override = getattr(payload, f"{provider}_key", None)
+        keys[provider] = override if override is not None else keyset.get(provider)
 
     # Graceful fallback: if a needed provider key is missing, don't call provider (no MOCK).
-    if _needs_openai(payload.model_a) and not (resolved_openai or "").strip():
-        return {"ok": False, "detail": _missing_key_message("openai")}
-    if _needs_gemini(payload.model_a) and not (resolved_gemini or "").strip():
-        return {"ok": False, "detail": _missing_key_message("gemini")}
-    if _needs_openai(payload.model_b) and not (resolved_openai or "").strip():
-        return {"ok": False, "detail": _missing_key_message("openai")}
-    if _needs_gemini(payload.model_b) and not (resolved_gemini or "").strip():
-        return {"ok": False, "detail": _missing_key_message("gemini")}
+    model_ids = payload.models if hasattr(payload, "models") else (payload.model_a, payload.model_b)
+    missing = _missing_provider_key(model_ids, keys)
+    if missing:
+        quota_store.refund(charge)
+        return {"ok": False, "detail": _missing_key_message(missing)}, keys, key_mode, None
+
+    over = usage_ledger.over_budget(charge) if charge else None
+    if over:
+        quota_store.refund(charge)
+        return {"ok": False, "detail": _budget_message(over, not current_user)}, keys, key_mode, None
 
+    try:
+        rate_limit.check_provider_keys(model_ids, keys, key_mode)
+    except HTTPException:
+        quota_store.refund(charge)
+        raise
+
+    return None, keys, key_mode, charge
+
+
+def provider_unavailable(e: ProviderCallError) -> HTTPException:
+    """Upstream overloaded/down even after retries -> 503 with a Retry-After hint."""
+    retry_after = max(1, math.ceil(e.retry_after if e.retry_after is not None else 5))
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/research", dependencies=[Depends(rate_limit.limit_requests)])
+async def research(
+    payload: ResearchRequest,
+    request: Request,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    query = (payload.query or "").strip()
+    if not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+
+    client_ip = quota_store.client_ip(request)
+
+    error, keys, key_mode, charge = await storage.run_db(_resolve_access, payload, client_ip, current_user)
+    if error:
+        return error
+
+    meter = usage.start_meter()
     try:
         result = await run_dual_research(
             query=query,
             model_a=payload.model_a,
             model_b=payload.model_b,
-            openai_key=resolved_openai,
-            gemini_key=resolved_gemini,
+            openai_key=keys["openai"],
+            gemini_key=keys["gemini"],
+            mistral_key=keys["mistral"],
             user=current_user,
+            use_cache=not payload.no_cache,
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    try:
-        uid = int(current_user["id"]) if current_user else None
-        save_history(uid, query, f"{payload.model_a}|{payload.model_b}", result, client_ip)
+    except ProviderCallError as e:
+        await storage.run_db(quota_store.refund, charge)
+        raise provider_unavailable(e)
     except Exception:
-        pass
+        logger.exception("/research failed")
+        await storage.run_db(quota_store.refund, charge)
+        raise HTTPException(status_code=500, detail="Research failed; please try again.")
+    finally:
+        await save_usage(meter, "research", charge, current_user, client_ip)
+
+    uid = int(current_user["id"]) if current_user else None
+    await storage.run_db(
+        store_result, uid, query, f"{payload.model_a}|{payload.model_b}", result, client_ip,
+        claim_store.save_research,
+    )
 
-    return {"ok": True, "data": result, "mode": key_mode}
+    return {"ok": True, "data": result, "mode": key_mode, "usage": meter.summary()}
 
 
-@router.post("/compare")
-async def compare(
-    payload: CompareRequest,
+@router.post("/research/stream", dependencies=[Depends(rate_limit.limit_requests)])
+async def research_stream(
+    payload: ResearchRequest,
     request: Request,
     current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
 ):
+    """Server-Sent Events variant of /research.
+
+    Quota/key errors are returned as plain JSON (same body as /research) before streaming starts.
+    Events: token, model_done, error, result (final payload incl. synthesis), end
+    (with the request's token usage). History is written once the stream completes.
+    """
     query = (payload.query or "").strip()
-    a = (payload.answer_a or "").strip()
-    b = (payload.answer_b or "").strip()
-    if not query or not a or not b:
+    if not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+
+    client_ip = quota_store.client_ip(request)
+
+    error, keys, key_mode, charge = await storage.run_db(_resolve_access, payload, client_ip, current_user)
+    if error:
+        return error
+
+    async def events():
+        result: Optional[Dict[str, Any]] = None
+        meter = usage.start_meter()
+        try:
+            async for event, data in stream_dual_research(
+                query=query,
+                model_a=payload.model_a,
+                model_b=payload.model_b,
+                openai_key=keys["openai"],
+                gemini_key=keys["gemini"],
+                mistral_key=keys["mistral"],
+                user=current_user,
+                use_cache=not payload.no_cache,
+            ):
+                if event == "result":
+                    result = data
+                yield _sse(event, data)
+        finally:
+            await save_usage(meter, "research/stream", charge, current_user, client_ip)
+
+        if result is not None:
+            uid = int(current_user["id"]) if current_user else None
+            await storage.run_db(
+                store_result, uid, query, f"{payload.model_a}|{payload.model_b}", result, client_ip,
+                claim_store.save_research,
+            )
+        else:
+            await storage.run_db(quota_store.refund, charge)
+        yield _sse("end", {"ok": result is not None, "mode": key_mode, "usage": meter.summary()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/research/multi", dependencies=[Depends(rate_limit.limit_requests)])
+async def research_multi(
+    payload: MultiResearchRequest,
+    request: Request,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    """Ask 2..MULTI_MAX_MODELS models at once; returns every answer plus a pairwise
+    agreement matrix and consensus score (no extra LLM call)."""
+    query = (payload.query or "").strip()
+    if not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+    models = [m.strip() for m in payload.models if m and m.strip()]
+    if not 2 <= len(models) <= MULTI_MAX_MODELS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="query, answer_a, and answer_b are required",
+            detail=f"models must list 2 to {MULTI_MAX_MODELS} model IDs",
         )
+    unknown = [m for m in models if registry.provider_of(m) is None]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported model(s): {', '.join(unknown)}")
+    payload.models = models
 
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = quota_store.client_ip(request)
 
-    # Consume the same quotas as /research (this uses server keys unless BYOK)
-    resolved_openai = None
-    resolved_gemini = None
-    key_mode = "guest"
+    error, keys, key_mode, charge = await storage.run_db(_resolve_access, payload, client_ip, current_user)
+    if error:
+        return error
+
+    meter = usage.start_meter()
+    try:
+        result = await run_multi_research(
+            query=query,
+            models=payload.models,
+            openai_key=keys["openai"],
+            gemini_key=keys["gemini"],
+            mistral_key=keys["mistral"],
+            use_cache=not payload.no_cache,
+        )
+    except ProviderCallError as e:
+        await storage.run_db(quota_store.refund, charge)
+        raise provider_unavailable(e)
+    except Exception:
+        logger.exception("/research/multi failed")
+        await storage.run_db(quota_store.refund, charge)
+        raise HTTPException(status_code=500, detail="Research failed; please try again.")
+    finally:
+        await save_usage(meter, "research/multi", charge, current_user, client_ip)
+
+    uid = int(current_user["id"]) if current_user else None
+    await storage.run_db(
+        store_result, uid, query, "|".join(payload.models), result, client_ip, claim_store.save_research
+    )
 
+    return {"ok": True, "data": result, "mode": key_mode, "usage": meter.summary()}
+
+
+def _compare_access(
+    client_ip: str, current_user: Optional[Dict[str, Any]]
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Optional[str]], Optional[str]]:
+    """Check the same quotas and budgets as /research (this uses server keys unless BYOK).
+
+    Returns (error_response, keyset, billed subject or None for BYOK); blocking,
+    like _resolve_access.
+    """
     if not current_user:
+        subject = quota_store.guest_subject(client_ip)
         used = count_guest_for_ip_today(client_ip)
         if used >= GUEST_MAX_PER_DAY:
             return {
@@ -268,44 +510,70 @@ async def compare(
                     f"Daily guest limit reached for this IP ({GUEST_MAX_PER_DAY} free research requests). "
                     "Please log in or register to continue."
                 ),
-            }
-        keyset = resolve_keys(None)
-        resolved_openai = keyset.get("openai")
-        resolved_gemini = keyset.get("gemini")
-    else:
-        from duomind_app.db import SessionLocal
-        from duomind_app import models
+            }, {}, None
+        over = usage_ledger.over_budget(subject)
+        if over:
+            return {"ok": False, "detail": _budget_message(over, True)}, {}, None
+        return None, resolve_keys(None), subject
+
+    keyset = _user_keyset(current_user["id"])
+    key_mode = keyset.get("mode", "server")
+
+    if key_mode != "byok":
+        used_u = count_user_for_today(int(current_user["id"]))
+        if used_u >= USER_SERVER_MAX_PER_DAY:
+            return {
+                "ok": False,
+                "detail": (
+                    f"Daily limit reached ({USER_SERVER_MAX_PER_DAY} requests) for your account on the free tier. "
+                    "Add your own API keys in Settings to continue."
+                ),
+            }, keyset, None
+        subject = quota_store.user_subject(current_user["id"])
+        over = usage_ledger.over_budget(subject)
+        if over:
+            return {"ok": False, "detail": _budget_message(over, False)}, keyset, None
+        return None, keyset, subject
+    return None, keyset, None
 
-        db = SessionLocal()
-        try:
-            orm_user = db.query(models.User).get(current_user["id"])
-            keyset = resolve_keys(orm_user)
-        finally:
-            db.close()
 
-        key_mode = keyset.get("mode", "server")
-        resolved_openai = keyset.get("openai")
-        resolved_gemini = keyset.get("gemini")
+@router.post("/compare", dependencies=[Depends(rate_limit.limit_requests)])
+async def compare(
+    payload: CompareRequest,
+    request: Request,
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional),
+):
+    query = (payload.query or "").strip()
+    a = (payload.answer_a or "").strip()
+    b = (payload.answer_b or "").strip()
+    if not query or not a or not b:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="query, answer_a, and answer_b are required",
+        )
+
+    client_ip = quota_store.client_ip(request)
 
-        if key_mode != "byok":
-            used_u = count_user_for_today(int(current_user["id"]))
-            if used_u >= USER_SERVER_MAX_PER_DAY:
-                return {
-                    "ok": False,
-                    "detail": (
-                        f"Daily limit reached ({USER_SERVER_MAX_PER_DAY} requests) for your account on the free tier. "
-                        "Add your own API keys in Settings to continue."
-                    ),
-                }
+    error, keyset, charge = await storage.run_db(_compare_access, client_ip, current_user)
+    if error:
+        return error
 
-    if not (resolved_openai or "").strip() and not (resolved_gemini or "").strip():
+    if not any((keyset.get(p) or "").strip() for p in PROVIDER_NAMES):
         return {"ok": False, "detail": "Missing API key."}
 
-    return await run_compare_reconcile(
-        query=query,
-        answer_a=a,
-        answer_b=b,
-        lang=(payload.lang or "en"),
-        openai_key=resolved_openai,
-        gemini_key=resolved_gemini,
-    )
+    meter = usage.start_meter()
+    try:
+        return await run_compare_reconcile(
+            query=query,
+            answer_a=a,
+            answer_b=b,
+            lang=(payload.lang or "en"),
+            openai_key=keyset.get("openai"),
+            gemini_key=keyset.get("gemini"),
+            mistral_key=keyset.get("mistral"),
+            use_cache=not payload.no_cache,
+        )
+    except ProviderCallError as e:
+        raise provider_unavailable(e)
+    finally:
+        await save_usage(meter, "compare", charge, current_user, client_ip)
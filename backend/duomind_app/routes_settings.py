@@ -9,7 +9,7 @@ from fastapi.templating import Jinja2Templates
 
 from .routes_auth import get_current_user_optional
 from .db import SessionLocal
-from . import models
+from . import models, storage
 from .crypto_utils import encrypt_str
 
 router = APIRouter(tags=["settings"])
@@ -18,6 +18,15 @@ BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 
+def _preferred_llm(uid: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        us = db.query(models.UserSettings).filter(models.UserSettings.user_id == uid).first()
+        return us.preferred_llm if us else None
+    finally:
+        db.close()
+
+
 @router.get("/settings", response_class=HTMLResponse)
 async def settings_page(
     request: Request,
@@ -25,13 +34,7 @@ async def settings_page(
 ):
     preferred_llm = None
     if current_user:
-        db = SessionLocal()
-        try:
-            uid = int(current_user["id"])
-            us = db.query(models.UserSettings).filter(models.UserSettings.user_id == uid).first()
-            preferred_llm = us.preferred_llm if us else None
-        finally:
-            db.close()
+        preferred_llm = await storage.run_db(_preferred_llm, int(current_user["id"]))
     return templates.TemplateResponse(
         "settings.html",
         {
@@ -58,6 +61,27 @@ def _upsert_credential(db, user_id: int, provider: str, raw_key: str):
         db.add(models.ApiCredential(user_id=user_id, provider=provider, key_encrypted=enc))
 
 
+def _save_settings(uid: int, keys: Dict[str, str], preferred_llm: Optional[str]) -> None:
+    """Upsert the non-empty `keys` (provider -> raw key) and the preferred model.
+
+    Blocking (SQLAlchemy); async handlers await it through storage.run_db.
+    """
+    db = SessionLocal()
+    try:
+        for provider, raw_key in keys.items():
+            _upsert_credential(db, uid, provider, raw_key)
+
+        us = db.query(models.UserSettings).filter(models.UserSettings.user_id == uid).first()
+        if not us:
+            us = models.UserSettings(user_id=uid)
+            db.add(us)
+        us.preferred_llm = preferred_llm
+
+        db.commit()
+    finally:
+        db.close()
+
+
 async def _validate_key(provider: str, raw_key: str) -> Tuple[bool, int, str]:
     """Lightweight key validation.
 
@@ -143,29 +167,11 @@ async def api_save_settings(
         ok, code, msg = await _validate_key(prov, val)
         results[prov] = {"ok": ok, "status": "valid" if ok else "invalid", "code": code, "message": msg}
 
-    db = SessionLocal()
-    saved = []
-    try:
-        uid = int(current_user["id"])
-
-        # Only persist keys that validated.
-        for prov, val in raw_keys.items():
-            if not val:
-                continue
-            if results.get(prov, {}).get("status") == "valid":
-                _upsert_credential(db, uid, prov, val)
-                saved.append(prov)
-
-        # Preferred model setting
-        us = db.query(models.UserSettings).filter(models.UserSettings.user_id == uid).first()
-        if not us:
-            us = models.UserSettings(user_id=uid)
-            db.add(us)
-        us.preferred_llm = preferred_llm
-
-        db.commit()
-    finally:
-        db.close()
+    # Only persist keys that validated.
+    saved = [prov for prov, val in raw_keys.items() if val and results.get(prov, {}).get("status") == "valid"]
+    await storage.run_db(
+        _save_settings, int(current_user["id"]), {prov: raw_keys[prov] for prov in saved}, preferred_llm
+    )
 
     return {"ok": True, "saved": saved, "results": results}
 
@@ -187,23 +193,13 @@ async def save_settings(
     mistral_key = str(form.get("mistral_key") or "")
     preferred_llm = str(form.get("preferred_llm") or "").strip() or None
 
-    db = SessionLocal()
-    try:
-        uid = int(current_user["id"])
-        _upsert_credential(db, uid, "openai", openai_key)
-        _upsert_credential(db, uid, "gemini", gemini_key)
-        _upsert_credential(db, uid, "anthropic", anthropic_key)
-        _upsert_credential(db, uid, "openrouter", openrouter_key)
-        _upsert_credential(db, uid, "mistral", mistral_key)
-
-        us = db.query(models.UserSettings).filter(models.UserSettings.user_id == uid).first()
-        if not us:
-            us = models.UserSettings(user_id=uid)
-            db.add(us)
-        us.preferred_llm = preferred_llm
-
-        db.commit()
-    finally:
-        db.close()
+    keys = {
+        "openai": openai_key,
+        "gemini": gemini_key,
+        "anthropic": anthropic_key,
+        "openrouter": openrouter_key,
+        "mistral": mistral_key,
+    }
+    await storage.run_db(_save_settings, int(current_user["id"]), keys, preferred_llm)
 
     return RedirectResponse(url="/settings", status_code=303)
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 import os
-import sqlite3
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Optional, Dict, Any
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 
+from . import storage
+
 # =========================
 # Config
 # =========================
@@ -20,9 +20,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(
     os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080")  # 7 days
 )
 
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = str(BASE_DIR / "duomind.db")
-
 # =========================
 # Password hashing
 # =========================
@@ -74,21 +71,19 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 # Database helpers
 # =========================
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     email = (email or "").strip().lower()
     if not email:
         return None
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE email = ?", (email,))
-    row = cur.fetchone()
-    conn.close()
+    conn = storage.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM users WHERE email = ?", (email,))
+        row = cur.fetchone()
+    finally:
+        conn.close()
 
     return dict(row) if row else None
 
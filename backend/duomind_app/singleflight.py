@@ -0,0 +1,59 @@
+"""Single-flight de-duplication of identical in-flight async work.
+
+Concurrent callers with the same key await one shared task instead of each
+starting their own; the task is forgotten once it finishes, so later callers
+start fresh (the LLM response cache covers repeats after that).
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", (query or "").strip()).casefold()
+
+
+def flight_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run `fn()` once per key at a time. Returns (result, shared).
+
+        Each caller gets its own deep copy of the result. A caller that is cancelled
+        (e.g. client disconnect) does not cancel the shared task for the others.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["followers"] += 1
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result), shared
+
+    def _forget(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away.
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,92 @@
+"""Tiny async stage graph.
+
+Each stage declares the stages it depends on; it starts as soon as those have
+finished, so independent stages run concurrently. Every stage gets its own
+timeout (dependency wait time does not count against it) and may declare a
+default result to use instead of failing the whole graph.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+_NO_DEFAULT = object()
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"stage '{stage}' timed out after {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Awaitable[Any]],
+        *,
+        deps: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        default: Any = _NO_DEFAULT,
+    ):
+        """`fn` is called with one keyword argument per dependency (its result)."""
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+
+
+async def run_stage_graph(stages: List[Stage]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Run all stages; returns (results by name, per-stage timing/status info).
+
+    Stages must be listed after their dependencies. If a stage without a default
+    fails, every other stage is cancelled and the error propagates.
+    """
+    tasks: Dict[str, "asyncio.Task[Any]"] = {}
+    info: Dict[str, Dict[str, Any]] = {}
+    started_at = time.monotonic()
+
+    async def run(stage: Stage) -> Any:
+        inputs = {d: await tasks[d] for d in stage.deps}
+        t0 = time.monotonic()
+        status = "ok"
+        detail: Optional[str] = None
+        try:
+            if stage.timeout is None:
+                return await stage.fn(**inputs)
+            try:
+                return await asyncio.wait_for(stage.fn(**inputs), timeout=stage.timeout)
+            except asyncio.TimeoutError:
+                raise StageTimeout(stage.name, stage.timeout)
+        except Exception as e:
+            status = "timeout" if isinstance(e, StageTimeout) else "error"
+            detail = str(e)
+            if stage.default is _NO_DEFAULT:
+                raise
+            return stage.default
+        finally:
+            info[stage.name] = {
+                "status": status,
+                "start_ms": round((t0 - started_at) * 1000, 1),
+                "duration_ms": round((time.monotonic() - t0) * 1000, 1),
+            }
+            if detail:
+                info[stage.name]["detail"] = detail
+
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in tasks]
+        if missing:
+            raise ValueError(f"stage '{stage.name}' depends on unknown/later stages: {missing}")
+        tasks[stage.name] = asyncio.create_task(run(stage))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    return {name: t.result() for name, t in tasks.items()}, info
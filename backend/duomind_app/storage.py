@@ -0,0 +1,161 @@
+"""Pooled SQLite connections for the raw-SQL modules (history, auth, quota, cache).
+
+    conn = storage.connect()
+    try:
+        conn.execute(...)
+        conn.commit()
+    finally:
+        conn.close()  # returns the connection to the pool
+
+Async code must not call these blocking functions on the event loop (one slow
+fsync would stall every in-flight request); it awaits `run_db(fn, ...)`, which
+runs `fn` on a small dedicated thread pool:
+
+    rows = await storage.run_db(_list_for_user, uid)
+
+Connections are opened once and reused instead of per query. Every connection
+runs in WAL mode (readers don't block the writer and vice versa) with
+synchronous=NORMAL, memory-mapped reads and a larger page cache; db.py applies
+the same pragmas to the SQLAlchemy engine via `apply_pragmas`.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from .db import DB_PATH as _DB_PATH
+
+DB_PATH = str(_DB_PATH)
+
+# Idle connections kept for reuse; more may be open at once under load.
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Page cache per connection, in KiB.
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "16384"))
+# How long a writer waits for the write lock before "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Threads of the run_db executor (SQLite has one writer at a time; a few threads cover reads).
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", "4"))
+
+T = TypeVar("T")
+
+
+def apply_pragmas(conn: Any) -> None:
+    """Per-connection tuning; `conn` is a sqlite3 (or SQLAlchemy DBAPI) connection."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE:d}")
+    cur.execute(f"PRAGMA cache_size={-SQLITE_CACHE_KB:d}")
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS:d}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+
+class PooledConnection:
+    """sqlite3.Connection proxy whose close() hands the connection back to the pool."""
+
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn: sqlite3.Connection, pool: "ConnectionPool"):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name: str) -> Any:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._conn is not None:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = SQLITE_POOL_SIZE):
+        self.path = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=max(0, size))
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "discarded": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        # Pooled connections move between worker threads, but only one holds each at a time.
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        apply_pragmas(conn)
+        with self._lock:
+            self._stats["opened"] += 1
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["reused"] += 1
+        except queue.Empty:
+            conn = self._open()
+        conn.row_factory = sqlite3.Row
+        return PooledConnection(conn, self)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # uncommitted work is discarded, as on close()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            with self._lock:
+                self._stats["discarded"] += 1
+            conn.close()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "idle": self._idle.qsize(), "max_idle": self._idle.maxsize}
+
+
+_pool = ConnectionPool(DB_PATH)
+
+
+def connect() -> PooledConnection:
+    """A connection from the shared pool (row_factory=sqlite3.Row); close() returns it."""
+    return _pool.acquire()
+
+
+_executor = ThreadPoolExecutor(max_workers=max(1, DB_EXECUTOR_THREADS), thread_name_prefix="duomind-db")
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database work `fn(*args, **kwargs)` off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def pool_stats() -> Dict[str, int]:
+    return _pool.stats()
+
+
+def close_pool() -> None:
+    _pool.close_all()
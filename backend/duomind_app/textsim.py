@@ -0,0 +1,137 @@
+"""Shared text helpers: tokenizing, sentence/passage splitting and vectorized scoring.
+
+Used by the offline index (local_index.py), evidence re-ranking (web_retriever.py)
+the no-LLM answer comparison (llm_orchestrator.build_synthesis) and the
+claim store (claim_store.py).
+"""
+from __future__ import annotations
+
+import re
+from typing import List, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+# Sentence end: ., ! or ? followed by whitespace, or a line break.
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Markdown bullets and numbered-list markers ("-", "*", "•", "1.", "2)").
+_LIST_MARKER = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+# Wikipedia plaintext section headings ("== History ==").
+_HEADING_RE = re.compile(r"^\s*=+[^=]+=+\s*$", re.MULTILINE)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").casefold()) if t not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)."""
+    return max(1, len(text or "") // 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    text = _HEADING_RE.sub("\n", text or "")
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def split_claims(text: str, *, min_tokens: int = 3) -> List[str]:
+    """Sentences of an LLM answer with list markers stripped, skipping fragments
+    with fewer than `min_tokens` content words."""
+    out: List[str] = []
+    for line in (text or "").split("\n"):
+        line = _LIST_MARKER.sub("", line.strip()).strip()
+        out.extend(s for s in split_sentences(line) if len(tokenize(s)) >= min_tokens)
+    return out
+
+
+def split_passages(text: str, *, max_words: int = 80) -> List[str]:
+    """Group consecutive sentences into passages of at most ~`max_words` words."""
+    passages: List[str] = []
+    current: List[str] = []
+    words = 0
+    for sentence in split_sentences(text):
+        n = len(sentence.split())
+        if current and words + n > max_words:
+            passages.append(" ".join(current))
+            current, words = [], 0
+        current.append(sentence)
+        words += n
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(
+    docs: Sequence[Sequence[str]],
+    queries: Sequence[Sequence[str]],
+    *,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> np.ndarray:
+    """BM25 score of every tokenized doc against every tokenized query -> (n_docs, n_queries).
+
+    Corpus statistics (df, avgdl) come from `docs` itself. Only terms that occur in
+    some query are counted, so the term matrix stays small.
+    """
+    n_docs, n_queries = len(docs), len(queries)
+    vocab = {}
+    for q in queries:
+        for t in q:
+            vocab.setdefault(t, len(vocab))
+    if not n_docs or not vocab:
+        return np.zeros((n_docs, n_queries))
+
+    rows, cols = [], []
+    for i, doc in enumerate(docs):
+        for t in doc:
+            j = vocab.get(t)
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+    tf = np.zeros((n_docs, len(vocab)))
+    np.add.at(tf, (rows, cols), 1.0)
+
+    qtf = np.zeros((len(vocab), n_queries))
+    for k, q in enumerate(queries):
+        for t in q:
+            qtf[vocab[t], k] = 1.0
+
+    doclen = np.array([len(d) for d in docs], dtype=float)
+    avgdl = doclen.mean() or 1.0
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    norm = k1 * (1.0 - b + b * doclen / avgdl)
+    weights = idf * tf * (k1 + 1.0) / (tf + norm[:, None])
+    return weights @ qtf
+
+
+def tfidf_vectors(docs: Sequence[Sequence[str]]) -> np.ndarray:
+    """Row-normalized TF-IDF matrix (sublinear tf, smoothed idf) for tokenized docs."""
+    vocab: dict = {}
+    rows, cols = [], []
+    for i, doc in enumerate(docs):
+        for t in doc:
+            rows.append(i)
+            cols.append(vocab.setdefault(t, len(vocab)))
+    m = np.zeros((len(docs), max(1, len(vocab))))
+    if rows:
+        np.add.at(m, (rows, cols), 1.0)
+    df = (m > 0).sum(axis=0)
+    idf = np.log((1.0 + len(docs)) / (1.0 + df)) + 1.0
+    m = np.log1p(m) * idf
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms > 0, norms, 1.0)
+
+
+def cosine_matrix(a: Sequence[Sequence[str]], b: Sequence[Sequence[str]]) -> np.ndarray:
+    """(len(a), len(b)) TF-IDF cosine similarities; idf is fitted on a + b together."""
+    if not a or not b:
+        return np.zeros((len(a), len(b)))
+    m = tfidf_vectors(list(a) + list(b))
+    return m[: len(a)] @ m[len(a):].T
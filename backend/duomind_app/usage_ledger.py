@@ -0,0 +1,121 @@
+"""Usage ledger: one row per provider call, and daily token/cost budgets.
+
+Routes meter a request with providers.usage.start_meter() and hand the meter's
+records to `save()` when the request ends, successful or not (failed requests
+still cost tokens). Requests on server keys are billed: their tokens and
+estimated cost are also added to the subject's quota_store counter for the
+day, which `over_budget()` checks before the next request is admitted. BYOK
+requests are recorded but never billed.
+
+Budgets are per subject per UTC day and 0 disables them. Request quotas
+(GUEST_MAX_PER_DAY, ...) still apply. A budget is checked before a request
+starts, so the request that crosses it finishes and the next one is refused:
+
+    GUEST_MAX_PER_DAY=30 COST_BUDGET_GUEST_USD_PER_DAY=0.01
+
+lets guests make many cheap requests or a few debates with expensive models.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional, Sequence
+
+from . import quota_store, storage
+from .providers.usage import UsageRecord
+
+TOKEN_BUDGET_GUEST_PER_DAY = int(os.getenv("TOKEN_BUDGET_GUEST_PER_DAY", "0"))
+TOKEN_BUDGET_USER_PER_DAY = int(os.getenv("TOKEN_BUDGET_USER_PER_DAY", "0"))
+COST_BUDGET_GUEST_USD_PER_DAY = float(os.getenv("COST_BUDGET_GUEST_USD_PER_DAY", "0"))
+COST_BUDGET_USER_USD_PER_DAY = float(os.getenv("COST_BUDGET_USER_USD_PER_DAY", "0"))
+
+_table_ready = False
+
+
+def _ensure_table(conn: storage.PooledConnection) -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            route TEXT NOT NULL,
+            model_id TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            cost_usd REAL NOT NULL,
+            estimated INTEGER NOT NULL DEFAULT 0,
+            billed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_usage_ledger_subject_day ON usage_ledger (subject, day)")
+    conn.commit()
+    _table_ready = True
+
+
+def save(records: Sequence[UsageRecord], route: str, subject: str, billed: bool) -> None:
+    """Ledger rows for a request's provider calls; billed ones count against `subject`'s budgets.
+
+    Blocking; async callers use storage.run_db.
+    """
+    if not records:
+        return
+    day = quota_store.today()
+    conn = storage.connect()
+    try:
+        _ensure_table(conn)
+        conn.executemany(
+            "INSERT INTO usage_ledger (day, subject, route, model_id, prompt_tokens, completion_tokens, "
+            "cost_usd, estimated, billed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (day, subject, route, r.model_id, r.prompt_tokens, r.completion_tokens, r.cost_usd,
+                 int(r.estimated), int(billed))
+                for r in records
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if billed:
+        quota_store.spend(
+            subject,
+            sum(r.prompt_tokens + r.completion_tokens for r in records),
+            sum(r.cost_usd for r in records),
+        )
+
+
+def budgets_for(subject: str) -> Dict[str, Any]:
+    """Daily {"tokens", "cost_usd"} budgets of a subject (None = unlimited)."""
+    guest = subject.startswith("ip:")
+    tokens = TOKEN_BUDGET_GUEST_PER_DAY if guest else TOKEN_BUDGET_USER_PER_DAY
+    cost = COST_BUDGET_GUEST_USD_PER_DAY if guest else COST_BUDGET_USER_USD_PER_DAY
+    return {"tokens": tokens or None, "cost_usd": cost or None}
+
+
+def over_budget(subject: str) -> Optional[str]:
+    """Why `subject` may not start another request today, or None. Blocking."""
+    budgets = budgets_for(subject)
+    if budgets["tokens"] is None and budgets["cost_usd"] is None:
+        return None
+    tokens, cost = quota_store.spent(subject)
+    if budgets["tokens"] is not None and tokens >= budgets["tokens"]:
+        return f"Daily token budget reached ({budgets['tokens']} tokens)."
+    if budgets["cost_usd"] is not None and cost >= budgets["cost_usd"]:
+        return f"Daily usage budget reached ({budgets['cost_usd']:g} USD)."
+    return None
+
+
+def status(subject: str) -> Dict[str, Any]:
+    """Today's billed usage of `subject` next to its budgets (for /api/quota). Blocking."""
+    tokens, cost = quota_store.spent(subject)
+    budgets = budgets_for(subject)
+    return {
+        "tokens_used": tokens,
+        "cost_usd": round(cost, 6),
+        "token_budget": budgets["tokens"],
+        "cost_budget_usd": budgets["cost_usd"],
+    }
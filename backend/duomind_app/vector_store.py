@@ -0,0 +1,458 @@
+"""Per-user document store for RAG over uploaded files.
+
+Uploaded text / Markdown / PDF is split into passages, embedded locally
+(embeddings.py) and appended to an on-disk index under DOC_STORE_DIR/<user_id>/:
+
+    meta.json       dim, embedder, row count, IVF state
+    docs.json       uploaded documents (id, name, sha256, row range, deleted flag)
+    vectors.f32     float32 rows, one per chunk (memory-mapped for search)
+    chunks.jsonl    chunk text + owning document, one line per row
+    chunks.idx      byte offset of each line in chunks.jsonl (uint64)
+    chunk_hashes.u64  content hash of every row (for de-duplication)
+    ivf.npy         IVF centroids (only once the store is large)
+    ivf_assign.i32  IVF list of every row
+
+Search is exact (brute-force dot product) below IVF_MIN_VECTORS rows; above that
+an inverted-file index (spherical k-means, IVF_NPROBE lists probed per query)
+keeps queries sub-linear. Deleting a document only flags it; its rows are
+skipped at search time until compact() rewrites the files without them.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+import io
+import json
+import re
+import math
+import os
+import threading
+import time
+import uuid
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import embeddings
+from .textsim import split_passages
+
+# Optional PDF support (pip install pypdf).
+try:
+    from pypdf import PdfReader  # type: ignore
+
+    _PDF_AVAILABLE = True
+except Exception:
+    _PDF_AVAILABLE = False
+
+BASE_DIR = Path(__file__).resolve().parent
+DOC_STORE_DIR = os.getenv("DOC_STORE_DIR", str(BASE_DIR / "doc_store"))
+CHUNK_WORDS = int(os.getenv("DOC_CHUNK_WORDS", "120"))
+EMBED_BATCH = int(os.getenv("DOC_EMBED_BATCH", "64"))
+IVF_MIN_VECTORS = int(os.getenv("DOC_IVF_MIN_VECTORS", "20000"))
+IVF_NPROBE = int(os.getenv("DOC_IVF_NPROBE", "8"))
+
+TEXT_SUFFIXES = {".txt", ".md", ".markdown"}
+
+
+class UnsupportedDocument(ValueError):
+    """The uploaded file type cannot be read (or PDF support is not installed)."""
+
+
+# ---- text extraction / chunking ----
+def iter_pages(filename: str, data: bytes) -> Iterator[str]:
+    """Yield the text of an upload page by page (one "page" for plain text)."""
+    suffix = Path(filename or "").suffix.lower()
+    if suffix in TEXT_SUFFIXES:
+        yield data.decode("utf-8", errors="replace")
+        return
+    if suffix == ".pdf":
+        yield from iter_pdf_pages(io.BytesIO(data))
+        return
+    raise UnsupportedDocument(f"Unsupported file type: {suffix or 'unknown'} (use .txt, .md or .pdf)")
+
+
+def iter_pdf_pages(source: Any) -> Iterator[str]:
+    """Page texts of a PDF (`source` is a path or binary file object), read lazily."""
+    if not _PDF_AVAILABLE:
+        raise UnsupportedDocument("PDF support needs the optional 'pypdf' package")
+    for page in PdfReader(source).pages:
+        yield page.extract_text() or ""
+
+
+def iter_chunks(pages: Iterable[str], *, max_words: int = CHUNK_WORDS) -> Iterator[str]:
+    for page in pages:
+        for block in page.split("\n\n"):
+            yield from split_passages(block, max_words=max_words)
+
+
+def chunk_hash(text: str) -> int:
+    """64-bit content hash of a chunk (whitespace/case-insensitive)."""
+    norm = re.sub(r"\s+", " ", text or "").strip().casefold()
+    return int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# ---- IVF ----
+def _kmeans(vectors: np.ndarray, k: int, *, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for j in range(k):
+            members = vectors[assign == j]
+            if len(members):
+                centroids[j] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+class VectorStore:
+    def __init__(self, path: str):
+        self.path = path
+        # _write_lock serializes writers (add/delete/compact); _lock guards the short
+        # moments where files and meta change, so searches never see a half-written row.
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._hashes: Optional[Dict[int, int]] = None
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._read_json("meta.json", None) or {
+            "dim": embeddings.dimension(),
+            "embedder": embeddings.embedder_name(),
+            "count": 0,
+            "ivf_trained_at": 0,
+        }
+        self.docs: List[Dict[str, Any]] = self._read_json("docs.json", [])
+        if self.meta["embedder"] != embeddings.embedder_name() and self.meta["count"]:
+            raise RuntimeError(
+                f"document store {path} was built with {self.meta['embedder']}; "
+                f"current embedder is {embeddings.embedder_name()} (re-upload or delete the store)"
+            )
+
+    # ---- files ----
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_json(self, name: str, default: Any) -> Any:
+        try:
+            with open(self._file(name), encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name: str, value: Any) -> None:
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(value, fh, ensure_ascii=False)
+        os.replace(tmp, self._file(name))
+
+    def _vectors(self) -> np.ndarray:
+        n, dim = int(self.meta["count"]), int(self.meta["dim"])
+        if n == 0:
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(n, dim))
+
+    def _chunk(self, row: int) -> Dict[str, Any]:
+        offsets = np.memmap(self._file("chunks.idx"), dtype=np.uint64, mode="r")
+        with open(self._file("chunks.jsonl"), "rb") as fh:
+            fh.seek(int(offsets[row]))
+            return json.loads(fh.readline().decode("utf-8"))
+
+    # ---- writes ----
+    def add_document(
+        self, name: str, chunks: Iterable[str], *, sha256: str = "", dedupe: bool = False
+    ) -> Dict[str, Any]:
+        """Embed and append `chunks` (consumed lazily, EMBED_BATCH at a time).
+
+        With `dedupe`, chunks whose content hash is already stored (in a live
+        document) are skipped; the result's "skipped" counts them and "dup_of"
+        lists the documents that hold those chunks (deleting one of those drops
+        the shared chunks, so callers should re-add this document then).
+        """
+        with self._write_lock:
+            doc = {
+                "id": uuid.uuid4().hex[:12],
+                "name": name,
+                "sha256": sha256,
+                "start": int(self.meta["count"]),
+                "end": int(self.meta["count"]),
+                "created_at": int(time.time()),
+                "deleted": False,
+            }
+            seen = self._live_hashes() if dedupe else None
+            pending: set = set()
+            dup_rows: set = set()
+            skipped = 0
+            batch: List[Tuple[str, int]] = []
+            try:
+                for chunk in chunks:
+                    h = chunk_hash(chunk)
+                    if seen is not None:
+                        if h in pending:
+                            skipped += 1
+                            continue
+                        if h in seen:
+                            skipped += 1
+                            dup_rows.add(seen[h])
+                            continue
+                        pending.add(h)
+                    batch.append((chunk, h))
+                    if len(batch) >= EMBED_BATCH:
+                        self._append(doc, batch)
+                        pending.clear()
+                        batch = []
+                if batch:
+                    self._append(doc, batch)
+            except BaseException:
+                # Rows already written stay on disk; register them as deleted so
+                # search skips them and compact() reclaims them.
+                if doc["end"] > doc["start"]:
+                    with self._lock:
+                        doc["deleted"] = True
+                        self.docs.append(doc)
+                        self._hashes = None
+                        self._write_json("docs.json", self.docs)
+                        self._write_json("meta.json", self.meta)
+                raise
+            with self._lock:
+                self.docs.append(doc)
+                self._maybe_train_ivf()
+                self._write_json("docs.json", self.docs)
+                self._write_json("meta.json", self.meta)
+            return {**doc, "skipped": skipped, "dup_of": self._docs_for_rows(dup_rows)}
+
+    def _append(self, doc: Dict[str, Any], batch: List[Tuple[str, int]]) -> None:
+        texts = [t for t, _ in batch]
+        vecs = embeddings.embed(texts).astype(np.float32, copy=False)
+        offsets = array("Q")
+        with self._lock:
+            with open(self._file("chunks.jsonl"), "ab") as fh:
+                for i, text in enumerate(texts):
+                    offsets.append(fh.tell())
+                    record = {"doc_id": doc["id"], "name": doc["name"], "n": doc["end"] - doc["start"] + i, "text": text}
+                    fh.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            with open(self._file("chunks.idx"), "ab") as fh:
+                fh.write(offsets.tobytes())
+            with open(self._file("chunk_hashes.u64"), "ab") as fh:
+                fh.write(array("Q", [h for _, h in batch]).tobytes())
+            with open(self._file("vectors.f32"), "ab") as fh:
+                fh.write(vecs.tobytes())
+            if self.meta.get("ivf_trained_at"):
+                centroids = np.load(self._file("ivf.npy"))
+                assign = np.argmax(vecs @ centroids.T, axis=1).astype(np.int32)
+                with open(self._file("ivf_assign.i32"), "ab") as fh:
+                    fh.write(assign.tobytes())
+            if self._hashes is not None:
+                for i, (_, h) in enumerate(batch):
+                    self._hashes.setdefault(h, int(self.meta["count"]) + i)
+            doc["end"] += len(texts)
+            self.meta["count"] = int(self.meta["count"]) + len(texts)
+
+    def _docs_for_rows(self, rows: Iterable[int]) -> List[str]:
+        starts = [d["start"] for d in self.docs]
+        out = set()
+        for row in rows:
+            i = bisect.bisect_right(starts, row) - 1
+            if i >= 0 and row < self.docs[i]["end"]:
+                out.add(self.docs[i]["id"])
+        return sorted(out)
+
+    def _live_hashes(self) -> Dict[int, int]:
+        """content hash -> row, for rows of documents that are not deleted."""
+        if self._hashes is None:
+            hashes: Dict[int, int] = {}
+            path = self._file("chunk_hashes.u64")
+            if os.path.exists(path) and os.path.getsize(path):
+                all_hashes = np.memmap(path, dtype=np.uint64, mode="r")
+                for d in self.docs:
+                    if not d["deleted"]:
+                        for row in range(d["start"], d["end"]):
+                            hashes.setdefault(int(all_hashes[row]), row)
+            self._hashes = hashes
+        return self._hashes
+
+    def _maybe_train_ivf(self) -> None:
+        """(Re)train the IVF centroids when the store crosses IVF_MIN_VECTORS or doubles."""
+        n = int(self.meta["count"])
+        trained_at = int(self.meta.get("ivf_trained_at") or 0)
+        if n < IVF_MIN_VECTORS or (trained_at and n < 2 * trained_at):
+            return
+        vectors = np.asarray(self._vectors())
+        nlist = max(16, min(4096, int(math.sqrt(n))))
+        sample = vectors
+        if n > 50 * nlist:
+            sample = vectors[np.random.default_rng(0).choice(n, size=50 * nlist, replace=False)]
+        centroids = _kmeans(sample, nlist)
+        assign = np.empty(n, dtype=np.int32)
+        for s in range(0, n, 65536):
+            assign[s:s + 65536] = np.argmax(vectors[s:s + 65536] @ centroids.T, axis=1)
+        np.save(self._file("ivf.npy"), centroids)
+        assign.tofile(self._file("ivf_assign.i32"))
+        self.meta["ivf_trained_at"] = n
+
+    def delete_document(self, doc_id: str) -> bool:
+        with self._write_lock, self._lock:
+            for doc in self.docs:
+                if doc["id"] == doc_id and not doc["deleted"]:
+                    doc["deleted"] = True
+                    self._write_json("docs.json", self.docs)
+                    self._hashes = None
+                    return True
+        return False
+
+    def deleted_fraction(self) -> float:
+        n = int(self.meta["count"])
+        dead = sum(d["end"] - d["start"] for d in self.docs if d["deleted"])
+        return dead / n if n else 0.0
+
+    def compact(self) -> int:
+        """Rewrite the store without the rows of deleted documents. Returns rows dropped."""
+        with self._write_lock:
+            live = [d for d in self.docs if not d["deleted"]]
+            if len(live) == len(self.docs):
+                return 0
+            n = int(self.meta["count"])
+            vectors = self._vectors()
+            old_offsets = np.memmap(self._file("chunks.idx"), dtype=np.uint64, mode="r") if n else []
+            old_hashes = np.memmap(self._file("chunk_hashes.u64"), dtype=np.uint64, mode="r") if n else []
+            has_ivf = bool(self.meta.get("ivf_trained_at"))
+            old_assign = np.fromfile(self._file("ivf_assign.i32"), dtype=np.int32) if has_ivf else None
+            names = ["vectors.f32", "chunks.jsonl", "chunks.idx", "chunk_hashes.u64"] + (["ivf_assign.i32"] if has_ivf else [])
+            out = {name: open(self._file(name + ".new"), "wb") for name in names}
+            chunks_size = os.path.getsize(self._file("chunks.jsonl")) if n else 0
+            row = 0
+            try:
+                with open(self._file("chunks.jsonl"), "rb") as src:
+                    for d in live:
+                        start, end = d["start"], d["end"]
+                        if end > start:
+                            # A document's rows are contiguous in every file, so copy ranges.
+                            for s in range(start, end, 65536):
+                                e = min(end, s + 65536)
+                                out["vectors.f32"].write(np.asarray(vectors[s:e]).tobytes())
+                                out["chunk_hashes.u64"].write(np.asarray(old_hashes[s:e]).tobytes())
+                                if has_ivf:
+                                    out["ivf_assign.i32"].write(old_assign[s:e].tobytes())
+                            byte_start = int(old_offsets[start])
+                            byte_end = int(old_offsets[end]) if end < n else chunks_size
+                            shift = out["chunks.jsonl"].tell() - byte_start
+                            offsets = np.asarray(old_offsets[start:end]).astype(np.int64) + shift
+                            out["chunks.idx"].write(offsets.astype(np.uint64).tobytes())
+                            src.seek(byte_start)
+                            remaining = byte_end - byte_start
+                            while remaining > 0:
+                                block = src.read(min(remaining, 1 << 20))
+                                if not block:
+                                    break
+                                out["chunks.jsonl"].write(block)
+                                remaining -= len(block)
+                        d["end"] = row + (end - start)
+                        d["start"] = row
+                        row = d["end"]
+            finally:
+                for fh in out.values():
+                    fh.close()
+            del vectors, old_offsets, old_hashes
+            with self._lock:
+                for name in names:
+                    os.replace(self._file(name + ".new"), self._file(name))
+                self.docs = live
+                self.meta["count"] = row
+                self._hashes = None
+                self._write_json("docs.json", self.docs)
+                self._write_json("meta.json", self.meta)
+            return n - row
+
+    # ---- reads ----
+    def list_documents(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": d["id"],
+                "name": d["name"],
+                "sha256": d["sha256"],
+                "chunks": d["end"] - d["start"],
+                "created_at": d["created_at"],
+            }
+            for d in self.docs
+            if not d["deleted"]
+        ]
+
+    def find_document(self, *, sha256: str) -> Optional[Dict[str, Any]]:
+        for doc in self.list_documents():
+            if doc["sha256"] == sha256:
+                return doc
+        return None
+
+    def _candidates(self, q: np.ndarray) -> Optional[np.ndarray]:
+        """Row ids from the IVF lists nearest to `q`, or None for exact search."""
+        if not self.meta.get("ivf_trained_at"):
+            return None
+        centroids = np.load(self._file("ivf.npy"))
+        assign = np.fromfile(self._file("ivf_assign.i32"), dtype=np.int32)
+        probe = np.argsort(-(centroids @ q))[:IVF_NPROBE]
+        return np.nonzero(np.isin(assign, probe))[0]
+
+    def search(self, query: str, *, k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k (cosine score, chunk) pairs, skipping deleted documents."""
+        if not (query or "").strip():
+            return []
+        q = embeddings.embed_one(query)
+        with self._lock:
+            return self._search(q, k)
+
+    def _search(self, q: np.ndarray, k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        vectors = self._vectors()
+        if len(vectors) == 0:
+            return []
+        rows = self._candidates(q)
+        if rows is None:
+            rows = np.arange(len(vectors))
+        for d in self.docs:
+            if d["deleted"]:
+                rows = rows[(rows < d["start"]) | (rows >= d["end"])]
+        if len(rows) == 0:
+            return []
+        scores = np.asarray(vectors[rows]) @ q
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._chunk(int(rows[i]))) for i in top]
+
+
+_stores: Dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path: str) -> VectorStore:
+    """Return the (process-wide) store at `path`, creating it if needed."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = VectorStore(path)
+            _stores[path] = store
+    return store
+
+
+def get_user_store(user_id: int) -> VectorStore:
+    return open_store(os.path.join(DOC_STORE_DIR, str(int(user_id))))
+
+
+def search_user_documents(user_id: Optional[int], query: str, *, k: int = 4) -> List[Dict[str, Any]]:
+    """Evidence items ({source: 'document', title, url, snippet, score}) from the user's uploads."""
+    if user_id is None:
+        return []
+    path = os.path.join(DOC_STORE_DIR, str(int(user_id)))
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return []
+    out = []
+    for score, chunk in get_user_store(user_id).search(query, k=k):
+        out.append({
+            "source": "document",
+            "title": chunk.get("name", ""),
+            "url": f"doc://{chunk.get('doc_id', '')}#{chunk.get('n', 0)}",
+            "snippet": chunk.get("text", ""),
+            "score": round(score, 4),
+        })
+    return out
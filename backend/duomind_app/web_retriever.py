@@ -1,15 +1,129 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import asyncio
+import os
 import re
 import urllib.parse
 
 import httpx
+import numpy as np
+
+from duomind_app import local_index, textsim, vector_store
+from duomind_app.ingest import CORPUS_STORE_DIR
+from duomind_app.cache_store import TwoLevelCache
+from duomind_app.providers import http_pool
+from duomind_app.singleflight import flight_key, normalize_query
 
 WIKI_API = "https://en.wikipedia.org/w/api.php"
 WIKI_REST_SUMMARY = "https://en.wikipedia.org/api/rest_v1/page/summary/"
 
 USER_AGENT = "DuoMind/1.0 (RAG-lite via Wikipedia; contact: none)"
+HEADERS = {"User-Agent": USER_AGENT}
+REQUEST_TIMEOUT = 12.0
+
+# Summary fetches in flight at once (across all requests), and the overall time
+# budget for one retrieve_evidence call. Pages that miss the deadline fall back
+# to their search snippet.
+WIKI_MAX_CONCURRENCY = int(os.getenv("WIKI_MAX_CONCURRENCY", "6"))
+EVIDENCE_DEADLINE_SECONDS = float(os.getenv("EVIDENCE_DEADLINE_SECONDS", "5"))
+
+# Where evidence comes from: "wikipedia" (live API), "local" (offline BM25 index
+# built with `python -m duomind_app.local_index build ...`) or "corpus" (vector
+# store filled by `python -m duomind_app.ingest ...`).
+EVIDENCE_BACKEND = os.getenv("EVIDENCE_BACKEND", "wikipedia")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", local_index.DEFAULT_INDEX_DIR)
+
+_summary_slots = asyncio.Semaphore(max(1, WIKI_MAX_CONCURRENCY))
+
+# Evidence cache: in-process LRU + SQLite (cache_store). Misses and non-200
+# responses are cached for EVIDENCE_NEGATIVE_TTL_SECONDS; expired entries are
+# revalidated with If-None-Match when the server sent an ETag, and served stale
+# if Wikipedia cannot be reached.
+EVIDENCE_CACHE_ENABLED = os.getenv("EVIDENCE_CACHE_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+EVIDENCE_SEARCH_TTL = float(os.getenv("EVIDENCE_SEARCH_TTL_SECONDS", str(6 * 3600)))
+EVIDENCE_SUMMARY_TTL = float(os.getenv("EVIDENCE_SUMMARY_TTL_SECONDS", str(24 * 3600)))
+EVIDENCE_NEGATIVE_TTL = float(os.getenv("EVIDENCE_NEGATIVE_TTL_SECONDS", "600"))
+
+_search_cache = TwoLevelCache(
+    "wiki_search",
+    ttl=EVIDENCE_SEARCH_TTL,
+    max_memory_items=int(os.getenv("EVIDENCE_CACHE_MEMORY_ITEMS", "512")),
+)
+_summary_cache = TwoLevelCache(
+    "wiki_summary",
+    ttl=EVIDENCE_SUMMARY_TTL,
+    max_memory_items=int(os.getenv("EVIDENCE_CACHE_MEMORY_ITEMS", "512")),
+)
+_page_cache = TwoLevelCache(
+    "wiki_page",
+    ttl=EVIDENCE_SUMMARY_TTL,
+    max_memory_items=int(os.getenv("EVIDENCE_CACHE_MEMORY_ITEMS", "512")) // 4,
+)
+
+# Passage re-ranking (rerank_evidence): full page text is split into passages of
+# ~EVIDENCE_PASSAGE_WORDS words, scored against the query and both model answers,
+# and the best ones are packed into EVIDENCE_TOKEN_BUDGET tokens for the judge.
+EVIDENCE_PAGE_MAX_CHARS = int(os.getenv("EVIDENCE_PAGE_MAX_CHARS", "40000"))
+EVIDENCE_PASSAGE_WORDS = int(os.getenv("EVIDENCE_PASSAGE_WORDS", "80"))
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "1200"))
+# Relative weight of the query vs. each model answer when scoring passages.
+RERANK_QUERY_WEIGHT = 0.5
+RERANK_ANSWER_WEIGHT = 0.25
+# Passages scoring below this fraction of the best one are dropped even if they fit.
+RERANK_MIN_SCORE = 0.05
+
+
+async def _cached_get(
+    cache: TwoLevelCache,
+    key: str,
+    url: str,
+    parse: Callable[[Dict[str, Any]], Any],
+    *,
+    params: Optional[Dict[str, str]] = None,
+    slots: Optional[asyncio.Semaphore] = None,
+) -> Any:
+    """GET `url` through `cache`; returns parse(json) or None for a (cached) miss."""
+    entry = await cache.aget(key, allow_stale=True) if EVIDENCE_CACHE_ENABLED else None
+    if entry is not None and not entry.expired:
+        return entry.value
+
+    headers = dict(HEADERS)
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    client = http_pool.get_client("wikipedia")
+    try:
+        if slots is None:
+            r = await client.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        else:
+            async with slots:
+                r = await client.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+    except httpx.HTTPError:
+        if entry is not None:
+            return entry.value
+        raise
+
+    if r.status_code == 304 and entry is not None:
+        value = entry.value
+        etag = entry.etag
+    elif r.status_code != 200:
+        value, etag = None, None
+    else:
+        value = parse(r.json())
+        etag = r.headers.get("etag")
+    if EVIDENCE_CACHE_ENABLED:
+        ttl = None if value else EVIDENCE_NEGATIVE_TTL
+        await cache.aset(key, value, ttl=ttl, etag=etag)
+    return value
+
+
+def evidence_cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": EVIDENCE_CACHE_ENABLED,
+        "search": _search_cache.stats(),
+        "summary": _summary_cache.stats(),
+        "page": _page_cache.stats(),
+    }
 
 
 async def wikipedia_search(query: str, *, limit: int = 5, lang: str = "en") -> List[Dict[str, Any]]:
@@ -25,20 +139,20 @@ async def wikipedia_search(query: str, *, limit: int = 5, lang: str = "en") -> L
         "srlimit": str(max(1, min(limit, 10))),
         "format": "json",
     }
-    async with httpx.AsyncClient(timeout=12.0, headers={"User-Agent": USER_AGENT}) as client:
-        r = await client.get(api, params=params)
-        r.raise_for_status()
-        data = r.json()
-
-    out: List[Dict[str, Any]] = []
-    for item in (data.get("query", {}) or {}).get("search", [])[:limit]:
-        title = item.get("title") or ""
-        if not title:
-            continue
-        url_title = urllib.parse.quote(title.replace(" ", "_"))
-        url = f"https://{lang}.wikipedia.org/wiki/{url_title}"
-        out.append({"title": title, "url": url, "snippet_html": item.get("snippet", "")})
-    return out
+
+    def parse(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for item in (data.get("query", {}) or {}).get("search", [])[:limit]:
+            title = item.get("title") or ""
+            if not title:
+                continue
+            url_title = urllib.parse.quote(title.replace(" ", "_"))
+            url = f"https://{lang}.wikipedia.org/wiki/{url_title}"
+            out.append({"title": title, "url": url, "snippet_html": item.get("snippet", "")})
+        return out
+
+    key = flight_key(lang, normalize_query(q), params["srlimit"])
+    return await _cached_get(_search_cache, key, api, parse, params=params) or []
 
 
 async def wikipedia_summary(title: str, *, lang: str = "en") -> Optional[Dict[str, Any]]:
@@ -48,24 +162,58 @@ async def wikipedia_summary(title: str, *, lang: str = "en") -> Optional[Dict[st
         return None
     url_title = urllib.parse.quote(t.replace(" ", "_"))
     rest = f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{url_title}"
-    async with httpx.AsyncClient(timeout=12.0, headers={"User-Agent": USER_AGENT}) as client:
-        r = await client.get(rest)
-        if r.status_code != 200:
+
+    def parse(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        extract = (data.get("extract") or "").strip()
+        if not extract:
             return None
-        data = r.json()
-    extract = (data.get("extract") or "").strip()
-    if not extract:
+        canonical = None
+        content_urls = data.get("content_urls") or {}
+        if isinstance(content_urls, dict):
+            canonical = (content_urls.get("desktop") or {}).get("page") or (content_urls.get("mobile") or {}).get("page")
+        return {
+            "title": data.get("title") or t,
+            "url": canonical or f"https://{lang}.wikipedia.org/wiki/{url_title}",
+            "extract": extract,
+        }
+
+    key = flight_key(lang, t.replace(" ", "_"))
+    return await _cached_get(_summary_cache, key, rest, parse, slots=_summary_slots)
+
+
+async def wikipedia_page_text(title: str, *, lang: str = "en") -> Optional[Dict[str, Any]]:
+    """Fetch the full plain-text article (capped at EVIDENCE_PAGE_MAX_CHARS)."""
+    t = (title or "").strip()
+    if not t:
         return None
-    canonical = None
-    content_urls = data.get("content_urls") or {}
-    if isinstance(content_urls, dict):
-        canonical = (content_urls.get("desktop") or {}).get("page") or (content_urls.get("mobile") or {}).get("page")
-    return {
-        "title": data.get("title") or t,
-        "url": canonical or f"https://{lang}.wikipedia.org/wiki/{url_title}",
-        "extract": extract,
+    api = f"https://{lang}.wikipedia.org/w/api.php"
+    params = {
+        "action": "query",
+        "prop": "extracts",
+        "explaintext": "1",
+        "redirects": "1",
+        "titles": t,
+        "format": "json",
     }
 
+    def parse(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        pages = (data.get("query", {}) or {}).get("pages", {}) or {}
+        for page in pages.values():
+            extract = (page.get("extract") or "").strip()
+            if not extract:
+                continue
+            page_title = page.get("title") or t
+            url_title = urllib.parse.quote(page_title.replace(" ", "_"))
+            return {
+                "title": page_title,
+                "url": f"https://{lang}.wikipedia.org/wiki/{url_title}",
+                "extract": extract[:EVIDENCE_PAGE_MAX_CHARS],
+            }
+        return None
+
+    key = flight_key(lang, t.replace(" ", "_"))
+    return await _cached_get(_page_cache, key, api, parse, params=params, slots=_summary_slots)
+
 
 def _strip_html(text: str) -> str:
     # Wikipedia search 'snippet' contains <span class="searchmatch">...</span>
@@ -74,22 +222,200 @@ def _strip_html(text: str) -> str:
     return t
 
 
-async def retrieve_evidence(query: str, *, lang: str = "en", max_pages: int = 3, max_chars: int = 1400) -> List[Dict[str, Any]]:
-    """RAG-lite retrieval: Wikipedia search + summaries (no local DB).
+def _snippet_item(result: Dict[str, Any], max_chars: int) -> Optional[Dict[str, Any]]:
+    snip = _strip_html(result.get("snippet_html", ""))[:max_chars]
+    if not snip:
+        return None
+    return {"source": "wikipedia", "title": result["title"], "url": result["url"], "snippet": snip}
+
 
-    Returns a list of evidence items:
-      {source: 'wikipedia', title, url, snippet}
+async def _retrieve_wikipedia(
+    query: str, *, lang: str, max_pages: int, max_chars: int, deadline: Optional[float], full_text: bool
+) -> List[Dict[str, Any]]:
+    """Live Wikipedia search + summaries (or full articles with `full_text`).
+
+    Summaries are fetched concurrently. Whatever has not arrived within
+    `deadline` seconds (EVIDENCE_DEADLINE_SECONDS by default) is cancelled and
+    replaced by the search snippet, so retrieval never blocks the caller for long.
     """
-    results = await wikipedia_search(query, limit=max_pages, lang=lang)
+    loop = asyncio.get_running_loop()
+    budget = EVIDENCE_DEADLINE_SECONDS if deadline is None else deadline
+    ends_at = loop.time() + budget
+
+    try:
+        results = await asyncio.wait_for(wikipedia_search(query, limit=max_pages, lang=lang), timeout=budget)
+    except asyncio.TimeoutError:
+        return []
+    results = results[:max_pages]
+    if not results:
+        return []
+
+    fetch = wikipedia_page_text if full_text else wikipedia_summary
+    tasks = [asyncio.ensure_future(fetch(r["title"], lang=lang)) for r in results]
+    _, pending = await asyncio.wait(tasks, timeout=max(0.0, ends_at - loop.time()))
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
     evidence: List[Dict[str, Any]] = []
-    for r in results[:max_pages]:
-        summ = await wikipedia_summary(r["title"], lang=lang)
+    for r, t in zip(results, tasks):
+        summ = None
+        if not t.cancelled() and t.exception() is None:
+            summ = t.result()
         if not summ:
             # fallback: at least keep search snippet
-            snip = _strip_html(r.get("snippet_html", ""))[:max_chars]
-            if snip:
-                evidence.append({"source": "wikipedia", "title": r["title"], "url": r["url"], "snippet": snip})
+            item = _snippet_item(r, max_chars)
+            if item:
+                evidence.append(item)
             continue
         snip = summ["extract"][:max_chars]
-        evidence.append({"source": "wikipedia", "title": summ["title"], "url": summ["url"], "snippet": snip})
+        item = {"source": "wikipedia", "title": summ["title"], "url": summ["url"], "snippet": snip}
+        if full_text:
+            item["text"] = summ["extract"]
+        evidence.append(item)
     return evidence
+
+
+def _search_local(query: str, max_pages: int, max_chars: int, full_text: bool) -> List[Dict[str, Any]]:
+    index = local_index.get_index(LOCAL_INDEX_DIR)
+    evidence: List[Dict[str, Any]] = []
+    for doc_id, _score in index.search(query, limit=max_pages):
+        doc = index.document(doc_id)
+        item = {
+            "source": "local",
+            "title": doc.get("title", ""),
+            "url": doc.get("url", ""),
+            "snippet": (doc.get("text") or "")[:max_chars],
+        }
+        if full_text:
+            item["text"] = doc.get("text") or ""
+        evidence.append(item)
+    return evidence
+
+
+async def _retrieve_local(
+    query: str, *, lang: str, max_pages: int, max_chars: int, deadline: Optional[float], full_text: bool
+) -> List[Dict[str, Any]]:
+    """BM25 over the offline index in LOCAL_INDEX_DIR (see local_index.py); `lang` is ignored."""
+    if not (query or "").strip():
+        return []
+    budget = EVIDENCE_DEADLINE_SECONDS if deadline is None else deadline
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(_search_local, query, max_pages, max_chars, full_text), timeout=budget
+        )
+    except asyncio.TimeoutError:
+        return []
+
+
+def _search_corpus(query: str, max_pages: int) -> List[Dict[str, Any]]:
+    store = vector_store.open_store(CORPUS_STORE_DIR)
+    return [
+        {
+            "source": "corpus",
+            "title": chunk.get("name", ""),
+            "url": f"corpus://{chunk.get('name', '')}#{chunk.get('n', 0)}",
+            "snippet": chunk.get("text", ""),
+        }
+        for _score, chunk in store.search(query, k=max_pages)
+    ]
+
+
+async def _retrieve_corpus(
+    query: str, *, lang: str, max_pages: int, max_chars: int, deadline: Optional[float], full_text: bool
+) -> List[Dict[str, Any]]:
+    """Vector search over the corpus ingested by ingest.py (CORPUS_STORE_DIR); chunks are already passages."""
+    if not (query or "").strip():
+        return []
+    budget = EVIDENCE_DEADLINE_SECONDS if deadline is None else deadline
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(_search_corpus, query, max_pages), timeout=budget)
+    except asyncio.TimeoutError:
+        return []
+
+
+_BACKENDS = {
+    "wikipedia": _retrieve_wikipedia,
+    "local": _retrieve_local,
+    "corpus": _retrieve_corpus,
+}
+
+
+async def retrieve_evidence(
+    query: str,
+    *,
+    lang: str = "en",
+    max_pages: int = 3,
+    max_chars: int = 1400,
+    deadline: Optional[float] = None,
+    backend: Optional[str] = None,
+    full_text: bool = False,
+) -> List[Dict[str, Any]]:
+    """RAG-lite retrieval from the configured EVIDENCE_BACKEND (live Wikipedia or a local index).
+
+    Returns a list of evidence items (in rank order):
+      {source: 'wikipedia' | 'local' | 'corpus', title, url, snippet}
+    With `full_text`, items also carry the whole page as `text` (for rerank_evidence).
+    """
+    name = (backend or EVIDENCE_BACKEND).strip().lower()
+    fn = _BACKENDS.get(name)
+    if fn is None:
+        raise ValueError(f"Unknown evidence backend: {name}")
+    return await fn(query, lang=lang, max_pages=max_pages, max_chars=max_chars, deadline=deadline, full_text=full_text)
+
+
+def rerank_evidence(
+    evidence: List[Dict[str, Any]],
+    query: str,
+    answers: Sequence[str] = (),
+    *,
+    token_budget: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Split pages into passages, keep the most relevant ones within `token_budget`.
+
+    Passages are scored with BM25 against the query and each model answer (each
+    score column normalized to [0, 1], then weighted). Returns evidence items in
+    score order: {source, title, url, snippet, score}.
+    """
+    budget = EVIDENCE_TOKEN_BUDGET if token_budget is None else token_budget
+    passages: List[Dict[str, Any]] = []
+    for item in evidence:
+        text = item.get("text") or item.get("snippet") or ""
+        for passage in textsim.split_passages(text, max_words=EVIDENCE_PASSAGE_WORDS):
+            passages.append({
+                "source": item.get("source", ""),
+                "title": item.get("title", ""),
+                "url": item.get("url", ""),
+                "snippet": passage,
+            })
+    if not passages:
+        return []
+
+    texts = [query] + [a for a in answers if a]
+    scores = textsim.bm25_scores(
+        [textsim.tokenize(p["snippet"]) for p in passages],
+        [textsim.tokenize(t) for t in texts],
+    )
+    top = scores.max(axis=0)
+    scores = scores / np.where(top > 0, top, 1.0)
+    weights = np.array([RERANK_QUERY_WEIGHT] + [RERANK_ANSWER_WEIGHT] * (len(texts) - 1))
+    combined = scores @ weights
+
+    picked: List[Dict[str, Any]] = []
+    used = 0
+    floor = RERANK_MIN_SCORE * float(combined.max())
+    for i in np.argsort(-combined, kind="stable"):
+        if picked and combined[i] <= floor:
+            break
+        p = passages[int(i)]
+        cost = textsim.estimate_tokens(p["snippet"])
+        if used + cost > budget:
+            if picked:
+                continue
+            p["snippet"] = p["snippet"][: budget * 4]
+            cost = budget
+        p["score"] = round(float(combined[i]), 4)
+        picked.append(p)
+        used += cost
+    return picked
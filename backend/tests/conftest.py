@@ -0,0 +1,21 @@
+"""Shared fixtures: duomind_app importable from backend/, and a scratch SQLite database.
+
+    cd backend && python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duomind_app import storage  # noqa: E402
+
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    """Point storage.connect() at an empty database in tmp_path (never duomind.db)."""
+    pool = storage.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(storage, "_pool", pool)
+    yield pool
+    pool.close_all()
@@ -0,0 +1,57 @@
+from duomind_app import claim_store
+from duomind_app.claim_store import normalize_claim, reuse_judgement
+
+TALL = "The Eiffel Tower is 330 metres tall."
+ALIENS = "It was built in 1999 by aliens."
+PARIS = "The tower stands in Paris, France."
+WIKI = {"label": "E1", "url": "https://en.wikipedia.org/wiki/Eiffel_Tower"}
+
+
+def _verdict(claim, verdict, confidence=0.9, **evidence):
+    return {normalize_claim(claim): {"claim": claim, "verdict": verdict, "confidence": confidence, "evidence": evidence}}
+
+
+def test_reuse_needs_a_verdict_for_every_claim():
+    prior = _verdict(TALL, "supported", sources=[WIKI])
+    assert reuse_judgement([TALL, ALIENS], prior, [WIKI["url"]]) is None
+
+
+def test_no_claims_means_no_reuse():
+    assert reuse_judgement([], {}, []) is None
+
+
+def test_all_rejected_asks_the_judge_instead_of_an_empty_answer():
+    prior = {**_verdict(ALIENS, "rejected", reason="no evidence"), **_verdict(PARIS, "rejected", reason="off topic")}
+    assert reuse_judgement([ALIENS, PARIS], prior, [WIKI["url"]]) is None
+
+
+def test_supported_verdict_must_cite_current_evidence():
+    prior = {**_verdict(TALL, "supported", sources=[WIKI]), **_verdict(ALIENS, "rejected", reason="no evidence")}
+    assert reuse_judgement([TALL, ALIENS], prior, ["https://example.org/other"]) is None
+    assert reuse_judgement([TALL, ALIENS], prior, []) is None
+
+
+def test_rebuilt_judgement():
+    prior = {
+        **_verdict(TALL, "supported", 0.9, sources=[WIKI], matched="The tower is 330 m tall."),
+        **_verdict(PARIS, "supported", 0.6, sources=[WIKI], matched="The tower is 330 m tall."),
+        **_verdict(ALIENS, "rejected", 0.9, reason="no evidence"),
+    }
+    out = reuse_judgement([TALL, PARIS, ALIENS, ALIENS], prior, [WIKI["url"], "https://x"])
+    assert out["final_answer"] == "The tower is 330 m tall."
+    assert out["supported_facts"] == ["The tower is 330 m tall."]  # matched facts are deduplicated
+    assert out["rejected_claims"] == [{"claim": ALIENS, "reason": "no evidence"}]
+    assert out["sources"] == [WIKI]
+    assert out["confidence"] == "high"  # mean of 0.9, 0.6, 0.9, 0.9
+
+
+def test_uncited_supported_verdict_is_reusable():
+    prior = _verdict(TALL, "supported", 0.5)
+    out = reuse_judgement([TALL], prior, [])
+    assert out["supported_facts"] == [TALL]
+    assert out["confidence"] == "medium"
+
+
+def test_guests_get_no_stored_verdicts():
+    # Returns before touching the database: guest sessions all share user_id NULL.
+    assert claim_store.lookup_verdicts(None, [TALL], "en") == {}
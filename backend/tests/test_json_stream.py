@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from duomind_app.json_stream import JsonStreamParser, first_json_object
+
+REPLY = {
+    "final_answer": 'Line one\nQuote: "x" \\ tab\t café \U0001F600 {not} [json]',
+    "confidence": "high",
+    "supported_facts": ["a \"nested\" string", {"final_answer": "nested, never streamed"}],
+    "score": 0.8,
+    "done": True,
+}
+
+
+def _stream(text, size, fields=("final_answer",)):
+    parser = JsonStreamParser(fields=fields)
+    deltas = []
+    for i in range(0, len(text), size):
+        deltas.extend(parser.feed(text[i:i + size]))
+    return parser, deltas
+
+
+def _joined(deltas, key):
+    return "".join(text for k, text in deltas if k == key)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 10_000])
+def test_chunked_feed_streams_the_decoded_answer(size):
+    # json.dumps escapes the non-ASCII text (é, a 😀 surrogate pair),
+    # so small chunk sizes split escapes and the pair across feed() calls.
+    text = json.dumps(REPLY)
+    parser, deltas = _stream(text, size)
+    assert {k for k, _ in deltas} == {"final_answer"}
+    assert _joined(deltas, "final_answer") == REPLY["final_answer"]
+    assert parser.done
+    assert parser.result() == REPLY
+
+
+def test_raw_utf8_is_streamed_as_is():
+    text = json.dumps(REPLY, ensure_ascii=False)
+    parser, deltas = _stream(text, 4)
+    assert _joined(deltas, "final_answer") == REPLY["final_answer"]
+    assert parser.result() == REPLY
+
+
+def test_all_top_level_strings_without_a_field_filter():
+    _, deltas = _stream(json.dumps(REPLY), 5, fields=None)
+    assert _joined(deltas, "confidence") == "high"
+    assert _joined(deltas, "final_answer") == REPLY["final_answer"]
+    assert "nested" not in _joined(deltas, "supported_facts")
+
+
+def test_deltas_are_merged_per_value():
+    parser = JsonStreamParser()
+    assert parser.feed('{"a": "xy", "b": "z') == [("a", "xy"), ("b", "z")]
+    assert parser.feed('w"}') == [("b", "w")]
+
+
+def test_prose_and_fence_around_the_object_are_ignored():
+    text = "Sure, here it is:\n```json\n" + json.dumps(REPLY) + "\n```\nAnything else? {}"
+    parser, deltas = _stream(text, 6)
+    assert _joined(deltas, "final_answer") == REPLY["final_answer"]
+    assert parser.result() == REPLY
+
+
+def test_nothing_before_the_first_brace():
+    parser = JsonStreamParser()
+    assert parser.feed("thinking ...") == []
+    assert not parser.done
+    assert parser.feed('{"final_answer": "ok"}') == [("final_answer", "ok")]
+    assert parser.result() == {"final_answer": "ok"}
+
+
+def test_truncated_object_has_no_result():
+    text = json.dumps(REPLY)
+    parser, deltas = _stream(text[: len(text) // 2], 8)
+    assert not parser.done
+    assert parser.result() is None
+    assert REPLY["final_answer"].startswith(_joined(deltas, "final_answer"))
+
+
+def test_invalid_json_has_no_result():
+    parser = JsonStreamParser()
+    parser.feed('{"final_answer": "ok",}')
+    assert parser.done
+    assert parser.result() is None
+
+
+def test_feed_after_done_is_ignored():
+    parser = JsonStreamParser()
+    parser.feed('{"final_answer": "ok"} {"final_answer": "again"}')
+    assert parser.feed('{"final_answer": "more"}') == []
+    assert parser.result() == {"final_answer": "ok"}
+
+
+def test_first_json_object():
+    assert first_json_object('Result: {"a": {"b": "}"}} trailing') == {"a": {"b": "}"}}
+    assert first_json_object('{"a": 1') is None
+    assert first_json_object("no json here") is None
+    assert first_json_object("") is None
+    assert first_json_object(None) is None
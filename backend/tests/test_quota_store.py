@@ -0,0 +1,124 @@
+import pytest
+
+from duomind_app import quota_store, storage
+
+GUEST = quota_store.guest_subject("203.0.113.7")
+USER = quota_store.user_subject(42)
+
+
+@pytest.fixture
+def day(scratch_db, monkeypatch):
+    """Fresh module state on the scratch database; set day["today"] to change the UTC day."""
+    monkeypatch.setattr(quota_store, "_table_ready", False)
+    monkeypatch.setattr(quota_store, "_pruned_day", None)
+    monkeypatch.setattr(quota_store, "_memory", {})
+    clock = {"today": "2026-03-01"}
+    monkeypatch.setattr(quota_store, "today", lambda: clock["today"])
+    return clock
+
+
+def _rows():
+    conn = storage.connect()
+    try:
+        return [tuple(r) for r in conn.execute("SELECT subject, day, count FROM quota_counters ORDER BY day, subject")]
+    finally:
+        conn.close()
+
+
+def test_admit_stops_at_the_limit(day):
+    assert [quota_store.admit(GUEST, 3) for _ in range(4)] == [(True, 1), (True, 2), (True, 3), (False, 3)]
+    assert quota_store.used(GUEST) == 3
+
+
+def test_denial_is_not_cached_past_a_higher_limit(day):
+    quota_store.admit(GUEST, 1)
+    assert quota_store.admit(GUEST, 1) == (False, 1)
+    assert quota_store.admit(GUEST, 2) == (True, 2)
+
+
+def test_subjects_are_counted_separately(day):
+    quota_store.admit(GUEST, 1)
+    assert quota_store.admit(GUEST, 1) == (False, 1)
+    assert quota_store.admit(USER, 1) == (True, 1)
+
+
+def test_refund_frees_a_slot(day):
+    quota_store.admit(GUEST, 2)
+    quota_store.admit(GUEST, 2)
+    assert quota_store.admit(GUEST, 2) == (False, 2)
+    quota_store.refund(GUEST)
+    assert quota_store.used(GUEST) == 1
+    assert quota_store.admit(GUEST, 2) == (True, 2)
+
+
+def test_refund_never_goes_below_zero(day):
+    quota_store.refund(GUEST)  # no counter yet
+    quota_store.admit(GUEST, 5)
+    quota_store.refund(GUEST)
+    quota_store.refund(GUEST)
+    assert quota_store.used(GUEST) == 0
+    assert quota_store.admit(GUEST, 1) == (True, 1)
+
+
+def test_refund_without_subject_is_a_noop(day):
+    quota_store.refund(None)
+    quota_store.refund("")
+
+
+def test_new_day_starts_a_new_counter(day):
+    quota_store.admit(GUEST, 2)
+    quota_store.admit(GUEST, 2)
+    assert quota_store.admit(GUEST, 2) == (False, 2)
+
+    day["today"] = "2026-03-02"
+    assert quota_store.used(GUEST) == 0
+    assert quota_store.admit(GUEST, 2) == (True, 1)
+    # A refund only gives back today's requests.
+    quota_store.refund(GUEST)
+    quota_store.refund(GUEST)
+    day["today"] = "2026-03-01"
+    assert quota_store.used(GUEST) == 2
+
+
+def test_old_counters_are_pruned_on_a_new_day(day, monkeypatch):
+    monkeypatch.setattr(quota_store, "QUOTA_KEEP_DAYS", 7)
+    for d in ("2026-03-01", "2026-03-02", "2026-03-03"):
+        day["today"] = d
+        quota_store.admit(GUEST, 5)
+    day["today"] = "2026-03-10"
+    quota_store.admit(USER, 5)
+    # The cutoff is 2026-03-03: a week of history is kept.
+    assert _rows() == [(GUEST, "2026-03-03", 1), (USER, "2026-03-10", 1)]
+
+
+def test_first_counter_of_the_day_is_seeded_from_history(day):
+    conn = storage.connect()
+    try:
+        conn.execute("CREATE TABLE history (id INTEGER PRIMARY KEY, user_id INTEGER, ip TEXT, created_at TIMESTAMP)")
+        conn.executemany(
+            "INSERT INTO history (user_id, ip, created_at) VALUES (?, ?, ?)",
+            [
+                (None, "203.0.113.7", "2026-03-01 00:00:00"),
+                (None, "203.0.113.7", "2026-03-01 23:59:59"),
+                (None, "203.0.113.7", "2026-02-28 23:59:59"),  # yesterday
+                (None, "198.51.100.1", "2026-03-01 12:00:00"),  # another guest
+                (42, "203.0.113.7", "2026-03-01 12:00:00"),  # a logged-in user on the same IP
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    assert quota_store.admit(GUEST, 5) == (True, 3)
+    assert quota_store.admit(USER, 5) == (True, 2)
+
+
+def test_spend_adds_to_todays_counter(day):
+    assert quota_store.spent(GUEST) == (0, 0.0)
+    quota_store.spend(GUEST, 120, 0.002)
+    quota_store.spend(GUEST, 30, 0.001)
+    tokens, cost = quota_store.spent(GUEST)
+    assert tokens == 150
+    assert cost == pytest.approx(0.003)
+    assert quota_store.used(GUEST) == 0  # usage does not count as a request
+    day["today"] = "2026-03-02"
+    assert quota_store.spent(GUEST) == (0, 0.0)
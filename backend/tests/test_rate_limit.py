@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import pytest
+
+from duomind_app import rate_limit, storage
+from duomind_app.rate_limit import Policy, parse_policy, take
+
+# Bursts of 3, then one request every 2 seconds.
+POLICY = Policy(rate=0.5, burst=3)
+
+
+@pytest.fixture
+def clock(scratch_db, monkeypatch):
+    """Fresh module state on the scratch database; advance clock["now"] to let buckets refill."""
+    monkeypatch.setattr(rate_limit, "_table_ready", False)
+    now = {"now": 1_800_000_000.0}
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now["now"]))
+    return now
+
+
+def _drain(key="ip:203.0.113.7", policy=POLICY):
+    while take(key, policy)[0]:
+        pass
+
+
+def test_full_bucket_allows_a_burst(clock):
+    assert [take("ip:a", POLICY) for _ in range(3)] == [(True, 0.0)] * 3
+    allowed, retry_after = take("ip:a", POLICY)
+    assert not allowed
+    assert retry_after == pytest.approx(2.0)
+
+
+def test_bucket_refills_at_the_policy_rate(clock):
+    _drain()
+    clock["now"] += 2.0
+    assert take("ip:203.0.113.7", POLICY)[0]
+    assert not take("ip:203.0.113.7", POLICY)[0]
+
+    clock["now"] += 1.5
+    allowed, retry_after = take("ip:203.0.113.7", POLICY)
+    assert not allowed
+    assert retry_after == pytest.approx(0.5)
+    clock["now"] += 0.5
+    assert take("ip:203.0.113.7", POLICY)[0]
+
+
+def test_denied_requests_do_not_consume_tokens(clock):
+    _drain()
+    for _ in range(3):
+        clock["now"] += 0.5
+        assert not take("ip:203.0.113.7", POLICY)[0]
+    clock["now"] += 0.5  # 2 s since draining: one token, none taken by the denials
+    assert take("ip:203.0.113.7", POLICY)[0]
+
+
+def test_refill_is_capped_at_the_burst(clock):
+    _drain()
+    clock["now"] += 24 * 3600 - 1
+    assert [take("ip:203.0.113.7", POLICY)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_clock_going_backwards_does_not_drain_the_bucket(clock):
+    take("ip:a", POLICY)
+    clock["now"] -= 60
+    assert [take("ip:a", POLICY)[0] for _ in range(3)] == [True, True, False]
+
+
+def test_buckets_are_keyed_separately(clock):
+    _drain("ip:a")
+    assert take("ip:b", POLICY)[0]
+    assert take("user:1", POLICY)[0]
+
+
+def test_cost_above_one(clock):
+    assert take("key:openai:x", POLICY, cost=3) == (True, 0.0)
+    allowed, retry_after = take("key:openai:x", POLICY, cost=2)
+    assert not allowed
+    assert retry_after == pytest.approx(4.0)
+
+
+def test_idle_buckets_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_PRUNE_EVERY", 1)
+    take("ip:idle", POLICY)
+    clock["now"] += rate_limit._IDLE_SECONDS + 1
+    take("ip:active", POLICY)
+    conn = storage.connect()
+    try:
+        keys = [r["key"] for r in conn.execute("SELECT key FROM rate_buckets")]
+    finally:
+        conn.close()
+    assert keys == ["ip:active"]
+
+
+def test_byok_requests_skip_provider_key_buckets(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "PROVIDER_KEY_POLICY", Policy(rate=0.001, burst=1))
+    monkeypatch.setattr(rate_limit.registry, "provider_of", lambda model_id: "openai")
+    for _ in range(3):
+        rate_limit.check_provider_keys(["gpt"], {"openai": "sk-user"}, "byok")
+    rate_limit.check_provider_keys(["gpt"], {"openai": "sk-server"}, "server")
+    with pytest.raises(rate_limit.HTTPException) as exc:
+        rate_limit.check_provider_keys(["gpt"], {"openai": "sk-server"}, "server")
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.parametrize(
+    "raw, policy",
+    [
+        ("10/60", Policy(rate=10 / 60, burst=10)),
+        (" 5 / 1 ", Policy(rate=5.0, burst=5.0)),
+        ("5", Policy(rate=5.0, burst=5.0)),
+        ("", None),
+        ("0/60", None),
+        ("10/0", None),
+        (None, None),
+    ],
+)
+def test_parse_policy(raw, policy):
+    assert parse_policy(raw) == policy
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+import pytest
+
+from duomind_app.providers import resilience
+
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini:generateContent?key=SECRETKEY"
+
+
+def _status_error(code):
+    request = httpx.Request("POST", GEMINI_URL)
+    response = httpx.Response(code, request=request)
+    return httpx.HTTPStatusError(f"Server error '{code}' for url '{request.url}'", request=request, response=response)
+
+
+def test_describe_keeps_no_url():
+    assert resilience.describe(_status_error(503)) == "HTTP 503"
+    assert resilience.describe(httpx.ConnectError(f"failed: {GEMINI_URL}")) == "ConnectError"
+
+
+def test_give_up_message_does_not_leak_the_key(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0)
+
+    async def failing():
+        raise _status_error(503)
+
+    with pytest.raises(resilience.ProviderCallError) as exc:
+        asyncio.run(resilience.call_with_retry("gemini", "SECRETKEY", 2, failing))
+    assert "SECRETKEY" not in str(exc.value)
+    assert str(exc.value) == f"gemini unavailable after {resilience.RETRY_ATTEMPTS} attempt(s) (HTTP 503)"
+    assert exc.value.status_code == 503